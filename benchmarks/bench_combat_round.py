@@ -0,0 +1,51 @@
+"""
+Microbenchmark: cost of one combat round as the number of combatants grows.
+Half the combatants are PCs (auto-played), half hostile NPCs, all with enough hp to last every round.
+
+    python benchmarks/bench_combat_round.py [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from combat import CombatEngine
+from game_state import GameState
+
+
+def make_state(combatants: int) -> GameState:
+    gs = GameState(seed=1)
+    gs.load_scenario(gs.hostile_game_state)
+    for i in range(combatants // 2):
+        gs.add_actor(f"pc_Soldier{i}", {
+            "name": f"Soldier {i}", "currentLocation": "loc_Battlefield", "inventory": ["item_LongSword"],
+            "stats": {"hp_current": 10**6, "hp_max": 10**6, "ac": 15, "str": 14, "dex": 12},
+            "statusEffects": ["in_combat"],
+        }, kind="pc")
+        gs.add_actor(f"npc_Raider{i}", {
+            "name": f"Raider {i}", "currentLocation": "loc_Battlefield", "dispositionToParty": "hostile",
+            "stats": {"hp_current": 10**6, "hp_max": 10**6, "ac": 13, "str": 16, "dex": 11},
+            "statusEffects": ["in_combat"], "dialogue_state": {"mood": "aggressive" if i % 2 else "calm"},
+        })
+    gs.set_session_location_by_key("loc_Battlefield")
+    return gs
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"{'combatants':>10} {'ms/round':>10} {'us/combatant':>13}")
+    for combatants in (10, 100, 1000, 5000):
+        gs = make_state(combatants)
+        engine = CombatEngine(gs, auto_pcs=True)
+        engine.run_round()  # builds the roster and rolls initiative
+        start = time.perf_counter()
+        for _ in range(rounds):
+            engine.run_round()
+        per_round = (time.perf_counter() - start) / rounds
+        total = len(engine.ids)
+        print(f"{total:>10} {per_round * 1e3:>10.2f} {per_round * 1e6 / total:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
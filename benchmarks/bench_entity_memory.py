@@ -0,0 +1,74 @@
+"""
+Memory benchmark: NPCs as nested dicts (current game_state layout) vs compact __slots__ entities.
+
+    python benchmarks/bench_entity_memory.py [npc_count ...]
+"""
+import gc
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entities import NPC
+from game_state import GameState
+
+LOCATIONS = ["loc_Havenwood", "loc_Gloomwood", "loc_WearyWandererTavern"]
+ITEMS = ["item_Shortsword", "item_Torch", "item_Rope", "item_HealingPotion", "item_Rations"]
+STATUSES = ["poisoned", "frightened", "prone"]
+
+
+def make_npc_dicts(count: int) -> dict:
+    """
+    NPC dicts shaped like game_state's, built from JSON as they would be when loaded from a save.
+    """
+    template = GameState().game_state["actors"]["npcs"]["npc_GuardCaptainThorne"]
+    npcs = {}
+    for i in range(count):
+        npc = dict(template)
+        npc["name"] = f"Guard {i}"
+        npc["currentLocation"] = LOCATIONS[i % len(LOCATIONS)]
+        npc["stats"] = {"hp_current": 30, "hp_max": 30, "ac": 16, "str": 14, "dex": 12, "con": 13,
+                        "int": 10, "wis": 11, "cha": 9}
+        npc["inventory"] = ITEMS[: i % len(ITEMS) + 1]
+        npc["statusEffects"] = STATUSES[: i % 2]
+        npcs[f"npc_Guard{i}"] = npc
+    # Round-trip so every string is a fresh object, as with json.load
+    return json.loads(json.dumps(npcs))
+
+
+def measure_memory(build) -> int:
+    """
+    Bytes still allocated once `build` returns; transient dicts it parsed from are freed by then.
+    """
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'npcs':>8} {'dicts MiB':>10} {'slots MiB':>10} {'ratio':>6} {'to_prompt_dict us':>18} {'from_dict us':>13}")
+    for count in counts:
+        source = json.dumps(make_npc_dicts(count))
+        dict_bytes = measure_memory(lambda: json.loads(source))
+        slot_bytes = measure_memory(lambda: [NPC.from_dict(npc_id, npc) for npc_id, npc in json.loads(source).items()])
+
+        npcs = json.loads(source)
+        sample_id, sample = next(iter(npcs.items()))
+        compact = NPC.from_dict(sample_id, sample)
+        to_dict_us = min(timeit.repeat(compact.to_prompt_dict, number=10_000, repeat=3)) / 10_000 * 1e6
+        from_dict_us = min(timeit.repeat(lambda: NPC.from_dict(sample_id, sample), number=10_000, repeat=3)) / 10_000 * 1e6
+
+        print(f"{count:>8} {dict_bytes / 2**20:>10.1f} {slot_bytes / 2**20:>10.1f} "
+              f"{dict_bytes / max(slot_bytes, 1):>5.1f}x {to_dict_us:>18.2f} {from_dict_us:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Microbenchmark: routing MOVEMENT over the location graph of a large grid world.
+
+    python benchmarks/bench_location_routes.py [side]   # side x side locations
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location_graph import LocationGraph, plan_movement
+
+
+def make_world(side: int) -> dict:
+    locations = {}
+    for x in range(side):
+        for y in range(side):
+            connections = {}
+            for exit_key, (dx, dy) in {"north": (0, 1), "south": (0, -1), "east": (1, 0), "west": (-1, 0)}.items():
+                if 0 <= x + dx < side and 0 <= y + dy < side:
+                    connections[exit_key] = f"loc_{x + dx}_{y + dy}"
+            locations[f"loc_{x}_{y}"] = {"name": f"Field {x}-{y}", "connections": connections}
+    return locations
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    graph = LocationGraph.from_locations(make_world(side))
+    rng = random.Random(3)
+    start = "loc_0_0"
+    goals = [f"loc_{rng.randrange(side)}_{rng.randrange(side)}" for _ in range(200)]
+    print(f"{side * side} locations")
+
+    def cold():
+        graph._trees.clear()
+        return graph.route(start, goals[0])
+    per_call = min(timeit.repeat(cold, number=5, repeat=3)) / 5
+    print(f"{'route, cold (BFS)':<28} {per_call * 1e6:>10.1f} us/call")
+
+    for goal in goals:
+        graph.route(start, goal)
+    per_call = min(timeit.repeat(lambda: [graph.route(start, goal) for goal in goals], number=20, repeat=3)) / 20 / len(goals)
+    print(f"{'route, cached tree':<28} {per_call * 1e6:>10.1f} us/call")
+
+    def plan():
+        return plan_movement(graph, start, {"subtype": "MOVEMENT", "parameters": {"target_id": "Field 7-9"}})
+    plan()
+    per_call = min(timeit.repeat(plan, number=2000, repeat=3)) / 2000
+    print(f"{'plan_movement by name':<28} {per_call * 1e6:>10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: session rebuild via JSON round-trip deep copies (the old approach) vs the read-only projection,
+and the incremental sync after a single NPC's HP changes.
+
+    python benchmarks/bench_session_projection.py [npcs_at_location] [npcs_elsewhere]
+"""
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import GameState
+
+
+def make_world(npcs_here: int, npcs_elsewhere: int) -> GameState:
+    gs = GameState()
+    template = gs.game_state["actors"]["npcs"]["npc_GuardCaptainThorne"]
+    for i in range(npcs_here + npcs_elsewhere):
+        npc = json.loads(json.dumps(template))
+        npc["name"] = f"Guard {i}"
+        npc["currentLocation"] = "loc_Havenwood" if i < npcs_here else "loc_Gloomwood"
+        npc["knowledge"] = npc["knowledge"] * 4
+        gs.add_actor(f"npc_Guard{i}", npc)
+    gs.set_session_location_by_key("loc_Havenwood")
+    return gs
+
+
+def rebuild_with_deep_copies(gs: GameState) -> dict:
+    """
+    The session rebuild as it was before the projection: every location and actor through json.loads(json.dumps(...)).
+    """
+    location_id = next(iter(gs.game_state["session"]["currentLocation"]))
+    location = json.loads(json.dumps(gs.game_state["world"]["locations"][location_id]))
+    actors = {"pcs": {}, "npcs": {}}
+    for pc_id, pc in gs.game_state["actors"]["pcs"].items():
+        actors["pcs"][pc_id] = json.loads(json.dumps(pc))
+    for npc_id, npc in gs.game_state["actors"]["npcs"].items():
+        if npc.get("currentLocation") == location_id:
+            actors["npcs"][npc_id] = json.loads(json.dumps(npc))
+    return {"currentLocation": {location_id: location}, "currentActors": actors}
+
+
+def rebuild_with_projection(gs: GameState) -> dict:
+    location_id = next(iter(gs.game_state["session"]["currentLocation"]))
+    return gs.get_current_actors_by_location_id(location_id)
+
+
+def sync_after_hp_change(gs: GameState) -> dict:
+    npc_id = next(iter(gs.session["currentActors"]["npcs"]))
+    gs.set_value(("actors", "npcs", npc_id, "stats", "hp_current"), 10)
+    return gs.update_session_by_location()
+
+
+def measure(label: str, fn, gs: GameState, repeat: int) -> None:
+    fn(gs)
+    per_call = min(timeit.repeat(lambda: fn(gs), number=repeat, repeat=3)) / repeat
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [fn(gs) for _ in range(10)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename")) / len(results)
+
+    print(f"{label:<22} {per_call * 1e6:>12.1f} us/rebuild {allocated / 1024:>12.1f} KiB retained/rebuild")
+
+
+def main():
+    npcs_here = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    npcs_elsewhere = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    gs = make_world(npcs_here, npcs_elsewhere)
+    repeat = 20
+    print(f"Session rebuild with {npcs_here} NPCs at the location, {npcs_elsewhere} elsewhere")
+    measure("json deep copy", rebuild_with_deep_copies, gs, repeat)
+    measure("read-only projection", rebuild_with_projection, gs, repeat)
+    measure("incremental sync", sync_after_hp_change, gs, repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Microbenchmark: validate_events via recursive traverse_json over the session (the old approach)
+vs the per-version id index.
+
+    python benchmarks/bench_validate_events.py [npcs_at_location] [events]
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_validation import SessionIndexCache, validate_against_index
+from game_state import GameState
+
+
+def make_state(npcs_here: int) -> GameState:
+    gs = GameState()
+    template = gs.game_state["actors"]["npcs"]["npc_GuardCaptainThorne"]
+    for i in range(npcs_here):
+        npc = json.loads(json.dumps(template))
+        npc["name"] = f"Guard {i}"
+        npc["inventory"] = [f"item_Token{i}", "item_Spear"]
+        npc["knowledge"] = npc["knowledge"] * 4
+        gs.add_actor(f"npc_Guard{i}", npc)
+    gs.set_session_location_by_key("loc_Havenwood")
+    return gs
+
+
+def make_events(gs: GameState, count: int) -> list:
+    rng = random.Random(7)
+    npc_ids = list(gs.session["currentActors"]["npcs"])
+    events = []
+    for i in range(count):
+        subtype, target = rng.choice([
+            ("ATTACK", rng.choice(npc_ids)),
+            ("MOVEMENT", "loc_Gloomwood"),
+            ("INVENTORY", "item_Spear"),
+            ("INTERACTION", "npc_Missing"),
+        ])
+        events.append({"type": "PLAYER_ACTION", "subtype": subtype, "actor_id": "pc_Elara",
+                       "parameters": {"target_id": target}})
+    return events
+
+
+def traverse_json(data, target_id):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == target_id or value == target_id or traverse_json(value, target_id):
+                return True
+    elif isinstance(data, list):
+        for item in data:
+            if traverse_json(item, target_id):
+                return True
+    return False
+
+
+def validate_with_traversal(session: dict, events: list):
+    # As validate_events was: one traversal per event, two for invalid ones
+    validated, invalid = [], []
+    for event in events:
+        target_id = event.get("parameters", {}).get("target_id")
+        if target_id and traverse_json(session, target_id):
+            validated.append(event)
+        elif target_id and not traverse_json(session, target_id):
+            invalid.append(event)
+        else:
+            validated.append(event)
+    return validated, invalid
+
+
+def main():
+    npcs_here = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    gs = make_state(npcs_here)
+    session = gs.session
+    events = make_events(gs, event_count)
+    print(f"validate_events: {event_count} events against a session with {npcs_here} NPCs present")
+
+    per_call = min(timeit.repeat(lambda: validate_with_traversal(session, events), number=5, repeat=3)) / 5
+    print(f"{'traverse_json':<26} {per_call * 1e3:>10.2f} ms/call")
+
+    def cold():
+        # New cache each call: includes building the index
+        return validate_against_index(SessionIndexCache().get(session), [dict(e) for e in events])
+    per_call = min(timeit.repeat(cold, number=5, repeat=3)) / 5
+    print(f"{'id index (build + check)':<26} {per_call * 1e3:>10.2f} ms/call")
+
+    cache = SessionIndexCache()
+    cache.get(session)
+    per_call = min(timeit.repeat(lambda: validate_against_index(cache.get(session), [dict(e) for e in events]),
+                                 number=200, repeat=3)) / 200
+    print(f"{'id index (same version)':<26} {per_call * 1e3:>10.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
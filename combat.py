@@ -0,0 +1,340 @@
+import heapq
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dice import compile_dice
+
+IN_COMBAT = "in_combat"
+PROFICIENCY_BONUS = 2
+DEFAULT_STAT = 10
+DEFAULT_AC = 10
+
+# item id -> (damage dice, ability used for attack and damage)
+WEAPONS = {
+    "item_LongSword": ("1d8", "str"),
+    "item_Shortsword": ("1d6", "dex"),
+    "item_Mace": ("1d6", "str"),
+    "item_Dagger": ("1d4", "dex"),
+    "item_Spear": ("1d6", "str"),
+    "item_Greataxe": ("1d12", "str"),
+    "item_Shortbow": ("1d6", "dex"),
+}
+# Unarmed PCs punch; NPCs without a listed weapon use claws, teeth or a crude blade
+UNARMED = ("1d4", "str")
+NATURAL_WEAPON = ("1d6", "str")
+
+PARTY, HOSTILE = 0, 1
+
+# NPC turn policies
+AGGRESSIVE = "aggressive"   # attack the enemy with the lowest hp
+FOCUSED = "focused"         # keep hitting the same target until it drops
+COWARDLY = "cowardly"       # flee once below half hp, otherwise fight like FOCUSED
+_POLICY_CODES = {FOCUSED: 0, AGGRESSIVE: 1, COWARDLY: 2}
+_MOOD_POLICIES = {"aggressive": AGGRESSIVE, "enraged": AGGRESSIVE, "panicked": COWARDLY, "frightened": COWARDLY}
+
+
+def ability_modifier(score: int) -> int:
+    return (score - 10) // 2
+
+def weapon_for(actor: dict, kind: str) -> Tuple[str, str]:
+    for item_id in actor.get("inventory") or ():
+        if item_id in WEAPONS:
+            return WEAPONS[item_id]
+    return UNARMED if kind == "pc" else NATURAL_WEAPON
+
+def policy_for(actor: dict, kind: str) -> str:
+    """
+    PCs act through their events (or FOCUSED when auto-played); NPCs pick a policy from mood or status.
+    """
+    if kind == "pc":
+        return FOCUSED
+    if "frightened" in (actor.get("statusEffects") or ()):
+        return COWARDLY
+    mood = (actor.get("dialogue_state") or {}).get("mood", "")
+    return _MOOD_POLICIES.get(str(mood).lower(), FOCUSED)
+
+def side_for(actor: dict, kind: str) -> int:
+    if kind == "pc":
+        return PARTY
+    return HOSTILE if str(actor.get("dispositionToParty", "")).lower() == "hostile" else PARTY
+
+
+class _TargetPool:
+    """
+    Living combatants on one side: O(1) random picks (swap-remove list) and O(log n) lowest-hp picks
+    (heap with lazy deletion), so choosing targets never rescans the roster.
+    """
+    def __init__(self, members: List[int], hp: np.ndarray):
+        self.members = list(members)
+        self.position = {index: i for i, index in enumerate(self.members)}
+        self.heap = [(int(hp[index]), index) for index in self.members]
+        heapq.heapify(self.heap)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def remove(self, index: int) -> None:
+        i = self.position.pop(index, None)
+        if i is None:
+            return
+        last = self.members.pop()
+        if last != index:
+            self.members[i] = last
+            self.position[last] = i
+
+    def wounded(self, index: int, hp: int) -> None:
+        if index in self.position:
+            heapq.heappush(self.heap, (hp, index))
+
+    def random(self, roll: float) -> int:
+        return self.members[int(roll * len(self.members))]
+
+    def weakest(self, hp: np.ndarray) -> int:
+        while True:
+            value, index = self.heap[0]
+            if index in self.position and value == hp[index]:
+                return index
+            heapq.heappop(self.heap)
+
+
+class Roster:
+    """
+    The numbers combat needs for a set of actors, as parallel NumPy arrays (one slot per actor).
+    Built from a GameState once; plain data, so it can be shipped to worker processes (see encounter_sim.py).
+    """
+    def __init__(self, state, ids: List[str]):
+        rows = []
+        for actor_id in ids:
+            kind, actor = state.get_entity(actor_id)
+            stats = actor.get("stats") or {}
+            damage, ability = weapon_for(actor, kind)
+            modifier = ability_modifier(stats.get(ability, DEFAULT_STAT))
+            hp = stats.get("hp_current", 1)
+            rows.append((actor_id, kind, side_for(actor, kind), stats.get("ac", DEFAULT_AC),
+                         PROFICIENCY_BONUS + modifier, damage, modifier,
+                         _POLICY_CODES[policy_for(actor, kind)], stats.get("dex", DEFAULT_STAT),
+                         stats.get("hp_max", hp), hp))
+        self.ids = [row[0] for row in rows]
+        self.kinds = [row[1] for row in rows]
+        self.side = np.array([row[2] for row in rows], dtype=np.int8)
+        self.ac = np.array([row[3] for row in rows], dtype=np.int32)
+        self.attack_bonus = np.array([row[4] for row in rows], dtype=np.int32)
+        self.damage_modifier = np.array([row[6] for row in rows], dtype=np.int32)
+        self.policy = np.array([row[7] for row in rows], dtype=np.int8)
+        self.dex = np.array([row[8] for row in rows], dtype=np.int32)
+        self.initiative_bonus = (self.dex - 10) // 2
+        self.hp_max = np.array([row[9] for row in rows], dtype=np.int32)
+        self.hp = np.array([row[10] for row in rows], dtype=np.int32)
+        # Combatants sharing a damage expression are rolled together
+        self.damage_groups: Dict[str, np.ndarray] = {}
+        for damage in sorted({row[5] for row in rows}):
+            self.damage_groups[damage] = np.array([i for i, row in enumerate(rows) if row[5] == damage], dtype=np.intp)
+
+
+class CombatEngine:
+    """
+    Initiative-ordered combat at the session's location. Everyone there with the "in_combat" status takes part:
+    PCs and non-hostile NPCs on one side, hostile NPCs on the other.
+        engine = combat_engine_for(state)
+        summary = engine.run_round({"pc_Arin": "npc_OrcRaider"})
+    Each round rolls every attack and damage die in a few NumPy batches, resolves turns in initiative order
+    against a working hp array, and writes hp and status changes back as one atomic patch, so the per-round
+    cost grows linearly with the number of combatants.
+    """
+    def __init__(self, state, auto_pcs: bool = False):
+        self.state = state
+        self.auto_pcs = auto_pcs
+        self.round = 0
+        self.ids: List[str] = []
+        self._roster_key: Optional[Tuple[str, frozenset]] = None
+
+    # --- Roster ---
+
+    def participants(self) -> List[str]:
+        location_id = self.state._session_location_id()
+        if location_id is None:
+            return []
+        ids = []
+        for actor_id in self.state.get_actor_ids_at_location(location_id):
+            actor = self.state.get_actor(actor_id)
+            if actor and IN_COMBAT in (actor.get("statusEffects") or ()):
+                ids.append(actor_id)
+        return ids
+
+    def active(self) -> bool:
+        return bool(self.participants())
+
+    def _build(self, ids: List[str]) -> None:
+        """
+        Take the combatants' numbers from a Roster and roll initiative (d20 + dex modifier, ties by dex).
+        """
+        roster = Roster(self.state, ids)
+        self.ids, self.kinds, self.side, self.ac = roster.ids, roster.kinds, roster.side, roster.ac
+        self.attack_bonus, self.damage_modifier = roster.attack_bonus, roster.damage_modifier
+        self.policy, self.hp_max, self.damage_groups = roster.policy, roster.hp_max, roster.damage_groups
+        count = len(self.ids)
+        self.initiative = self.state.dice.roll_batch("1d20", count) + roster.initiative_bonus
+        # Highest initiative first, then highest dex
+        self.order = np.lexsort((-roster.dex, -self.initiative))
+        self.index_of = {actor_id: i for i, actor_id in enumerate(self.ids)}
+        self.targets = np.full(count, -1, dtype=np.intp)
+        # Combatants who dropped or fled keep their slot (and everyone keeps their initiative) until combat ends
+        self.out = np.zeros(count, dtype=bool)
+
+    def _refresh_roster(self) -> None:
+        ids = sorted(self.participants())
+        key = (self.state._session_location_id(), frozenset(ids))
+        if key != self._roster_key:
+            self._roster_key = key
+            self.round = 0
+            self._build(ids)
+
+    # --- Rounds ---
+
+    def run_round(self, actions: Optional[Dict[str, Optional[str]]] = None) -> dict:
+        """
+        Resolve one round. `actions` maps PC ids to the id they attack this round (None to hold);
+        PCs without an entry hold unless the engine was created with auto_pcs=True.
+        Returns the round number, initiative order, a log of every turn, final hp, and whether combat ended.
+        """
+        self._refresh_roster()
+        if not self.ids:
+            return {"round": self.round, "order": [], "log": [], "hp": {}, "ended": True, "winner": None}
+        self.round += 1
+        actions = actions or {}
+        count = len(self.ids)
+        hp = np.array([self._current_hp(actor_id) for actor_id in self.ids], dtype=np.int64)
+        start_hp = hp.copy()
+        hp[self.out] = np.minimum(hp[self.out], 0)
+
+        # All of the round's dice at once
+        dice = self.state.dice
+        attack_rolls = dice.rng.integers(1, 21, size=count)
+        damage = np.zeros(count, dtype=np.int64)
+        crit_damage = np.zeros(count, dtype=np.int64)
+        for expression, members in self.damage_groups.items():
+            compiled = compile_dice(expression)
+            damage[members] = compiled.roll_batch(dice.rng, len(members))
+            crit_damage[members] = compiled.roll_batch(dice.rng, len(members))
+        damage += self.damage_modifier
+        picks = dice.rng.random(count)
+
+        alive = hp > 0
+        pools = [_TargetPool(np.flatnonzero(alive & (self.side == side)).tolist(), hp) for side in (PARTY, HOSTILE)]
+        fled: List[int] = []
+        has_fled = np.zeros(count, dtype=bool)
+        log = []
+        for attacker in self.order:
+            attacker = int(attacker)
+            if hp[attacker] <= 0 or has_fled[attacker]:
+                continue
+            actor_id = self.ids[attacker]
+            enemies = pools[1 - self.side[attacker]]
+            if not len(enemies):
+                break
+
+            policy = self.policy[attacker]
+            is_pc = self.kinds[attacker] == "pc"
+            if is_pc and not self.auto_pcs:
+                target_id = actions.get(actor_id)
+                target = self.index_of.get(target_id, -1) if target_id else -1
+                # A target that is down or fled earlier this round can't be attacked; the PC holds instead
+                if target < 0 or hp[target] <= 0 or has_fled[target] or self.side[target] == self.side[attacker]:
+                    log.append({"actor_id": actor_id, "action": "hold"})
+                    continue
+            else:
+                if policy == _POLICY_CODES[COWARDLY] and hp[attacker] * 2 < self.hp_max[attacker]:
+                    fled.append(attacker)
+                    has_fled[attacker] = True
+                    pools[self.side[attacker]].remove(attacker)
+                    log.append({"actor_id": actor_id, "action": "flee"})
+                    continue
+                target = int(self.targets[attacker])
+                if policy == _POLICY_CODES[AGGRESSIVE]:
+                    target = enemies.weakest(hp)
+                elif target < 0 or hp[target] <= 0 or has_fled[target]:
+                    target = enemies.random(picks[attacker])
+                self.targets[attacker] = target
+
+            natural = int(attack_rolls[attacker])
+            total = natural + int(self.attack_bonus[attacker])
+            crit = natural == 20
+            hit = crit or (natural != 1 and total >= self.ac[target])
+            dealt = 0
+            if hit:
+                dealt = max(1, int(damage[attacker] + (crit_damage[attacker] if crit else 0)))
+                hp[target] -= dealt
+                if hp[target] <= 0:
+                    pools[self.side[target]].remove(target)
+                else:
+                    pools[self.side[target]].wounded(target, int(hp[target]))
+            log.append({"actor_id": actor_id, "action": "attack", "target_id": self.ids[target], "roll": natural,
+                        "total": total, "ac": int(self.ac[target]), "hit": bool(hit), "crit": crit, "damage": dealt})
+
+        ended = not len(pools[PARTY]) or not len(pools[HOSTILE])
+        winner = None
+        if ended:
+            winner = "party" if len(pools[PARTY]) else ("hostile" if len(pools[HOSTILE]) else None)
+        defeated = [self.ids[i] for i in np.flatnonzero((hp <= 0) & (start_hp > 0) & ~self.out)]
+        hp[self.out] = start_hp[self.out]
+        self._write_back(hp, start_hp, defeated, [self.ids[i] for i in fled], ended)
+        return {
+            "round": self.round,
+            "order": [self.ids[i] for i in self.order],
+            "log": log,
+            # Clamped like the write-back, so the narrator sees the hp that is stored
+            "hp": {actor_id: max(0, int(value)) for actor_id, value in zip(self.ids, hp)},
+            "defeated": defeated,
+            "fled": [self.ids[i] for i in fled],
+            "ended": ended,
+            "winner": winner,
+        }
+
+    def _current_hp(self, actor_id: str) -> int:
+        actor = self.state.get_actor(actor_id)
+        if actor is None:
+            return 0
+        return (actor.get("stats") or {}).get("hp_current", 1)
+
+    def _write_back(self, hp: np.ndarray, start_hp: np.ndarray, defeated: List[str], fled: List[str],
+                    ended: bool) -> None:
+        """
+        One patch for the whole round: changed hp, plus status changes for the defeated, the fled and,
+        when combat is over, everyone still standing.
+        """
+        operations = []
+        for i in np.flatnonzero(hp != start_hp):
+            kind = self.kinds[i]
+            pointer = f"/actors/{kind}s/{self.ids[i]}/stats/hp_current"
+            operations.append({"op": "add", "path": pointer, "value": max(0, int(hp[i]))})
+
+        leaving = set(defeated) | set(fled)
+        if ended:
+            leaving.update(self.ids[i] for i in np.flatnonzero(~self.out))
+        for actor_id in leaving:
+            kind, actor = self.state.get_entity(actor_id)
+            statuses = [status for status in actor.get("statusEffects") or () if status != IN_COMBAT]
+            if actor_id in defeated:
+                statuses.append("unconscious" if kind == "pc" else "dead")
+            operations.append({"op": "add", "path": f"/actors/{kind}s/{actor_id}/statusEffects", "value": statuses})
+        if operations:
+            self.state.apply_patch(operations)
+        if ended:
+            self._roster_key = None
+            return
+        for actor_id in leaving:
+            self.out[self.index_of[actor_id]] = True
+        location_id, ids = self._roster_key
+        self._roster_key = (location_id, ids - leaving)
+
+
+# One engine per table, so initiative carries over from round to round
+_engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def combat_engine_for(state) -> CombatEngine:
+    engine = _engines.get(state)
+    if engine is None:
+        engine = _engines[state] = CombatEngine(state)
+    return engine
@@ -0,0 +1,182 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# Rough tokens-per-character ratio for English text and JSON under llama/mistral tokenizers
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGETS = {
+    "interpreter": 600,
+    "narrator": 900,
+    "validator": 400,
+}
+
+# Fields each stage needs from every actor that is present, and extra fields for actors the player mentions
+STAGE_FIELDS = {
+    "interpreter": {
+        "location": ["name", "type"],
+        "pc": ["name", "class", "inventory"],
+        "npc": ["name", "role", "dispositionToParty"],
+        "mentioned": ["stats"],
+    },
+    "narrator": {
+        "location": ["name", "type", "description", "state"],
+        "pc": ["name", "class", "race", "statusEffects"],
+        "npc": ["name", "role", "dispositionToParty", "dialogue_state"],
+        "mentioned": ["stats", "knowledge", "statusEffects"],
+    },
+    "validator": {
+        "location": ["name", "description"],
+        "pc": ["name"],
+        "npc": ["name", "role"],
+        "mentioned": [],
+    },
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _render(value: Any) -> str:
+    # Sorted keys and no whitespace keep the rendering compact and byte-stable between turns
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+def _pick(entity: dict, fields: List[str]) -> dict:
+    return {field: entity[field] for field in fields if field in entity}
+
+def _mentions(player_input: Any) -> str:
+    if not isinstance(player_input, str):
+        player_input = _render(player_input)
+    return player_input.lower()
+
+def _is_mentioned(text: str, entity_id: str, entity: dict) -> bool:
+    if entity_id.lower() in text:
+        return True
+    name = str(entity.get("name", "")).lower()
+    if name and name in text:
+        return True
+    words = [w for w in re.split(r"\W+", name) if len(w) > 3 and w != "the"]
+    return any(re.search(rf"\b{re.escape(w)}\b", text) for w in words)
+
+
+class SessionContextBuilder:
+    """
+    Renders a compact, stable view of the session for one prompt stage, within a token budget.
+    Only the current location, its exits and the actors present are included, with the fields that stage uses;
+    entities the player mentions get extra detail. Lower-priority entries are dropped once the budget is reached.
+    """
+    def __init__(self, budgets: Dict[str, int] = None, memo_size: int = 64):
+        self.budgets = dict(budgets or DEFAULT_TOKEN_BUDGETS)
+        self.calls = 0
+        self.tokens_saved = 0
+        self.reused = 0
+        # Renders keyed on the session's version: an unchanged session is never re-rendered
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[tuple, Tuple[dict, str]]" = OrderedDict()
+        # id(session) -> (session, version, estimated tokens of the whole session), for the tokens_saved stat
+        self._full_tokens: "OrderedDict[int, Tuple[dict, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entries(self, session: dict, stage: str, player_input: Any) -> List[tuple]:
+        """
+        Context entries as (section, key, value) in priority order.
+        """
+        fields = STAGE_FIELDS[stage]
+        mentioned_text = _mentions(player_input)
+        entries = []
+
+        for location_id, location in (session.get("currentLocation") or {}).items():
+            entries.append(("location", "id", location_id))
+            for field, value in _pick(location, fields["location"]).items():
+                entries.append(("location", field, value))
+            for exit_key, destination_id in sorted((location.get("connections") or {}).items()):
+                entries.append(("exits", exit_key, destination_id))
+            for poi_id, poi in sorted((location.get("pointsOfInterest") or {}).items()):
+                entries.append(("pointsOfInterest", poi_id, poi.get("name", poi_id)))
+
+        actors = session.get("currentActors") or {}
+        ranked = []
+        for group, kind in (("pcs", "pc"), ("npcs", "npc")):
+            for actor_id, actor in sorted((actors.get(group) or {}).items()):
+                view = _pick(actor, fields[kind])
+                mentioned = _is_mentioned(mentioned_text, actor_id, actor)
+                if mentioned:
+                    view.update(_pick(actor, fields["mentioned"]))
+                hp = (actor.get("stats") or {}).get("hp_current")
+                if hp is not None and stage != "validator" and "stats" not in view:
+                    view["hp"] = hp
+                # Mentioned actors first, then PCs, then everyone else
+                ranked.append((0 if mentioned else (1 if kind == "pc" else 2), group, actor_id, view))
+        for _, group, actor_id, view in sorted(ranked, key=lambda r: r[0]):
+            entries.append((group, actor_id, view))
+        return entries
+
+    def build(self, session: dict, stage: str, player_input: Any = "", token_budget: int = None) -> str:
+        """
+        Return the rendered context for `stage` ("interpreter", "narrator" or "validator").
+        """
+        budget = token_budget or self.budgets[stage]
+        version = getattr(session, "version", None)
+        memo_key = None
+        if version is not None:
+            memo_key = (id(session), version, stage, _mentions(player_input), budget)
+            with self._lock:
+                entry = self._memo.get(memo_key)
+                # The session object is kept in the entry so its id can't be reused while cached
+                if entry is not None and entry[0] is session:
+                    self._memo.move_to_end(memo_key)
+                    self.calls += 1
+                    self.reused += 1
+                    return entry[1]
+
+        context: Dict[str, Dict[str, Any]] = {}
+        used = 2
+        for section, key, value in self._entries(session, stage, player_input):
+            cost = estimate_tokens(_render({key: value})) + (0 if section in context else estimate_tokens(section) + 2)
+            if used + cost > budget and section not in ("location",):
+                continue
+            context.setdefault(section, {})[key] = value
+            used += cost
+
+        rendered = _render(context)
+        full_tokens = self._full_size(session, version)
+        saved = max(0, full_tokens - estimate_tokens(rendered))
+        with self._lock:
+            self.calls += 1
+            self.tokens_saved += saved
+            if memo_key is not None:
+                self._memo[memo_key] = (session, rendered)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        print(f"[context] {stage}: {full_tokens} -> {estimate_tokens(rendered)} tokens (saved {saved})")
+        return rendered
+
+    def _full_size(self, session: dict, version) -> int:
+        # Stringifying the whole session is as costly as the prompt this avoids, so do it once per version
+        if version is None:
+            return estimate_tokens(str(session))
+        with self._lock:
+            entry = self._full_tokens.get(id(session))
+            if entry is not None and entry[0] is session and entry[1] == version:
+                self._full_tokens.move_to_end(id(session))
+                return entry[2]
+        tokens = estimate_tokens(str(session))
+        with self._lock:
+            self._full_tokens[id(session)] = (session, version, tokens)
+            while len(self._full_tokens) > self.memo_size:
+                self._full_tokens.popitem(last=False)
+        return tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "tokens_saved": self.tokens_saved,
+                "avg_tokens_saved": round(self.tokens_saved / self.calls, 1) if self.calls else 0.0,
+                "reused": self.reused,
+            }
+
+
+context_builder = SessionContextBuilder()
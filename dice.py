@@ -0,0 +1,239 @@
+import functools
+import itertools
+import math
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAX_DICE = 1000
+MAX_SIDES = 1000
+# Exact odds for keep-highest/lowest terms enumerate multisets of rolls; refuse past this many
+MAX_EXACT_MULTISETS = 200_000
+
+_TERM = re.compile(
+    r"(?P<sign>[+-])?\s*(?:"
+    r"(?P<count>\d*)d(?P<sides>\d+|%)(?:(?P<keep>kh|kl|k)(?P<keep_n>\d+))?(?P<adv>adv|dis)?"
+    r"|(?P<constant>\d+))\s*",
+    re.IGNORECASE,
+)
+
+
+class DiceError(ValueError):
+    pass
+
+
+class DiceTerm:
+    """
+    `count` dice with `sides` faces, optionally keeping only the `keep` highest (keep > 0) or lowest (keep < 0).
+    """
+    __slots__ = ("count", "sides", "keep", "sign")
+
+    def __init__(self, count: int, sides: int, keep: int = 0, sign: int = 1):
+        if not 1 <= count <= MAX_DICE or not 1 <= sides <= MAX_SIDES:
+            raise DiceError(f"Dice out of range: {count}d{sides}.")
+        if abs(keep) > count:
+            raise DiceError(f"Cannot keep {abs(keep)} of {count} dice.")
+        self.count = count
+        self.sides = sides
+        self.keep = keep
+        self.sign = sign
+
+    @property
+    def kept(self) -> int:
+        return abs(self.keep) or self.count
+
+    def roll_batch(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        rolls = rng.integers(1, self.sides + 1, size=(n, self.count), dtype=np.int32)
+        if self.keep:
+            rolls.sort(axis=1)
+            rolls = rolls[:, -self.keep:] if self.keep > 0 else rolls[:, :-self.keep]
+        return self.sign * rolls.sum(axis=1)
+
+    def counts(self) -> Tuple[int, List[int]]:
+        """
+        Exact distribution as (lowest total, outcome counts), with integer counts out of sides ** count.
+        """
+        if not self.keep or self.kept == self.count:
+            counts = [1]
+            for _ in range(self.count):
+                counts = _convolve(counts, [1] * self.sides)
+            return self.count, counts
+        if self.kept == 1:
+            return 1, _single_order_statistic(self.count, self.sides, highest=self.keep > 0)
+        if math.comb(self.count + self.sides - 1, self.count) > MAX_EXACT_MULTISETS:
+            raise DiceError(f"Exact odds for {self} are too expensive to enumerate.")
+        return self.kept, _keep_counts(self.count, self.sides, self.keep)
+
+    def __str__(self) -> str:
+        keep = "" if not self.keep else (f"kh{self.keep}" if self.keep > 0 else f"kl{-self.keep}")
+        return f"{self.count}d{self.sides}{keep}"
+
+
+def _convolve(a: List[int], b: List[int]) -> List[int]:
+    # Plain integer convolution keeps the counts exact (NumPy would overflow int64 for many dice)
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+def _single_order_statistic(count: int, sides: int, highest: bool) -> List[int]:
+    # Highest of N dice: P(max <= x) = (x / sides) ** N, so count(max == x) = x**N - (x-1)**N
+    counts = [x ** count - (x - 1) ** count for x in range(1, sides + 1)]
+    return counts if highest else counts[::-1]
+
+def _keep_counts(count: int, sides: int, keep: int) -> List[int]:
+    """
+    Enumerate multisets of rolls with their multinomial weights and sum the kept dice.
+    """
+    kept = abs(keep)
+    counts = [0] * (kept * (sides - 1) + 1)
+    factorial = math.factorial(count)
+    for combo in itertools.combinations_with_replacement(range(1, sides + 1), count):
+        weight = factorial
+        for _, group in itertools.groupby(combo):
+            weight //= math.factorial(len(list(group)))
+        chosen = combo[-kept:] if keep > 0 else combo[:kept]
+        counts[sum(chosen) - kept] += weight
+    return counts
+
+
+class DiceExpression:
+    """
+    A compiled dice expression such as "1d20+5", "2d20kh1+3", "4d6kl3", "d20adv" or "2d6+1d4-1".
+    Compile once with compile_dice(); roll single values or NumPy batches and get exact odds.
+    """
+    def __init__(self, text: str, terms: List[DiceTerm], constant: int):
+        self.text = text
+        self.terms = terms
+        self.constant = constant
+        self._distribution: Optional[Tuple[int, List[int], int]] = None
+
+    def roll(self, rng: np.random.Generator) -> int:
+        return int(self.roll_batch(rng, 1)[0])
+
+    def roll_batch(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        totals = np.full(n, self.constant, dtype=np.int64)
+        for term in self.terms:
+            totals += term.roll_batch(rng, n)
+        return totals
+
+    @property
+    def minimum(self) -> int:
+        return self.distribution()[0]
+
+    @property
+    def maximum(self) -> int:
+        low, counts, _ = self.distribution()
+        return low + len(counts) - 1
+
+    def distribution(self) -> Tuple[int, List[int], int]:
+        """
+        Exact outcome distribution as (lowest total, counts per total from there up, total outcome count).
+        """
+        if self._distribution is None:
+            low, counts, total = self.constant, [1], 1
+            for term in self.terms:
+                term_low, term_counts = term.counts()
+                if term.sign < 0:
+                    term_low, term_counts = -(term_low + len(term_counts) - 1), term_counts[::-1]
+                low += term_low
+                counts = _convolve(counts, term_counts)
+                total *= term.sides ** term.count
+            self._distribution = (low, counts, total)
+        return self._distribution
+
+    def probabilities(self) -> Dict[int, float]:
+        low, counts, total = self.distribution()
+        return {low + i: count / total for i, count in enumerate(counts) if count}
+
+    def success_probability(self, dc: int) -> float:
+        """
+        Exact probability that a roll meets or beats `dc`.
+        """
+        low, counts, total = self.distribution()
+        start = max(0, dc - low)
+        return sum(counts[start:]) / total
+
+    def mean(self) -> float:
+        low, counts, total = self.distribution()
+        return sum((low + i) * count for i, count in enumerate(counts)) / total
+
+    def __str__(self) -> str:
+        parts = [("-" if term.sign < 0 else "+") + str(term) for term in self.terms]
+        if self.constant:
+            parts.append(f"{self.constant:+d}")
+        return "".join(parts).lstrip("+") or "0"
+
+    def __repr__(self) -> str:
+        return f"DiceExpression({str(self)!r})"
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_dice(text: str, advantage: bool = False, disadvantage: bool = False) -> DiceExpression:
+    """
+    Parse a dice expression once. `advantage`/`disadvantage` (or an "adv"/"dis" suffix on a term) turn a
+    single d20 into 2d20 keep highest/lowest; both together cancel out.
+    """
+    source = text.strip()
+    if not source:
+        raise DiceError("Empty dice expression.")
+    terms, constant, position = [], 0, 0
+    while position < len(source):
+        match = _TERM.match(source, position)
+        if not match or match.end() == position or (position and not match.group("sign")):
+            raise DiceError(f"Invalid dice expression '{text}' at '{source[position:]}'.")
+        position = match.end()
+        sign = -1 if match.group("sign") == "-" else 1
+        if match.group("constant") is not None:
+            constant += sign * int(match.group("constant"))
+            continue
+        count = int(match.group("count") or 1)
+        sides = 100 if match.group("sides") == "%" else int(match.group("sides"))
+        keep = 0
+        if match.group("keep"):
+            keep = int(match.group("keep_n")) * (-1 if match.group("keep").lower() == "kl" else 1)
+        adv = (match.group("adv") or "").lower()
+        term_advantage = advantage or adv == "adv"
+        term_disadvantage = disadvantage or adv == "dis"
+        if count == 1 and not keep and term_advantage != term_disadvantage and (adv or sides == 20):
+            count, keep = 2, 1 if term_advantage else -1
+        terms.append(DiceTerm(count, sides, keep, sign))
+    return DiceExpression(text, terms, constant)
+
+
+def table_seed(table_id: str) -> int:
+    """
+    Stable seed for a table id, so each table gets its own reproducible dice stream.
+    """
+    return zlib.crc32(table_id.encode("utf-8"))
+
+
+class DiceRoller:
+    """
+    Per-table dice RNG. The stream is reseeded from (seed, turn, attempt) at the start of every turn,
+    so replaying a turn with the same inputs reproduces its rolls. `attempt` counts turns that changed
+    nothing and so did not advance the turn number, which keeps them from repeating the same rolls.
+    """
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+        self.turn = 0
+        self.attempt = 0
+        self.rng = np.random.default_rng([self.seed, self.turn, self.attempt])
+
+    def start_turn(self, turn: int) -> None:
+        self.attempt = self.attempt + 1 if turn == self.turn else 0
+        self.turn = turn
+        self.rng = np.random.default_rng([self.seed, turn, self.attempt])
+
+    def roll(self, expression: str, advantage: bool = False, disadvantage: bool = False) -> int:
+        return compile_dice(expression, advantage, disadvantage).roll(self.rng)
+
+    def roll_batch(self, expression: str, n: int, advantage: bool = False, disadvantage: bool = False) -> np.ndarray:
+        return compile_dice(expression, advantage, disadvantage).roll_batch(self.rng, n)
+
+    def probability(self, expression: str, dc: int, advantage: bool = False, disadvantage: bool = False) -> float:
+        return compile_dice(expression, advantage, disadvantage).success_probability(dc)
@@ -1,22 +1,73 @@
-import random
+import asyncio
+import os
+import time
 import winsound
-import yaml
 import json
 from termcolor import colored
 from typing import TypedDict, List, Annotated, Dict
 import operator
-import torch
-import torchaudio as ta
-from chatterbox.tts import ChatterboxTTS
 import langchain
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langgraph.graph import StateGraph, START, END
-from game_state import gamestate
+import weakref
+from game_state import GameState
+from combat import combat_engine_for
+from llm_clients import llm_registry
+from prompt_store import prompt_store
+from narrative_stream import NarrativeFieldExtractor
+from fast_intent import FastIntentResolver
+from event_schema import PLAYER_EVENTS_SCHEMA
+from event_repair import IdCorrector
+from event_validation import session_index_cache, validate_against_index
+from location_graph import plan_movement
+from llm_cache import response_cache
+from context_builder import context_builder
+from history import HistoryManager
+from session_manager import DEFAULT_SAVE_DIR, SessionManager
+from tts_worker import tts_worker
 
 langchain.verbose = True
 
+INTERPRETER_MODEL = "mistral"
+NARRATOR_MODEL = "llama3.1:8b"
+
+# When True, raw player input goes straight to a schema-constrained interpreter call,
+# skipping the separate user intent call
+SINGLE_STAGE_INTERPRETATION = False
+
+# Cache parsed interpretation results keyed on stage, normalized input, session digest and model.
+# Narration only uses the cache when a caller opts in, so it stays fresh by default.
+LLM_CACHE_ENABLED = True
+
+# Bounds on re-asking the LLM to fix events with invalid target ids
+MAX_REPAIR_ATTEMPTS = 3
+REPAIR_TIME_BUDGET = 20.0  # seconds
+
+# Back each table's world with a SQLite store (saves/<table>/world.sqlite3). Entities are loaded on demand
+# and each turn's changes are written in one transaction; False keeps the whole world in memory.
+USE_WORLD_STORE = False
+
+# Table played by the terminal loop in main()
+DEFAULT_TABLE_ID = "default"
+
+# Longest a narration waits for room in the TTS worker's queue before its audio is skipped
+AUDIO_QUEUE_TIMEOUT = 5.0  # seconds
+
+# Batch turns interpret each player's input as its own request; at most this many are in flight against Ollama
+# at once (match the server's OLLAMA_NUM_PARALLEL, or requests just queue there instead)
+BATCH_CONCURRENCY = 4
+
+repair_stats = {"local_fixes": 0, "llm_repairs": 0, "llm_calls_saved": 0, "dropped_events": 0}
+
+# Resolve plain single-action commands locally so they skip both interpretation LLM calls; one resolver per table
+_fast_resolvers: "weakref.WeakKeyDictionary[GameState, FastIntentResolver]" = weakref.WeakKeyDictionary()
+
+def fast_resolver_for(state: GameState) -> FastIntentResolver:
+    resolver = _fast_resolvers.get(state)
+    if resolver is None:
+        resolver = _fast_resolvers[state] = FastIntentResolver(state)
+    return resolver
+
 # --- 1. Agent State Definition ---
 # This class defines the "state" that is passed between all the nodes in our graph.
 # It remains unchanged as it's the core data structure for the agent.
@@ -29,130 +80,209 @@ class AgentState(TypedDict):
 # --- 2. LLM Interface Functions (TO BE IMPLEMENTED) ---
 # This is where you will integrate your Ollama and LangChain code.
 
+def _intent_chain():
+    return prompt_store.get("user_intent_prompt") | llm_registry.get(INTERPRETER_MODEL) | JsonOutputParser()
+
+def _interpreter_chain():
+    return prompt_store.get("interpreter_prompt") | llm_registry.get(INTERPRETER_MODEL) | JsonOutputParser()
+
+def _single_stage_chain():
+    # Constrained decoding against the event schema, so the output always parses
+    LLM = llm_registry.get(INTERPRETER_MODEL, format=PLAYER_EVENTS_SCHEMA)
+    return prompt_store.get("single_stage_prompt") | LLM | JsonOutputParser()
+
+def _narrator_chain():
+    return prompt_store.get("narrator_prompt") | llm_registry.get(NARRATOR_MODEL) | JsonOutputParser()
+
+def _narrator_stream_chain():
+    # No output parser: the raw tokens are parsed incrementally by NarrativeFieldExtractor
+    return prompt_store.get("narrator_prompt") | llm_registry.get(NARRATOR_MODEL)
+
+def _cache_key(stage: str, player_input, session: dict, model: str, use_cache: bool = True):
+    if not (LLM_CACHE_ENABLED and use_cache):
+        return None
+    return response_cache.make_key(stage, player_input, session, model)
+
+def _cache_lookup(key):
+    return response_cache.get(key) if key else None
+
+def _cache_store(key, result) -> None:
+    # Errors are never cached, so a transient failure doesn't stick
+    if key and result is not None and not (isinstance(result, dict) and result.get("type") == "ERROR"):
+        response_cache.set(key, result)
+
 def interpret_user_intent(player_input: str) -> str:
     """
     Use an LLM to interpret the player's intent from their input.
     This is a placeholder function; replace it with actual LLM integration.
     """
-    try:
-        with open("prompts.yaml", "r") as f:
-            system_prompt = yaml.safe_load(f)["user_intent_prompt"]
-    except Exception as e:
-        print(f"Error loading prompts.yaml: {e}")
-        return "Error"
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", "## Raw User Input: {user_input}"),
-    ])
+    # The intent prompt doesn't see the session, so it isn't part of the key
+    key = _cache_key("user_intent_prompt", player_input, {}, INTERPRETER_MODEL)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-    LLM = ChatOllama(base_url="http://localhost:11434", model="mistral", temperature=0.7, keep_alive=0)
-    output_parser = JsonOutputParser()
-    chain = prompt | LLM | output_parser
+    chain = _intent_chain()
 
     try:
         parsed_intent = chain.invoke({
             "user_input": player_input
         })
+        _cache_store(key, parsed_intent)
         return parsed_intent
     except Exception as e:
         print(f"An error occurred during LLM intent interpretation: {e}")
         return {"type": "ERROR", "detail": "Failed to interpret intent."}
 
-def interpret_player_input(player_input: str, invalid_events: List[dict]) -> str:
+def interpret_player_input(state: GameState, player_input: str, invalid_events: List[dict]) -> str:
     """
     Use an LLM to interpret the player's input and determine the next action.
     This is a placeholder function; replace it with actual LLM integration.
     """
-    try:
-        with open("prompts.yaml", "r") as f:
-            system_prompt = yaml.safe_load(f)["interpreter_prompt"]
-    except Exception as e:
-        print(f"Error loading prompts.yaml: {e}")
-        return "Error"
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", "## Parsed User Input:{user_input}"),
-    ])
+    session_context = context_builder.build(state.session, "interpreter", player_input)
+    # Repair calls depend on the invalid events, so only first-pass interpretations are cached
+    key = _cache_key("interpreter_prompt", player_input, session_context, INTERPRETER_MODEL,
+                     use_cache=not invalid_events)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-    LLM = ChatOllama(base_url="http://localhost:11434", model="mistral", temperature=0.7, keep_alive=0)
-    output_parser = JsonOutputParser()
-    chain = prompt | LLM | output_parser
+    chain = _interpreter_chain()
 
     try:
         parsed_event = chain.invoke({
-            "session": gamestate.game_state["session"],
+            "session": session_context,
             "invalid_events": invalid_events,
             "user_input": player_input
         })
+        _cache_store(key, parsed_event)
         return parsed_event
     except Exception as e:
         print(f"An error occurred during LLM interpretation: {e}")
         return {"type": "ERROR", "detail": "Failed to interpret input."}
     
-def validate_events(events: List[dict]) -> List[dict]:
+def interpret_player_events(state: GameState, player_input: str, invalid_events: List[dict]) -> List[dict]:
     """
-    Validate the interpreted events against the current game state.
-    This function traverses the game state JSON recursively to check for valid targets.
-    """
-    def traverse_json(data, target_id):
-        """
-        Recursively traverse the JSON-like dictionary to find the target_id.
-        """
-        if isinstance(data, dict):
-            for key, value in data.items():
-                if key == target_id or value == target_id or traverse_json(value, target_id):
-                    return True
-        elif isinstance(data, list):
-            for item in data:
-                if traverse_json(item, target_id):
-                    return True
-        return False
+    Single-stage interpretation: turn raw player input directly into PLAYER_ACTION events.
+    The model's output is constrained to PLAYER_EVENTS_SCHEMA by the backend.
+    """
+    session_context = context_builder.build(state.session, "interpreter", player_input)
+    key = _cache_key("single_stage_prompt", player_input, session_context, INTERPRETER_MODEL,
+                     use_cache=not invalid_events)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
+
+    chain = _single_stage_chain()
 
-    validated_events = []
-    invalid_events = []
+    try:
+        parsed_events = chain.invoke({
+            "session": session_context,
+            "invalid_events": invalid_events,
+            "user_input": player_input
+        })
+        _cache_store(key, parsed_events)
+        return parsed_events
+    except Exception as e:
+        print(f"An error occurred during single-stage interpretation: {e}")
+        return {"type": "ERROR", "detail": "Failed to interpret input."}
+
+def validate_events(state: GameState, events: List[dict]) -> List[dict]:
+    """
+    Validate the interpreted events against the current game state.
+    Target ids are checked against an index of the session's ids by kind, built once per session version;
+    MOVEMENT must target a location reachable from here (expanded into parameters.route), ATTACK an actor
+    present, INVENTORY an item held here.
+    """
+    index = session_index_cache.get(state.session)
+    # MOVEMENT may name any reachable location; it is routed over the location graph first
+    location_id = state._session_location_id()
+    routed_events, unroutable_events = [], []
     for event in events:
-        target_id = event.get("parameters", {}).get("target_id")
-        if target_id and traverse_json(gamestate.game_state["session"], target_id):
-            validated_events.append(event)
-        elif target_id and not traverse_json(gamestate.game_state["session"], target_id):
-            event["validation_error"] = f"Invalid target_id: {target_id}"
-            invalid_events.append(event)
-        else:
-            validated_events.append(event)
+        if location_id and isinstance(event, dict) and str(event.get("subtype", "")).upper() == "MOVEMENT":
+            error = plan_movement(state.locations_graph, location_id, event)
+            if error:
+                event["validation_error"] = error
+                unroutable_events.append(event)
+                continue
+        routed_events.append(event)
+    validated_events, invalid_events = validate_against_index(index, routed_events)
+    invalid_events = unroutable_events + invalid_events
 
     print(f"Validated Events: {validated_events}")
     print(f"Invalid Events: {invalid_events}")
     return validated_events, invalid_events
 
-def process_player_input(player_input: str) -> List[dict]:
+def _as_event_list(interpreted_events) -> List[dict]:
+    if isinstance(interpreted_events, dict) or isinstance(interpreted_events, str):
+        return [interpreted_events]
+    return interpreted_events
+
+def _repair_locally(state: GameState, invalid_events: List[dict]):
     """
-    Continuously process the player's input and validate events until all events are valid.
+    Fix invalid target ids by fuzzy-matching them against the session before involving the LLM.
+    Returns (valid_events, still_invalid_events).
     """
-    invalid_events = []
-    while True:
-        interpreted_events = interpret_player_input(player_input, invalid_events)
-        if isinstance(interpreted_events, dict) or isinstance(interpreted_events, str):
-            interpreted_events = [interpreted_events]
-        valid_events, invalid_events = validate_events(interpreted_events)
-        if len(valid_events) == len(interpreted_events):
-            return valid_events
-        print("Some events were invalid. Retrying interpretation...")
+    repaired, unresolved = IdCorrector(state.session).repair(invalid_events)
+    valid_events, invalid_events = validate_events(state, repaired)
+    repair_stats["local_fixes"] += len(valid_events)
+    return valid_events, unresolved + invalid_events
+
+def _repair_input(invalid_events: List[dict]) -> List[str]:
+    # Only the unresolved steps go back to the LLM, not the whole player input
+    return [event.get("narrative") or str(event) for event in invalid_events]
+
+def _repair_exhausted(llm_repairs: int, start: float, invalid_events: List[dict]) -> bool:
+    if llm_repairs < MAX_REPAIR_ATTEMPTS and time.perf_counter() - start < REPAIR_TIME_BUDGET:
+        return False
+    print(f"Dropping {len(invalid_events)} unresolved event(s) after {llm_repairs} repair call(s): {invalid_events}")
+    repair_stats["dropped_events"] += len(invalid_events)
+    return True
 
-def roll_tool(event: dict) -> dict:
+def process_player_input(state: GameState, player_input: str, single_stage: bool = False) -> List[dict]:
+    """
+    Interpret the player's input and validate the events.
+    Valid events are kept; invalid target ids are first corrected locally, and only the events that are
+    still unresolved go back to the LLM, within MAX_REPAIR_ATTEMPTS calls and REPAIR_TIME_BUDGET seconds.
+    With single_stage=True, player_input is the raw input and is interpreted in one constrained call.
+    """
+    interpret = interpret_player_events if single_stage else interpret_player_input
+    start = time.perf_counter()
+    validated_plan, invalid_events = validate_events(state, _as_event_list(interpret(state, player_input, [])))
+
+    llm_repairs = 0
+    while invalid_events:
+        fixed_events, invalid_events = _repair_locally(state, invalid_events)
+        validated_plan.extend(fixed_events)
+        if not invalid_events:
+            # Without the local fix this would have been another full interpretation call
+            repair_stats["llm_calls_saved"] += 1
+            break
+        if _repair_exhausted(llm_repairs, start, invalid_events):
+            break
+        print("Some events were invalid. Asking the LLM to repair them...")
+        llm_repairs += 1
+        repair_stats["llm_repairs"] += 1
+        retried_events = interpret(state, _repair_input(invalid_events), invalid_events)
+        fixed_events, invalid_events = validate_events(state, _as_event_list(retried_events))
+        validated_plan.extend(fixed_events)
+
+    return validated_plan
+
+def roll_tool(state: GameState, event: dict) -> dict:
     """
     Generalized roll tool for any event subtype (e.g., perception, athletics, stealth, etc.).
-    Rolls a d20, applies the relevant modifier, and returns the result.
+    Rolls a d20 from the table's seeded dice stream (with advantage/disadvantage if the event's
+    parameters.roll_mode asks for it), applies the relevant modifier, and returns the result
+    together with the exact odds of success.
     """
     # Get the actor performing the check
     actor_id = event.get("actor_id")
     if not actor_id:
         return {"error": "No actor_id provided for roll."}
 
-    # Find the actor in the current actors list
-    actors = gamestate.game_state.get("actors", {}).get("pcs", {})
-    actor = actors.get(actor_id)
+    # Find the actor (PC or NPC) through the id index
+    actor = state.get_actor(actor_id)
     if not actor:
         return {"error": f"Actor with id {actor_id} not found."}
 
@@ -178,7 +308,9 @@ def roll_tool(event: dict) -> dict:
     modifier = actor.get("stats", {}).get(stat_key, 0)
 
     # Roll a d20
-    roll = random.randint(1, 20)
+    roll_mode = event.get("parameters", {}).get("roll_mode", "normal")
+    advantage, disadvantage = roll_mode == "advantage", roll_mode == "disadvantage"
+    roll = state.dice.roll("1d20", advantage, disadvantage)
     total = roll + modifier
 
     # Determine DC (difficulty class), default to 2 if not provided
@@ -188,58 +320,92 @@ def roll_tool(event: dict) -> dict:
         "actor_id": actor_id,
         "subtype": subtype,
         "roll": roll,
+        "roll_mode": roll_mode,
         "modifier": modifier,
         "total": total,
         "dc": dc,
         "success": total >= dc,
+        "odds": round(state.dice.probability(f"1d20{modifier:+d}", dc, advantage, disadvantage), 4),
     }
     return result
 
-def execute_events(events: List[dict]) -> dict:
+def _movement_route(state: GameState, event: dict) -> List[str]:
+    """
+    The hops for a MOVEMENT event, each connected to the one before. The planned route is re-planned if an
+    earlier event this turn already moved the party somewhere else.
+    """
+    destination_id = event["parameters"]["target_id"]
+    current = state._session_location_id()
+    route = event["parameters"].get("route") or [destination_id]
+    if current and not state.locations_graph.is_adjacent(current, route[0]):
+        route = state.locations_graph.route(current, destination_id)
+        if route is None:
+            raise ValueError(f"Location '{destination_id}' cannot be reached from '{current}'.")
+    return route
+
+def execute_events(state: GameState, events: List[dict]) -> dict:
     """
     Execute the validated events and update the game state accordingly.
-    This is a placeholder function; replace it with actual game logic.
+    When actors at the session location are in combat, the batch's attacks become one combat round
+    (see combat.CombatEngine), in which NPCs take their turns too.
     """
     execution_results = []
+    # While anyone here is in combat, attacks are declared for the round and resolved by the combat engine
+    combat = combat_engine_for(state)
+    in_combat = combat.active()
+    attacks, attack_events = {}, []
     for event in events:
         if event.get("type") == "PLAYER_ACTION":
-            if event.get("subtype") == "MOVEMENT":
+            if in_combat and event.get("subtype") == "ATTACK":
+                attacks[event.get("actor_id")] = event.get("parameters", {}).get("target_id")
+                attack_events.append(event)
+            elif event.get("subtype") == "MOVEMENT":
                 destination_id = event.get("parameters", {}).get("target_id")
                 if destination_id:
                     try:
-                        gamestate.set_session_location_by_key(destination_id)
-                        gamestate.set_current_actors_by_location_id(destination_id)
-                        execution_results.append({"event": event, "result": f"Moved to {destination_id}"})
+                        route = _movement_route(state, event)
+                        # The party travels together: every PC at the departure location goes along with the actor
+                        pcs = state.game_state["actors"]["pcs"]
+                        departure = state._session_location_id()
+                        travellers = sorted(a for a in state.get_actor_ids_at_location(departure) if a in pcs) if departure else []
+                        if state.get_actor(event.get("actor_id")) and event["actor_id"] not in travellers:
+                            travellers.append(event["actor_id"])
+                        for hop in route:
+                            state.set_session_location_by_key(hop)
+                            for actor_id in travellers:
+                                state.move_actor(actor_id, hop)
+                        state.set_current_actors_by_location_id(destination_id)
+                        via = f" via {', '.join(route[:-1])}" if len(route) > 1 else ""
+                        execution_results.append({"event": event, "result": f"Moved to {destination_id}{via}"})
                     except ValueError as ve:
                         execution_results.append({"event": event, "result": str(ve)})
             
             elif event.get("subtype") in ["PERCEPTION", "ATHLETICS", "STEALTH", "INVESTIGATION", "SLEIGHT_OF_HAND", "ATTACK"]:
-                roll_result = roll_tool(event)
+                roll_result = roll_tool(state, event)
                 execution_results.append({"event": event, "result": roll_result})
             else:
                 execution_results.append({"event": event, "result": "Action executed."})
 
+    if in_combat and combat.active():
+        round_result = combat.run_round(attacks)
+        execution_results.append({"event": {"type": "COMBAT_ROUND", "attacks": attack_events}, "result": round_result})
+
     return execution_results
 
-def generate_narrative(user_input: str, validated_plan: List[dict], execution_results: List[dict], messages: List[dict]) -> str:
+def generate_narrative(state: GameState, user_input: str, validated_plan: List[dict], execution_results: List[dict], messages: List[dict],
+                       use_cache: bool = False) -> str:
     """
     Generate a narrative description of the executed events.
+    Narration bypasses the response cache unless use_cache=True.
     """
-    try:
-        with open("prompts.yaml", "r") as f:
-            system_prompt = yaml.safe_load(f)["narrator_prompt"]
-    except Exception as e:
-        print(f"Error loading prompts.yaml: {e}")
-        return "Error"
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", "{user_input}")
-    ])
+    session_context = context_builder.build(state.session, "narrator", user_input)
+    key = _cache_key("narrator_prompt", [user_input, execution_results], session_context,
+                     NARRATOR_MODEL, use_cache=use_cache)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-    LLM = ChatOllama(base_url="http://localhost:11434", model="llama3.1:8b", temperature=0.7, keep_alive=0)
-    output_parser = JsonOutputParser()
-    chain = prompt | LLM | output_parser
+    chain = _narrator_chain()
 
     max_retries = 5
     for attempt in range(max_retries):
@@ -248,33 +414,60 @@ def generate_narrative(user_input: str, validated_plan: List[dict], execution_re
                 "user_input": user_input,
                 "validated_plan": validated_plan,
                 "execution_results": execution_results,
-                "session": gamestate.game_state["session"],
+                "session": session_context,
                 "messages": messages  # Pass the history here
             })
+            _cache_store(key, parsed_narrative)
             return parsed_narrative
         except Exception as e:
             print(f"An error occurred during LLM narration (attempt {attempt + 1}): {e}")
             if attempt == max_retries - 1:
                 return {"type": "ERROR", "detail": "Failed to generate narration after retries."}
 
-def validate_narrative(narrative: dict) -> dict:
+def stream_narrative(state: GameState, user_input: str, validated_plan: List[dict], execution_results: List[dict], messages: List[dict]):
     """
-    Use an LLM to validate that the narrative is consistent with the game state.
-    Returns True if the narrative is valid, False otherwise.
+    Streaming version of generate_narrative.
+    Yields the text of the "narrative" field chunk by chunk as the model generates it.
     """
+    session_context = context_builder.build(state.session, "narrator", user_input)
+    chain = _narrator_stream_chain()
+    extractor = NarrativeFieldExtractor()
+    start = time.perf_counter()
+    first_word_at = None
+
     try:
-        with open("prompts.yaml", "r") as f:
-            system_prompt = yaml.safe_load(f)["validate_narrative_prompt"]
+        for chunk in chain.stream({
+            "user_input": user_input,
+            "validated_plan": validated_plan,
+            "execution_results": execution_results,
+            "session": session_context,
+            "messages": messages
+        }):
+            text = extractor.feed(chunk.content)
+            if text:
+                if first_word_at is None:
+                    first_word_at = time.perf_counter() - start
+                yield text
+            if extractor.done:
+                break
     except Exception as e:
-        print(f"Error loading prompts.yaml: {e}")
-        return {"Error": "Failed to load prompts."}
+        print(f"An error occurred during streamed narration: {e}")
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", "{narrative}")
-    ])
+    remainder = extractor.finish()
+    if remainder:
+        yield remainder
+    if first_word_at is not None:
+        print(f"Narration time to first word: {first_word_at:.2f}s, total: {time.perf_counter() - start:.2f}s")
 
-    LLM = ChatOllama(base_url="http://localhost:11434", model="llama3.1:8b", temperature=0.7, keep_alive=0)
+def validate_narrative(state: GameState, narrative: dict) -> dict:
+    """
+    Use an LLM to validate that the narrative is consistent with the game state.
+    Returns True if the narrative is valid, False otherwise.
+    """
+    session_context = context_builder.build(state.session, "validator", narrative["narrative"])
+    prompt = prompt_store.get("validate_narrative_prompt")
+
+    LLM = llm_registry.get(NARRATOR_MODEL)
 
     output_parser = JsonOutputParser()
     chain = prompt | LLM | output_parser
@@ -282,112 +475,458 @@ def validate_narrative(narrative: dict) -> dict:
     try:
         result = chain.invoke({
             "narrative": narrative["narrative"],
-            "session": gamestate.game_state["session"]
+            "session": session_context
         })
         return narrative
     except Exception as e:
         print(f"An error occurred during narrative validation: {e}")
         return {"Error": "Failed to validate narrative."}
 
-def generate_narrative_audio(narrative: str):
-    AUDIO_PROMPT_PATH = "resources/bg3narrator.wav"
-    model = ChatterboxTTS.from_pretrained(device="cuda")
+# --- 3. Async Turn Pipeline ---
+# The same stages built on ainvoke, so many tables can share one event loop and one Ollama server.
+# CPU-bound game logic runs in worker threads to keep the loop free while other tables wait on the LLM.
+
+async def ainterpret_user_intent(player_input: str) -> str:
+    """
+    Async version of interpret_user_intent.
+    """
+    key = _cache_key("user_intent_prompt", player_input, {}, INTERPRETER_MODEL)
+    cached = await asyncio.to_thread(_cache_lookup, key)
+    if cached is not None:
+        return cached
+
+    chain = _intent_chain()
+
     try:
-        audio = model.generate(narrative, audio_prompt_path=AUDIO_PROMPT_PATH)
+        parsed_intent = await chain.ainvoke({
+            "user_input": player_input
+        })
+        await asyncio.to_thread(_cache_store, key, parsed_intent)
+        return parsed_intent
     except Exception as e:
-        print(f"Error generating audio: {e}")
-        return
-    # Save to a file
-    ta.save("./response.wav", audio, model.sr, encoding="PCM_S", bits_per_sample=16)
-    del model
-    torch.cuda.empty_cache()
-
-def play_narrative_audio():
-    AUDIO_FILE_PATH = "./response.wav"
-    winsound.PlaySound(AUDIO_FILE_PATH, winsound.SND_FILENAME | winsound.SND_ASYNC)
-    return
+        print(f"An error occurred during LLM intent interpretation: {e}")
+        return {"type": "ERROR", "detail": "Failed to interpret intent."}
 
-def main():
-    # Update only relevant fields in the session
-    gamestate.set_session_location_by_key("loc_Havenwood")
-    gamestate.set_current_actors_by_location_id("loc_Havenwood")
-    
-    messages = []  # <-- Track message history here
+async def ainterpret_player_input(state: GameState, player_input: str, invalid_events: List[dict]) -> str:
+    """
+    Async version of interpret_player_input.
+    """
+    session_context = context_builder.build(state.session, "interpreter", player_input)
+    key = _cache_key("interpreter_prompt", player_input, session_context, INTERPRETER_MODEL,
+                     use_cache=not invalid_events)
+    cached = await asyncio.to_thread(_cache_lookup, key)
+    if cached is not None:
+        return cached
 
-    while True:
-        print(colored(json.dumps(gamestate.game_state["session"], indent=2), "cyan"))
+    chain = _interpreter_chain()
 
-        player_input = input(colored(">>> ", "yellow").strip())
+    try:
+        parsed_event = await chain.ainvoke({
+            "session": session_context,
+            "invalid_events": invalid_events,
+            "user_input": player_input
+        })
+        await asyncio.to_thread(_cache_store, key, parsed_event)
+        return parsed_event
+    except Exception as e:
+        print(f"An error occurred during LLM interpretation: {e}")
+        return {"type": "ERROR", "detail": "Failed to interpret input."}
+
+async def ainterpret_player_events(state: GameState, player_input: str, invalid_events: List[dict]) -> List[dict]:
+    """
+    Async version of interpret_player_events.
+    """
+    session_context = context_builder.build(state.session, "interpreter", player_input)
+    key = _cache_key("single_stage_prompt", player_input, session_context, INTERPRETER_MODEL,
+                     use_cache=not invalid_events)
+    cached = await asyncio.to_thread(_cache_lookup, key)
+    if cached is not None:
+        return cached
+
+    chain = _single_stage_chain()
 
-        if player_input.lower() in ["exit", "quit"]:
+    try:
+        parsed_events = await chain.ainvoke({
+            "session": session_context,
+            "invalid_events": invalid_events,
+            "user_input": player_input
+        })
+        await asyncio.to_thread(_cache_store, key, parsed_events)
+        return parsed_events
+    except Exception as e:
+        print(f"An error occurred during single-stage interpretation: {e}")
+        return {"type": "ERROR", "detail": "Failed to interpret input."}
+
+async def aprocess_player_input(state: GameState, player_input: str, single_stage: bool = False) -> List[dict]:
+    """
+    Async version of process_player_input.
+    """
+    interpret = ainterpret_player_events if single_stage else ainterpret_player_input
+    start = time.perf_counter()
+    interpreted_events = _as_event_list(await interpret(state, player_input, []))
+    validated_plan, invalid_events = await asyncio.to_thread(validate_events, state, interpreted_events)
+
+    llm_repairs = 0
+    while invalid_events:
+        fixed_events, invalid_events = await asyncio.to_thread(_repair_locally, state, invalid_events)
+        validated_plan.extend(fixed_events)
+        if not invalid_events:
+            repair_stats["llm_calls_saved"] += 1
             break
+        if _repair_exhausted(llm_repairs, start, invalid_events):
+            break
+        print("Some events were invalid. Asking the LLM to repair them...")
+        llm_repairs += 1
+        repair_stats["llm_repairs"] += 1
+        retried_events = _as_event_list(await interpret(state, _repair_input(invalid_events), invalid_events))
+        fixed_events, invalid_events = await asyncio.to_thread(validate_events, state, retried_events)
+        validated_plan.extend(fixed_events)
 
-        # Track player input
-        messages.append({"role": "player", "content": player_input})
+    return validated_plan
 
-        try:
-            interpreted_intent = interpret_user_intent(player_input)
-            print("\n\n>>>>> INTERPRETED_INTENT <<<<<\n\n", interpreted_intent, "\n\n>>>>> END INTERPRETED_INTENT <<<<<\n\n")
-            # Track interpreted intent
-            messages.append({"role": "system", "content": f"Interpreted Intent: {interpreted_intent}"})
-        except Exception as e:
-            print(f"Error interpreting user intent: {e}")
-            return
-        
-        try:
-            validated_plan = process_player_input(interpreted_intent)
-            print("\n\n>>>>> VALIDATED_PLAN <<<<<\n\n", validated_plan, "\n\n>>>>> END VALIDATED_PLAN <<<<<\n\n")
-            # Track validated plan
-            messages.append({"role": "system", "content": f"Validated Plan: {validated_plan}"})
-        except Exception as e:
-            print(f"Error interpreting input: {e}")
-            return
+async def aexecute_events(state: GameState, events: List[dict]) -> dict:
+    """
+    Run execute_events in a worker thread.
+    """
+    return await asyncio.to_thread(execute_events, state, events)
 
+async def agenerate_narrative(state: GameState, user_input: str, validated_plan: List[dict], execution_results: List[dict], messages: List[dict],
+                              use_cache: bool = False) -> str:
+    """
+    Async version of generate_narrative.
+    """
+    session_context = context_builder.build(state.session, "narrator", user_input)
+    key = _cache_key("narrator_prompt", [user_input, execution_results], session_context,
+                     NARRATOR_MODEL, use_cache=use_cache)
+    cached = await asyncio.to_thread(_cache_lookup, key)
+    if cached is not None:
+        return cached
+
+    chain = _narrator_chain()
+
+    max_retries = 5
+    for attempt in range(max_retries):
         try:
-            execution_results = execute_events(validated_plan)
-            print("\n\n>>>>> EXECUTION_RESULTS <<<<<\n\n", execution_results, "\n\n>>>>> END EXECUTION_RESULTS <<<<<\n\n")
-            # Track execution results
-            messages.append({"role": "system", "content": f"Execution Results: {execution_results}"})
+            parsed_narrative = await chain.ainvoke({
+                "user_input": user_input,
+                "validated_plan": validated_plan,
+                "execution_results": execution_results,
+                "session": session_context,
+                "messages": messages
+            })
+            await asyncio.to_thread(_cache_store, key, parsed_narrative)
+            return parsed_narrative
         except Exception as e:
-            print(f"Error executing events: {e}")
-            return
+            print(f"An error occurred during LLM narration (attempt {attempt + 1}): {e}")
+            if attempt == max_retries - 1:
+                return {"type": "ERROR", "detail": "Failed to generate narration after retries."}
 
+async def astream_narrative(state: GameState, user_input: str, validated_plan: List[dict], execution_results: List[dict], messages: List[dict]):
+    """
+    Async version of stream_narrative.
+    """
+    session_context = context_builder.build(state.session, "narrator", user_input)
+    chain = _narrator_stream_chain()
+    extractor = NarrativeFieldExtractor()
+
+    try:
+        async for chunk in chain.astream({
+            "user_input": user_input,
+            "validated_plan": validated_plan,
+            "execution_results": execution_results,
+            "session": session_context,
+            "messages": messages
+        }):
+            text = extractor.feed(chunk.content)
+            if text:
+                yield text
+            if extractor.done:
+                break
+    except Exception as e:
+        print(f"An error occurred during streamed narration: {e}")
+
+    remainder = extractor.finish()
+    if remainder:
+        yield remainder
+
+def _is_error(result) -> bool:
+    return isinstance(result, dict) and result.get("type") == "ERROR"
+
+async def _ainterpret_one(state: GameState, actor_id: str, player_input: str, semaphore: asyncio.Semaphore) -> dict:
+    """
+    One player's part of a batch turn: intent -> validated events, with its own timing and error.
+    """
+    queued = time.perf_counter()
+    async with semaphore:
+        start = time.perf_counter()
+        report = {"actor_id": actor_id, "input": player_input, "interpreted_intent": None, "events": [],
+                  "error": None, "wait_ms": round((start - queued) * 1e3, 1)}
         try:
-            narrative = generate_narrative(player_input, validated_plan, execution_results, messages)
-            print("\n\n>>>>> NARRATIVE <<<<<\n\n", narrative, "\n\n>>>>> END NARRATIVE <<<<<\n\n")
-            # Track narrative
-            # messages.append({"role": "narrator", "content": narrative.get("narrative", str(narrative))})
+            events = fast_resolver_for(state).resolve(player_input, actor_id)
+            if events:
+                report["interpreted_intent"] = [event["narrative"] for event in events]
+            else:
+                # The speaker goes in with the text, so the prompt knows whose action it is and two players
+                # typing the same command don't share a cache entry
+                intent = {"actor_id": actor_id, "input": player_input}
+                if not SINGLE_STAGE_INTERPRETATION:
+                    interpreted = await ainterpret_user_intent(intent)
+                    if _is_error(interpreted):
+                        raise ValueError(interpreted.get("detail", "Failed to interpret intent."))
+                    intent = {"actor_id": actor_id, "input": interpreted}
+                report["interpreted_intent"] = intent["input"]
+                events = await aprocess_player_input(state, intent, single_stage=SINGLE_STAGE_INTERPRETATION)
+            for event in events:
+                if isinstance(event, dict) and not _is_error(event):
+                    # The player's input only speaks for their own character, whoever the model named
+                    event["actor_id"] = actor_id
+                    report["events"].append(event)
         except Exception as e:
-            print(f"Error generating narrative: {e}")
-            return
+            print(f"Interpreting input from {actor_id} failed: {e}")
+            report["error"] = str(e)
+        report["latency_ms"] = round((time.perf_counter() - start) * 1e3, 1)
+    return report
+
+async def ainterpret_batch(state: GameState, player_inputs: List[tuple], concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """
+    Interpret a batch turn's inputs, given as (actor_id, input) pairs, one player per request and up to
+    `concurrency` at a time. A failing player gets an error in their report and contributes no events; the
+    others are unaffected. Events are merged in the order the players were given, whatever order they finish in.
+    Returns {"validated_plan": merged events, "players": per-player reports with latency_ms and wait_ms}.
+    """
+    # Bring the session up to date before the players read it concurrently
+    state.session
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    reports = await asyncio.gather(*(
+        _ainterpret_one(state, actor_id, player_input, semaphore) for actor_id, player_input in player_inputs
+    ))
+    return {
+        "validated_plan": [event for report in reports for event in report["events"]],
+        "players": list(reports),
+    }
+
+def interpret_batch(state: GameState, player_inputs: List[tuple], concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """
+    Blocking wrapper around ainterpret_batch, for callers without an event loop (e.g. play_test.py).
+    """
+    return asyncio.run(ainterpret_batch(state, player_inputs, concurrency))
+
+async def run_turn(state: GameState, player_input: str, messages: HistoryManager, on_narrative_chunk=None, actor_id: str = None) -> dict:
+    """
+    Run one full turn: intent -> plan -> execution -> narrative.
+    Appends the turn to the `messages` history and returns every stage's output.
+    If `on_narrative_chunk` is given, the narration is streamed to it as it is generated.
+    `state` must be held through SessionManager.lease() for the whole turn (see run_table_turn).
+    """
+    messages.append({"role": "player", "content": player_input})
+
+    validated_plan = fast_resolver_for(state).resolve(player_input, actor_id)
+    if validated_plan:
+        interpreted_intent = [event["narrative"] for event in validated_plan]
+    elif SINGLE_STAGE_INTERPRETATION:
+        interpreted_intent = player_input
+    else:
+        interpreted_intent = await ainterpret_user_intent(player_input)
+    messages.append({"role": "system", "content": f"Interpreted Intent: {interpreted_intent}"})
+
+    if not validated_plan:
+        validated_plan = await aprocess_player_input(state, interpreted_intent, single_stage=SINGLE_STAGE_INTERPRETATION)
+    messages.append({"role": "system", "content": f"Validated Plan: {validated_plan}"})
+
+    execution_results = await aexecute_events(state, validated_plan)
+    messages.append({"role": "system", "content": f"Execution Results: {execution_results}"})
+
+    if on_narrative_chunk is None:
+        narrative = await agenerate_narrative(state, player_input, validated_plan, execution_results, messages.prompt_messages())
+    else:
+        chunks = []
+        async for text in astream_narrative(state, player_input, validated_plan, execution_results, messages.prompt_messages()):
+            chunks.append(text)
+            on_narrative_chunk(text)
+        narrative = {"narrative": "".join(chunks)}
+    messages.append({"role": "system", "content": f"Validated Narrative: {narrative}"})
+    # Older turns are summarized in the background, after the narration is out
+    await asyncio.to_thread(messages.end_turn)
+    # Appends to the event log, may write a snapshot and flushes the world store: kept off the event loop
+    await asyncio.to_thread(state.commit_turn)
+
+    return {
+        "interpreted_intent": interpreted_intent,
+        "validated_plan": validated_plan,
+        "execution_results": execution_results,
+        "narrative": narrative,
+    }
+
+async def run_table_turn(sessions: SessionManager, table_id: str, player_input: str, messages: HistoryManager,
+                         on_narrative_chunk=None, actor_id: str = None) -> dict:
+    """
+    run_turn on a table leased from `sessions`, so loading other tables can't evict it partway through the turn.
+    """
+    with sessions.lease(table_id) as state:
+        return await run_turn(state, player_input, messages, on_narrative_chunk, actor_id)
+
+def summarize_history(summary: str, turns: List[List[dict]]) -> str:
+    """
+    Fold turns that have left the history window into the rolling story summary.
+    Runs on HistoryManager's background thread, after narration.
+    """
+    chain = prompt_store.get("history_summary_prompt") | llm_registry.get(NARRATOR_MODEL) | JsonOutputParser()
+    result = chain.invoke({
+        "summary": summary or "(nothing yet)",
+        "turns": turns
+    })
+    return result.get("summary", summary) if isinstance(result, dict) else str(result)
+
+def narration_audio_path(table_id: str = DEFAULT_TABLE_ID) -> str:
+    # Next to the table's saves, so tables sharing the worker never overwrite each other's narration
+    return os.path.join(DEFAULT_SAVE_DIR, table_id, "narration.wav")
+
+def generate_narrative_audio(narrative: str, table_id: str = DEFAULT_TABLE_ID, path: str = None) -> dict:
+    """
+    Synthesize the narration through the resident TTS worker, which loads ChatterboxTTS once per process.
+    Writes to `path`, by default the table's narration_audio_path().
+    Returns the job report (path, rtf, queue_wait_seconds, ...), or {"error": ...} if it failed or the queue was full.
+    """
+    try:
+        report = tts_worker().synthesize(narrative, table_id=table_id, path=path or narration_audio_path(table_id),
+                                         timeout=AUDIO_QUEUE_TIMEOUT)
+    except RuntimeError as e:  # TTSBusy, or the worker could not load the model
+        print(f"Error generating audio: {e}")
+        return {"error": str(e)}
+    if report.get("error"):
+        print(f"Error generating audio: {report['error']}")
+    else:
+        print(f"[tts] {report['audio_seconds']}s of audio, RTF {report['rtf']}, queued {report['queue_wait_seconds']}s")
+    return report
+
+def play_narrative_audio(table_id: str = DEFAULT_TABLE_ID, path: str = None):
+    winsound.PlaySound(path or narration_audio_path(table_id), winsound.SND_FILENAME | winsound.SND_ASYNC)
+    return
+
+def main():
+    # Load the models once up front so the first turn doesn't pay a cold start
+    llm_registry.warm([INTERPRETER_MODEL, NARRATOR_MODEL])
+
+    # Each table records every state change per turn under saves/<table>; resumes from the saved log if there is one
+    sessions = SessionManager(world_store=USE_WORLD_STORE)
+    # Leased for the whole session, so the table is never evicted while a turn is running on it
+    with sessions.lease(DEFAULT_TABLE_ID) as state:
+        fast_resolver = fast_resolver_for(state)
+
+        # Update only relevant fields in the session
+        if state.event_log.turn == 0:
+            state.set_session_location_by_key("loc_Havenwood")
+            state.set_current_actors_by_location_id("loc_Havenwood")
+            state.commit_turn()
+    
+        # Track message history here; only the last few turns are passed to the narrator verbatim
+        messages = HistoryManager(state, summarizer=summarize_history)
+
+        while True:
+            print(colored(json.dumps(state.session, indent=2), "cyan"))
+
+            player_input = input(colored(">>> ", "yellow").strip())
+
+            if player_input.lower() in ["exit", "quit"]:
+                break
+
+            if player_input.lower() == "undo":
+                undone = state.undo_last_turn()
+                print(colored(f"Undid turn {undone}." if undone else "Nothing to undo.", "magenta"))
+                continue
+
+            # Track player input
+            messages.append({"role": "player", "content": player_input})
+
+            # Plain commands are resolved locally and skip both interpretation calls
+            validated_plan = fast_resolver.resolve(player_input)
+            if validated_plan:
+                interpreted_intent = [event["narrative"] for event in validated_plan]
+                messages.append({"role": "system", "content": f"Interpreted Intent: {interpreted_intent}"})
+            elif SINGLE_STAGE_INTERPRETATION:
+                # The constrained interpreter takes the raw input directly
+                interpreted_intent = player_input
+            else:
+                try:
+                    interpreted_intent = interpret_user_intent(player_input)
+                    print("\n\n>>>>> INTERPRETED_INTENT <<<<<\n\n", interpreted_intent, "\n\n>>>>> END INTERPRETED_INTENT <<<<<\n\n")
+                    # Track interpreted intent
+                    messages.append({"role": "system", "content": f"Interpreted Intent: {interpreted_intent}"})
+                except Exception as e:
+                    print(f"Error interpreting user intent: {e}")
+                    return
+
+            try:
+                if not validated_plan:
+                    validated_plan = process_player_input(state, interpreted_intent, single_stage=SINGLE_STAGE_INTERPRETATION)
+                print("\n\n>>>>> VALIDATED_PLAN <<<<<\n\n", validated_plan, "\n\n>>>>> END VALIDATED_PLAN <<<<<\n\n")
+                # Track validated plan
+                messages.append({"role": "system", "content": f"Validated Plan: {validated_plan}"})
+            except Exception as e:
+                print(f"Error interpreting input: {e}")
+                return
+
+            try:
+                execution_results = execute_events(state, validated_plan)
+                print("\n\n>>>>> EXECUTION_RESULTS <<<<<\n\n", execution_results, "\n\n>>>>> END EXECUTION_RESULTS <<<<<\n\n")
+                # Track execution results
+                messages.append({"role": "system", "content": f"Execution Results: {execution_results}"})
+            except Exception as e:
+                print(f"Error executing events: {e}")
+                return
+
+            try:
+                # Stream the narration to the terminal as it is generated
+                chunks = []
+                for text in stream_narrative(state, player_input, validated_plan, execution_results, messages.prompt_messages()):
+                    chunks.append(text)
+                    print(colored(text, "green"), end="", flush=True)
+                print()
+                narrative = {"narrative": "".join(chunks)}
+                # Track narrative
+                # messages.append({"role": "narrator", "content": narrative.get("narrative", str(narrative))})
+            except Exception as e:
+                print(f"Error generating narrative: {e}")
+                return
         
-        # try:
-        #     generate_narrative_audio(narrative.get("narrative", ""))
-        #     play_narrative_audio()
-        # except Exception as e:
-        #     print(f"Error with narrative audio: {e}")
-        #     return
+            # try:
+            #     generate_narrative_audio(narrative.get("narrative", ""))
+            #     play_narrative_audio()
+            # except Exception as e:
+            #     print(f"Error with narrative audio: {e}")
+            #     return
         
-        # try:
-        #     play_narrative_audio()
-        # except Exception as e:
-        #     print(f"Error playing narrative audio: {e}")
-        #     return
-
-        # try:
-        #     narrative = validate_narrative(narrative)
-        #     print("\n\n>>>>> VALIDATED NARRATIVE <<<<<\n\n", narrative, "\n\n>>>>> END VALIDATED NARRATIVE <<<<<\n\n")
-        #     # Optionally track validated narrative
-        # except Exception as e:
-        #     print(f"Error validating narrative: {e}")
-        #     return
-
-        messages.append({"role": "system", "content": f"Validated Narrative: {narrative}"})
-
-        print(colored(narrative, "green"))
-
-        # Optionally, print the full message history for debugging
-        # print(json.dumps(messages, indent=2))
+            # try:
+            #     play_narrative_audio()
+            # except Exception as e:
+            #     print(f"Error playing narrative audio: {e}")
+            #     return
+
+            # try:
+            #     narrative = validate_narrative(state, narrative)
+            #     print("\n\n>>>>> VALIDATED NARRATIVE <<<<<\n\n", narrative, "\n\n>>>>> END VALIDATED NARRATIVE <<<<<\n\n")
+            #     # Optionally track validated narrative
+            # except Exception as e:
+            #     print(f"Error validating narrative: {e}")
+            #     return
+
+            messages.append({"role": "system", "content": f"Validated Narrative: {narrative}"})
+            messages.end_turn()
+            state.commit_turn()
+
+            print(colored(f"LLM load stats: {llm_registry.stats()}", "magenta"))
+            print(colored(f"Fast-path intent stats: {fast_resolver.stats()}", "magenta"))
+            print(colored(f"Event repair stats: {repair_stats}", "magenta"))
+            print(colored(f"LLM response cache stats: {response_cache.stats()}", "magenta"))
+            print(colored(f"Prompt context stats: {context_builder.stats()}", "magenta"))
+            print(colored(f"Table stats: {sessions.stats()}", "magenta"))
+
+            # Optionally, print the full message history for debugging
+            # print(json.dumps(messages.prompt_messages(), indent=2))
+
+        # Let the last summary land before the table is written to disk
+        messages.flush()
+    sessions.close()
 
 
 if __name__ == "__main__":
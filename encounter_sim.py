@@ -0,0 +1,252 @@
+"""
+Offline Monte-Carlo encounter simulator for balancing scenarios.
+
+    python encounter_sim.py                          # GameState.hostile_game_state, 100k encounters
+    python encounter_sim.py --scenario saves/t1/scenario.json -n 500000 --workers 8 --seed 7
+
+Runs the same mechanical resolution as combat.CombatEngine (initiative, d20 vs AC, weapon damage, NPC policies)
+vectorized across thousands of encounters at once, split into fixed-size chunks over a process pool. Every chunk
+draws from its own stream spawned from one SeedSequence, so a run is reproducible for a given seed and chunk size
+regardless of how many workers it uses.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from combat import AGGRESSIVE, COWARDLY, HOSTILE, PARTY, _POLICY_CODES, CombatEngine, Roster
+from dice import compile_dice
+from game_state import GameState
+
+DEFAULT_ENCOUNTERS = 100_000
+DEFAULT_CHUNK = 10_000
+DEFAULT_MAX_ROUNDS = 50
+Z_95 = 1.959964
+
+# Outcomes per encounter
+DRAW, PARTY_WIN, HOSTILE_WIN = 0, 1, 2
+
+
+def load_roster(scenario: str = "hostile_game_state", location_id: Optional[str] = None) -> Roster:
+    """
+    Combatants for a scenario: a GameState attribute name (e.g. "hostile_game_state") or a JSON file laid out
+    like game_state or a snapshot. Everyone at the location with the in_combat status takes part.
+    """
+    state = GameState()
+    if os.path.isfile(scenario):
+        with open(scenario, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data = data.get("state", data)  # event log snapshots wrap the state
+        if "session_location" in data:
+            state.load_state({"journal": "", "history": "", **data})
+        else:
+            state.load_scenario(data)
+    elif isinstance(getattr(state, scenario, None), dict):
+        state.load_scenario(getattr(state, scenario))
+    else:
+        raise ValueError(f"Unknown scenario '{scenario}'.")
+    if location_id:
+        state.set_session_location_by_key(location_id)
+    ids = sorted(CombatEngine(state).participants())
+    if not ids:
+        raise ValueError(f"Nobody is in combat at '{state._session_location_id()}'.")
+    return Roster(state, ids)
+
+
+def simulate_chunk(roster: Roster, encounters: int, seed: np.random.SeedSequence,
+                   max_rounds: int = DEFAULT_MAX_ROUNDS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fight `encounters` independent copies of the roster's combat. Returns (outcome, rounds, final hp) with
+    shapes (E,), (E,) and (E, combatants). Arrays are (encounter, combatant); each initiative slot is one
+    vectorized step over every encounter, mirroring CombatEngine.run_round with all PCs auto-played.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(roster.ids)
+    rows = np.arange(encounters)
+    side = roster.side.astype(np.int64)
+    aggressive = roster.policy == _POLICY_CODES[AGGRESSIVE]
+    cowardly = roster.policy == _POLICY_CODES[COWARDLY]
+
+    hp = np.broadcast_to(roster.hp.astype(np.int64), (encounters, count)).copy()
+    out = np.zeros((encounters, count), dtype=bool)
+    targets = np.full((encounters, count), -1, dtype=np.int64)
+    # Highest initiative first, ties to the higher dex (dex < 100, so it fits below the initiative digit)
+    initiative = rng.integers(1, 21, size=(encounters, count)) + roster.initiative_bonus
+    order = np.argsort(-(initiative * 100 + roster.dex), axis=1, kind="stable")
+
+    outcome = np.full(encounters, DRAW, dtype=np.int8)
+    rounds = np.full(encounters, max_rounds, dtype=np.int32)
+    running = np.ones(encounters, dtype=bool)
+    damage = np.empty((encounters, count), dtype=np.int64)
+    crit_damage = np.empty((encounters, count), dtype=np.int64)
+
+    for round_number in range(1, max_rounds + 1):
+        attack_rolls = rng.integers(1, 21, size=(encounters, count))
+        for expression, members in roster.damage_groups.items():
+            compiled = compile_dice(expression)
+            damage[:, members] = compiled.roll_batch(rng, encounters * len(members)).reshape(encounters, len(members))
+            crit_damage[:, members] = compiled.roll_batch(rng, encounters * len(members)).reshape(encounters, len(members))
+        damage_total = damage + roster.damage_modifier
+        picks = rng.random((encounters, count))
+
+        for slot in range(count):
+            attacker = order[:, slot]
+            standing = (hp > 0) & ~out
+            acting = running & standing[rows, attacker]
+            enemies = standing & (side[None, :] != side[attacker][:, None])
+            enemy_count = enemies.sum(axis=1)
+            acting &= enemy_count > 0
+
+            flee = acting & cowardly[attacker] & (hp[rows, attacker] * 2 < roster.hp_max[attacker])
+            out[rows[flee], attacker[flee]] = True
+            acting &= ~flee
+            if not acting.any():
+                continue
+
+            # Focused: keep the current target while it stands, else a random enemy; aggressive: weakest enemy
+            current = targets[rows, attacker]
+            keep = (current >= 0) & enemies[rows, np.maximum(current, 0)]
+            nth = (picks[rows, attacker] * enemy_count).astype(np.int64)
+            random_pick = np.argmax(np.cumsum(enemies, axis=1) > nth[:, None], axis=1)
+            weakest = np.argmin(np.where(enemies, hp, np.iinfo(np.int64).max), axis=1)
+            target = np.where(aggressive[attacker], weakest, np.where(keep, current, random_pick))
+            targets[rows[acting], attacker[acting]] = target[acting]
+
+            natural = attack_rolls[rows, attacker]
+            total = natural + roster.attack_bonus[attacker]
+            crit = natural == 20
+            hit = acting & (crit | ((natural != 1) & (total >= roster.ac[target])))
+            dealt = np.maximum(1, damage_total[rows, attacker] + np.where(crit, crit_damage[rows, attacker], 0))
+            hp[rows[hit], target[hit]] -= dealt[hit]
+
+        standing = (hp > 0) & ~out
+        party_left = (standing & (side == PARTY)).any(axis=1)
+        hostile_left = (standing & (side == HOSTILE)).any(axis=1)
+        ended = running & ~(party_left & hostile_left)
+        outcome[ended & party_left] = PARTY_WIN
+        outcome[ended & hostile_left] = HOSTILE_WIN
+        rounds[ended] = round_number
+        running &= ~ended
+        if not running.any():
+            break
+
+    return outcome, rounds, np.maximum(hp, 0).astype(np.int32)
+
+
+def _run_chunk(args) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return simulate_chunk(*args)
+
+
+def simulate(roster: Roster, encounters: int = DEFAULT_ENCOUNTERS, seed: Optional[int] = None,
+             workers: Optional[int] = None, chunk: int = DEFAULT_CHUNK,
+             max_rounds: int = DEFAULT_MAX_ROUNDS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run `encounters` simulations in chunks of `chunk`, across `workers` processes (1 runs in-process).
+    """
+    sizes = [chunk] * (encounters // chunk) + ([encounters % chunk] if encounters % chunk else [])
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(roster, size, stream, max_rounds) for size, stream in zip(sizes, streams)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        results = [_run_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_run_chunk, jobs))
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+# --- Reporting ---
+
+def wilson_interval(successes: int, trials: int, z: float = Z_95) -> Tuple[float, float]:
+    if not trials:
+        return 0.0, 0.0
+    p = successes / trials
+    centre = (p + z * z / (2 * trials)) / (1 + z * z / trials)
+    spread = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+def describe(values: np.ndarray) -> dict:
+    """
+    Mean with a 95% confidence interval, plus the median and 5th/95th percentiles.
+    """
+    values = values.astype(np.float64)
+    mean = float(values.mean())
+    margin = Z_95 * float(values.std(ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+    p5, median, p95 = np.percentile(values, [5, 50, 95])
+    return {"mean": round(mean, 3), "ci95": [round(mean - margin, 3), round(mean + margin, 3)],
+            "median": float(median), "p5": float(p5), "p95": float(p95)}
+
+def summarize(roster: Roster, outcome: np.ndarray, rounds: np.ndarray, hp: np.ndarray) -> dict:
+    trials = len(outcome)
+    report = {"encounters": trials, "outcomes": {}, "rounds": describe(rounds), "hp_remaining": {}}
+    for label, code in (("party_win", PARTY_WIN), ("hostile_win", HOSTILE_WIN), ("draw", DRAW)):
+        wins = int((outcome == code).sum())
+        low, high = wilson_interval(wins, trials)
+        report["outcomes"][label] = {"rate": round(wins / trials, 4), "ci95": [round(low, 4), round(high, 4)]}
+    for i, actor_id in enumerate(roster.ids):
+        stats = describe(hp[:, i])
+        downed = int((hp[:, i] == 0).sum())
+        low, high = wilson_interval(downed, trials)
+        stats["hp_max"] = int(roster.hp_max[i])
+        stats["downed"] = {"rate": round(downed / trials, 4), "ci95": [round(low, 4), round(high, 4)]}
+        report["hp_remaining"][actor_id] = stats
+    return report
+
+def print_report(report: dict) -> None:
+    print(f"Encounters: {report['encounters']:,} in {report['seconds']:.2f}s "
+          f"({report['encounters_per_second']:,.0f}/s)")
+    for label, outcome in report["outcomes"].items():
+        low, high = outcome["ci95"]
+        print(f"  {label:<12} {outcome['rate']:>7.2%}  (95% CI {low:.2%} - {high:.2%})")
+    rounds = report["rounds"]
+    print(f"  rounds       mean {rounds['mean']:.2f} (95% CI {rounds['ci95'][0]:.2f} - {rounds['ci95'][1]:.2f}), "
+          f"median {rounds['median']:.0f}, p5-p95 {rounds['p5']:.0f}-{rounds['p95']:.0f}")
+    print("  hp remaining:")
+    for actor_id, stats in report["hp_remaining"].items():
+        print(f"    {actor_id:<20} mean {stats['mean']:>6.2f}/{stats['hp_max']} "
+              f"(95% CI {stats['ci95'][0]:.2f} - {stats['ci95'][1]:.2f}), p5-p95 {stats['p5']:.0f}-{stats['p95']:.0f}, "
+              f"downed {stats['downed']['rate']:.2%}")
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Monte-Carlo encounter simulator.")
+    parser.add_argument("--scenario", default="hostile_game_state",
+                        help="GameState attribute (e.g. hostile_game_state) or a JSON state/snapshot file")
+    parser.add_argument("--location", help="location id to fight at (defaults to the scenario's session location)")
+    parser.add_argument("-n", "--encounters", type=int, default=DEFAULT_ENCOUNTERS)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="encounters per chunk/stream")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS, help="rounds before calling a draw")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.encounters < 1:
+        parser.error("--encounters must be at least 1")
+    if args.chunk < 1:
+        parser.error("--chunk must be at least 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.max_rounds < 1:
+        parser.error("--max-rounds must be at least 1")
+
+    roster = load_roster(args.scenario, args.location)
+    start = time.perf_counter()
+    outcome, rounds, hp = simulate(roster, args.encounters, args.seed, args.workers, args.chunk, args.max_rounds)
+    seconds = time.perf_counter() - start
+    report = summarize(roster, outcome, rounds, hp)
+    report["seconds"] = round(seconds, 3)
+    report["encounters_per_second"] = round(args.encounters / seconds) if seconds else None
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import sys
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+from world_store import LazyEntityMap
+
+# Ability scores and combat stats, packed in this order into a signed 16-bit array
+STAT_FIELDS = ("hp_current", "hp_max", "ac", "str", "dex", "con", "int", "wis", "cha")
+_STAT_INDEX = {field: i for i, field in enumerate(STAT_FIELDS)}
+_NO_STAT = -32768
+
+_EMPTY = ()
+
+
+def _intern_all(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    # Item, status and location ids repeat across thousands of actors; interning stores each string once
+    if not values:
+        return _EMPTY
+    return tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _packable(field: str, value) -> bool:
+    # type() rather than isinstance(): a bool stat must come back as a bool, not as 0 or 1
+    return field in _STAT_INDEX and type(value) is int and -32767 <= value <= 32767
+
+def _unknown(data: dict, known: Iterable[str]) -> dict:
+    # Keys the slots don't cover, plus known keys explicitly set to None (slots use None for "absent")
+    return {key: value for key, value in data.items() if key not in known or value is None}
+
+def pack_stats(stats: Optional[dict]) -> Optional[array]:
+    if not stats:
+        return None
+    packed = array("h", [_NO_STAT] * len(STAT_FIELDS))
+    for field, value in stats.items():
+        if not _packable(field, value):
+            return None
+        packed[_STAT_INDEX[field]] = value
+    return packed
+
+def unpack_stats(packed: Optional[array]) -> dict:
+    return {field: value for field, value in zip(STAT_FIELDS, packed) if value != _NO_STAT}
+
+
+class Knowledge:
+    __slots__ = ("id", "info", "revealed", "extra")
+    _KNOWN = ("id", "info", "revealed")
+
+    def __init__(self, id: str, info: str = None, revealed: bool = None, extra: dict = None):
+        self.id = _intern(id)
+        self.info = info
+        self.revealed = revealed
+        self.extra = extra or None
+
+    def to_prompt_dict(self) -> dict:
+        data = {}
+        for key, value in (("id", self.id), ("info", self.info), ("revealed", self.revealed)):
+            if value is not None:
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Knowledge":
+        return cls(data.get("id"), data.get("info"), data.get("revealed"), _unknown(data, cls._KNOWN))
+
+
+class Actor:
+    """
+    Compact form of a PC or NPC dict. Known fields live in slots, stats in a packed array;
+    anything else is kept in `extra` so to_prompt_dict() reproduces the original dict.
+    """
+    __slots__ = ("id", "name", "current_location", "stats", "inventory", "status_effects", "knowledge",
+                 "extra", "_stats_dict")
+    kind = None
+    # Dict key -> slot name for plain string fields, in the order they appear in the dicts
+    _FIELDS: Tuple[Tuple[str, str], ...] = ()
+
+    def __init__(self, id: str, name: str = None, current_location: str = None, stats: dict = None,
+                 inventory: Iterable[str] = None, status_effects: Iterable[str] = None,
+                 knowledge: Iterable[Knowledge] = None, extra: dict = None):
+        self.id = _intern(id)
+        self.name = name
+        self.current_location = _intern(current_location)
+        self.stats = pack_stats(stats)
+        # Stats that don't fit the packed layout (extra keys, non-int values) are kept as given
+        self._stats_dict = None if self.stats is not None or stats is None else dict(stats)
+        self.inventory = None if inventory is None else _intern_all(inventory)
+        self.status_effects = None if status_effects is None else _intern_all(status_effects)
+        self.knowledge = None if knowledge is None else tuple(knowledge)
+        self.extra = extra or None
+
+    def get_stat(self, field: str, default=None):
+        if self.stats is not None:
+            value = self.stats[_STAT_INDEX[field]]
+            return default if value == _NO_STAT else value
+        return (self._stats_dict or {}).get(field, default)
+
+    def set_stat(self, field: str, value: int) -> None:
+        if self.stats is not None and _packable(field, value):
+            self.stats[_STAT_INDEX[field]] = value
+            return
+        stats = unpack_stats(self.stats) if self.stats is not None else dict(self._stats_dict or {})
+        stats[field] = value
+        self.stats = pack_stats(stats)
+        self._stats_dict = None if self.stats is not None else stats
+
+    def to_prompt_dict(self) -> dict:
+        """
+        The dict form used in game_state, prompts and execute_events.
+        """
+        data = {}
+        if self.name is not None:
+            data["name"] = self.name
+        for key, slot in self._FIELDS:
+            value = getattr(self, slot)
+            if value is not None:
+                data[key] = value
+        if self.current_location is not None:
+            data["currentLocation"] = self.current_location
+        if self.stats is not None:
+            data["stats"] = unpack_stats(self.stats)
+        elif self._stats_dict is not None:
+            data["stats"] = dict(self._stats_dict)
+        if self.inventory is not None:
+            data["inventory"] = list(self.inventory)
+        if self.status_effects is not None:
+            data["statusEffects"] = list(self.status_effects)
+        if self.knowledge is not None:
+            data["knowledge"] = [k.to_prompt_dict() for k in self.knowledge]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, actor_id: str, data: dict) -> "Actor":
+        known = {"name", "currentLocation", "stats", "inventory", "statusEffects", "knowledge"}
+        known.update(key for key, _ in cls._FIELDS)
+        actor = cls(
+            actor_id,
+            name=data.get("name"),
+            current_location=data.get("currentLocation"),
+            stats=data.get("stats"),
+            inventory=data.get("inventory"),
+            status_effects=data.get("statusEffects"),
+            knowledge=None if "knowledge" not in data else [Knowledge.from_dict(k) for k in data["knowledge"]],
+            extra=_unknown(data, known),
+        )
+        for key, slot in cls._FIELDS:
+            setattr(actor, slot, _intern(data.get(key)))
+        return actor
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.id!r}, {self.name!r})"
+
+
+class PC(Actor):
+    __slots__ = ("char_class", "race", "background")
+    kind = "pc"
+    _FIELDS = (("class", "char_class"), ("race", "race"), ("background", "background"))
+
+    def __init__(self, id: str, char_class: str = None, race: str = None, background: str = None, **kwargs):
+        super().__init__(id, **kwargs)
+        self.char_class = _intern(char_class)
+        self.race = _intern(race)
+        self.background = _intern(background)
+
+
+class NPC(Actor):
+    __slots__ = ("role", "disposition")
+    kind = "npc"
+    _FIELDS = (("role", "role"), ("dispositionToParty", "disposition"))
+
+    def __init__(self, id: str, role: str = None, disposition: str = None, **kwargs):
+        super().__init__(id, **kwargs)
+        self.role = _intern(role)
+        self.disposition = _intern(disposition)
+
+
+class Location:
+    __slots__ = ("id", "name", "type", "description", "connections", "state", "extra")
+
+    def __init__(self, id: str, name: str = None, type: str = None, description: str = None,
+                 connections: dict = None, state: Iterable[str] = None, extra: dict = None):
+        self.id = _intern(id)
+        self.name = name
+        self.type = _intern(type)
+        self.description = description
+        self.connections = None if connections is None else tuple(
+            (_intern(exit_key), _intern(target)) for exit_key, target in connections.items())
+        self.state = None if state is None else _intern_all(state)
+        self.extra = extra or None
+
+    def to_prompt_dict(self) -> dict:
+        data = {}
+        for key, value in (("name", self.name), ("type", self.type), ("description", self.description)):
+            if value is not None:
+                data[key] = value
+        if self.connections is not None:
+            data["connections"] = dict(self.connections)
+        if self.state is not None:
+            data["state"] = list(self.state)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, location_id: str, data: dict) -> "Location":
+        known = ("name", "type", "description", "connections", "state")
+        return cls(location_id, data.get("name"), data.get("type"), data.get("description"),
+                   data.get("connections"), data.get("state"),
+                   _unknown(data, known))
+
+    def __repr__(self) -> str:
+        return f"Location({self.id!r}, {self.name!r})"
+
+
+ENTITY_CLASSES = {"pc": PC, "npc": NPC, "location": Location}
+
+
+def from_dict(kind: str, entity_id: str, data: dict):
+    return ENTITY_CLASSES[kind].from_dict(entity_id, data)
+
+
+class CompactEntityMap(LazyEntityMap):
+    """
+    Dict of entities where cold entries are stored as compact objects and turned back into
+    dicts on first access. `compact()` moves dicts that are no longer needed back to compact form.
+    """
+    def __init__(self, kind: str, entities: Dict[str, dict] = None):
+        self.kind = kind
+        self._cold: Dict[str, object] = {}
+        super().__init__(self._thaw, lambda: list(self._cold), self._cold.__contains__)
+        for entity_id, data in (entities or {}).items():
+            self._cold[entity_id] = from_dict(kind, entity_id, data)
+
+    def _thaw(self, entity_id: str) -> Optional[dict]:
+        entity = self._cold.pop(entity_id, None)
+        return None if entity is None else entity.to_prompt_dict()
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._cold.pop(key, None)
+
+    def to_json_dict(self) -> Dict[str, dict]:
+        """
+        Every entity as a plain dict for serializing, without thawing the compact ones into this map.
+        """
+        data = {}
+        for entity_id in self._all_ids():
+            entity = self._cold.get(entity_id)
+            data[entity_id] = entity.to_prompt_dict() if entity is not None else dict.__getitem__(self, entity_id)
+        return data
+
+    def compact(self, keep: Iterable[str] = ()) -> int:
+        """
+        Convert every thawed entry not in `keep` back to its compact form. Returns the number compacted.
+        """
+        keep = set(keep)
+        ids = [key for key in dict.keys(self) if key not in keep]
+        for entity_id in ids:
+            self._cold[entity_id] = from_dict(self.kind, entity_id, dict.pop(self, entity_id))
+        return len(ids)
+
+    def __repr__(self) -> str:
+        return f"CompactEntityMap({self.kind}, thawed={dict.__len__(self)}, compact={len(self._cold)})"
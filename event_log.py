@@ -0,0 +1,146 @@
+import copy
+import json
+import os
+from typing import Any, Iterator, List, Optional, Tuple
+
+_ABSENT = "__absent__"
+
+# Delta ops:
+#   set          path <- value (old is the previous value, or _ABSENT if the key did not exist)
+#   delete       remove path (old is the removed value)
+#   list_add     append value to the list at path
+#   list_remove  remove the first occurrence of value from the list at path
+#   session      move the session to location `value` (old is the previous location id)
+DELTA_OPS = ("set", "delete", "list_add", "list_remove", "session")
+
+
+class Delta:
+    """
+    One recorded change to game_state. Serialized as a compact list: [op, path, value, old].
+    """
+    __slots__ = ("op", "path", "value", "old")
+
+    def __init__(self, op: str, path: Tuple, value: Any = None, old: Any = _ABSENT):
+        if op not in DELTA_OPS:
+            raise ValueError(f"Unknown delta op '{op}'.")
+        self.op = op
+        self.path = tuple(path)
+        # Snapshot mutable values so later in-place edits don't rewrite history
+        self.value = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self.old = copy.deepcopy(old) if isinstance(old, (dict, list)) else old
+
+    def inverse(self) -> "Delta":
+        if self.op == "set":
+            if self.old == _ABSENT:
+                return Delta("delete", self.path, old=self.value)
+            return Delta("set", self.path, self.old, self.value)
+        if self.op == "delete":
+            return Delta("set", self.path, self.old)
+        if self.op == "list_add":
+            return Delta("list_remove", self.path, self.value)
+        if self.op == "list_remove":
+            return Delta("list_add", self.path, self.value)
+        return Delta("session", self.path, self.old, self.value)
+
+    def to_json(self) -> list:
+        return [self.op, list(self.path), self.value, self.old]
+
+    @classmethod
+    def from_json(cls, data: list) -> "Delta":
+        op, path, value, old = data
+        return cls(op, path, value, old)
+
+    def __repr__(self) -> str:
+        return f"Delta({self.op}, {'.'.join(map(str, self.path))}, {self.value!r})"
+
+
+class EventLog:
+    """
+    Append-only log of per-turn deltas with periodic full snapshots.
+    Files live in `directory`: events.jsonl (one line per turn) and snapshot_<turn>.json.
+    Current state = latest snapshot + the turns logged after it.
+    """
+    def __init__(self, directory: str, snapshot_every: int = 50):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.path = os.path.join(directory, "events.jsonl")
+        os.makedirs(directory, exist_ok=True)
+        self.turn = 0
+        # (turn, byte offset of its line) for turns undo can still revert, most recent last; turns that are
+        # undos, undone or empty are left out, so undo reads one line instead of scanning the log
+        self._undoable: List[Tuple[int, int]] = []
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        self._track(json.loads(line), offset)
+                    offset += len(line)
+
+    def _track(self, record: dict, offset: int) -> None:
+        self.turn = max(self.turn, record["turn"])
+        if "undo_of" in record:
+            # Undo always reverts the most recent undoable turn, so this is normally a pop
+            if self._undoable and self._undoable[-1][0] == record["undo_of"]:
+                self._undoable.pop()
+            else:
+                self._undoable = [entry for entry in self._undoable if entry[0] != record["undo_of"]]
+        elif record["d"]:
+            self._undoable.append((record["turn"], offset))
+
+    def records(self, after_turn: int = 0) -> Iterator[dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record["turn"] > after_turn:
+                        yield record
+
+    def append(self, deltas: List[Delta], undo_of: Optional[int] = None) -> int:
+        """
+        Write one turn's deltas as a single line. Returns the turn id.
+        """
+        record = {"turn": self.turn + 1, "d": [delta.to_json() for delta in deltas]}
+        if undo_of is not None:
+            record["undo_of"] = undo_of
+        with open(self.path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+        self._track(record, offset)
+        return self.turn
+
+    def last_undoable(self) -> Optional[Tuple[int, List[Delta]]]:
+        """
+        The most recent turn that is not an undo and has not been undone.
+        """
+        if not self._undoable:
+            return None
+        turn, offset = self._undoable[-1]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.readline())
+        return turn, [Delta.from_json(d) for d in record["d"]]
+
+    # --- Snapshots ---
+
+    def _snapshot_path(self, turn: int) -> str:
+        return os.path.join(self.directory, f"snapshot_{turn}.json")
+
+    def should_snapshot(self) -> bool:
+        return self.snapshot_every > 0 and self.turn % self.snapshot_every == 0
+
+    def write_snapshot(self, state: dict) -> None:
+        tmp_path = self._snapshot_path(self.turn) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"turn": self.turn, "state": state}, f, separators=(",", ":"))
+        os.replace(tmp_path, self._snapshot_path(self.turn))
+
+    def latest_snapshot(self) -> Optional[dict]:
+        turns = [int(name[len("snapshot_"):-len(".json")]) for name in os.listdir(self.directory)
+                 if name.startswith("snapshot_") and name.endswith(".json")]
+        if not turns:
+            return None
+        with open(self._snapshot_path(max(turns)), "r") as f:
+            return json.load(f)
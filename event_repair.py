@@ -0,0 +1,89 @@
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Minimum difflib similarity for a fuzzy id match when no substring match exists
+FUZZY_CUTOFF = 0.75
+
+
+def _body(entity_id: str) -> str:
+    """
+    "npc_GuardCaptainThorne" -> "guardcaptainthorne"
+    """
+    return re.sub(r"[^a-z0-9]", "", entity_id.split("_", 1)[-1].lower())
+
+def _prefix(entity_id: str) -> str:
+    return entity_id.split("_", 1)[0].lower() if "_" in entity_id else ""
+
+
+class IdCorrector:
+    """
+    Fixes hallucinated target ids locally by matching them against the ids and names in the session,
+    e.g. "npc_Thorne" -> "npc_GuardCaptainThorne", "Boric the Barkeep" -> "npc_BoricTheBarkeep".
+    A correction is only made when exactly one known id is a confident match.
+    """
+    def __init__(self, session: dict):
+        self.ids: Dict[str, str] = {}
+        self._collect(session)
+
+    def _collect(self, data) -> None:
+        # Keys that look like ids, and the ids/names they carry, are all valid targets
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(key, str) and re.match(r"^(pc|npc|loc|item|obj)_", key):
+                    self.ids[key] = key
+                    if isinstance(value, dict) and isinstance(value.get("name"), str):
+                        self.ids.setdefault(value["name"].lower(), key)
+                if isinstance(value, str) and re.match(r"^(pc|npc|loc|item|obj)_", value):
+                    self.ids.setdefault(value, value)
+                self._collect(value)
+        elif isinstance(data, list):
+            for item in data:
+                if isinstance(item, str) and re.match(r"^(pc|npc|loc|item|obj)_", item):
+                    self.ids.setdefault(item, item)
+                else:
+                    self._collect(item)
+
+    def correct(self, target_id: str) -> Optional[str]:
+        if not isinstance(target_id, str) or not target_id:
+            return None
+        if target_id in self.ids:
+            return self.ids[target_id]
+        by_name = self.ids.get(target_id.lower())
+        if by_name:
+            return by_name
+
+        prefix, body = _prefix(target_id), _body(target_id)
+        if not body:
+            return None
+        candidates = sorted({entity_id for entity_id in self.ids.values()
+                             if not prefix or _prefix(entity_id) == prefix})
+
+        contained = [c for c in candidates if body in _body(c) or _body(c) in body]
+        if len(contained) == 1:
+            return contained[0]
+
+        bodies = {_body(c): c for c in candidates}
+        close = difflib.get_close_matches(body, list(bodies), n=2, cutoff=FUZZY_CUTOFF)
+        if len(close) == 1 or (len(close) == 2 and
+                               difflib.SequenceMatcher(None, body, close[0]).ratio() >
+                               difflib.SequenceMatcher(None, body, close[1]).ratio() + 0.1):
+            return bodies[close[0]]
+        return None
+
+    def repair(self, events: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Try to fix each invalid event's target_id. Returns (repaired, still_invalid).
+        """
+        repaired, unresolved = [], []
+        for event in events:
+            parameters = event.get("parameters", {})
+            corrected = self.correct(parameters.get("target_id"))
+            if corrected:
+                print(f"Corrected target_id {parameters.get('target_id')} -> {corrected}")
+                event = dict(event, parameters=dict(parameters, target_id=corrected))
+                event.pop("validation_error", None)
+                repaired.append(event)
+            else:
+                unresolved.append(event)
+        return repaired, unresolved
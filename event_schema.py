@@ -0,0 +1,51 @@
+# JSON schema for the events the interpreter produces.
+# Passed to Ollama as the `format` so constrained decoding can only emit output that parses and fits the schema.
+
+PLAYER_ACTION_SUBTYPES = [
+    "PASSIVE",
+    "ATTACK",
+    "PERCEPTION",
+    "INVESTIGATION",
+    "STEALTH",
+    "SLEIGHT_OF_HAND",
+    "ATHLETICS",
+    "INTERACTION",
+    "MOVEMENT",
+    "INVENTORY",
+]
+
+PLAYER_ACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": ["PLAYER_ACTION"]},
+        "subtype": {"type": "string", "enum": PLAYER_ACTION_SUBTYPES},
+        "actor_id": {"type": "string"},
+        "narrative": {"type": "string"},
+        "location_id": {"type": "string"},
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "target_id": {"type": "string"},
+                "action_dc": {"type": "integer", "minimum": 1, "maximum": 30},
+                "roll_mode": {"type": "string", "enum": ["normal", "advantage", "disadvantage"]},
+            },
+        },
+    },
+    "required": ["type", "subtype", "actor_id", "location_id", "parameters"],
+}
+
+CLARIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": ["CLARIFICATION_NEEDED"]},
+        "question": {"type": "string"},
+        "original_input": {"type": "string"},
+    },
+    "required": ["type", "question", "original_input"],
+}
+
+PLAYER_EVENTS_SCHEMA = {
+    "type": "array",
+    "items": {"anyOf": [PLAYER_ACTION_SCHEMA, CLARIFICATION_SCHEMA]},
+    "minItems": 1,
+}
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+# Which id groups a subtype's target_id may come from. Subtypes not listed accept any known id.
+TARGET_KINDS = {
+    "MOVEMENT": ("connections",),
+    "ATTACK": ("pcs", "npcs"),
+    "INVENTORY": ("items",),
+    "INTERACTION": ("pcs", "npcs", "items", "locations"),
+}
+
+_KIND_LABELS = {
+    "connections": "a location connected to the current one",
+    "pcs": "a PC present",
+    "npcs": "an NPC present",
+    "items": "an item held by someone present",
+    "locations": "the current location or a point of interest",
+}
+
+
+class SessionIdIndex:
+    """
+    Valid target ids in a session, grouped by kind: pcs, npcs, locations, connections and items.
+    Built once per session version; every check after that is a set lookup.
+    """
+    __slots__ = ("pcs", "npcs", "locations", "connections", "exits", "items", "all")
+
+    def __init__(self, session: dict):
+        actors = session.get("currentActors") or {}
+        self.pcs: Set[str] = set(actors.get("pcs") or ())
+        self.npcs: Set[str] = set(actors.get("npcs") or ())
+        self.locations: Set[str] = set()
+        self.connections: Set[str] = set()
+        # exit key -> destination, e.g. "north_path" -> "loc_Gloomwood"
+        self.exits: Dict[str, str] = {}
+        self.items: Set[str] = set()
+
+        for location_id, location in (session.get("currentLocation") or {}).items():
+            self.locations.add(location_id)
+            self.locations.update(location.get("pointsOfInterest") or ())
+            for exit_key, destination_id in (location.get("connections") or {}).items():
+                self.exits[exit_key] = destination_id
+                self.connections.add(destination_id)
+        for group in ("pcs", "npcs"):
+            for actor in (actors.get(group) or {}).values():
+                self.items.update(actor.get("inventory") or ())
+
+        self.all = self.pcs | self.npcs | self.locations | self.connections | self.items
+
+    def kinds_for(self, subtype: str) -> Optional[Tuple[str, ...]]:
+        return TARGET_KINDS.get(subtype)
+
+    def check(self, event: dict) -> Optional[str]:
+        """
+        Return a validation error for the event's target_id, or None if it is valid (or has no target).
+        A MOVEMENT target given as an exit key ("north_path") is rewritten to its destination id.
+        """
+        parameters = event.get("parameters") or {}
+        target_id = parameters.get("target_id")
+        if not target_id:
+            return None
+        subtype = str(event.get("subtype", "")).upper()
+
+        if subtype == "MOVEMENT" and target_id in self.exits:
+            target_id = parameters["target_id"] = self.exits[target_id]
+        if subtype == "MOVEMENT" and parameters.get("route"):
+            # Routed by location_graph.plan_movement: the first hop must leave from here and the last arrive
+            route = parameters["route"]
+            if route[0] in self.connections and route[-1] == target_id:
+                return None
+            return f"Invalid route to {target_id}: {route}"
+
+        kinds = self.kinds_for(subtype)
+        if kinds is None:
+            if target_id in self.all:
+                return None
+            return f"Invalid target_id: {target_id}"
+        if any(target_id in getattr(self, kind) for kind in kinds):
+            if subtype == "ATTACK" and target_id == event.get("actor_id"):
+                return f"Invalid target_id: {target_id} (an actor cannot attack itself)"
+            return None
+        expected = " or ".join(_KIND_LABELS[kind] for kind in kinds)
+        return f"Invalid target_id: {target_id} ({subtype} needs {expected})"
+
+
+class SessionIndexCache:
+    """
+    One SessionIdIndex per (session, version). Sessions without a version are indexed on every call.
+    """
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.builds = 0
+        self.hits = 0
+        self._entries: "OrderedDict[int, Tuple[int, dict, SessionIdIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session: dict) -> SessionIdIndex:
+        version = getattr(session, "version", None)
+        if version is None:
+            self.builds += 1
+            return SessionIdIndex(session)
+        with self._lock:
+            entry = self._entries.get(id(session))
+            # The session object is kept in the entry so its id can't be reused while cached
+            if entry is not None and entry[0] == version and entry[1] is session:
+                self._entries.move_to_end(id(session))
+                self.hits += 1
+                return entry[2]
+        index = SessionIdIndex(session)
+        with self._lock:
+            self.builds += 1
+            self._entries[id(session)] = (version, session, index)
+            self._entries.move_to_end(id(session))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def stats(self) -> dict:
+        return {"builds": self.builds, "hits": self.hits}
+
+
+session_index_cache = SessionIndexCache()
+
+
+def validate_against_index(index: SessionIdIndex, events: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    Split events into (valid, invalid); invalid events get a "validation_error".
+    """
+    validated_events, invalid_events = [], []
+    for event in events:
+        error = index.check(event) if isinstance(event, dict) else None
+        if error:
+            event["validation_error"] = error
+            invalid_events.append(event)
+        else:
+            validated_events.append(event)
+    return validated_events, invalid_events
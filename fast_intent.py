@@ -0,0 +1,233 @@
+import re
+from typing import Dict, List, Optional
+
+from location_graph import plan_movement
+
+DEFAULT_ACTION_DC = {
+    "PERCEPTION": 10,
+    "INTERACTION": 10,
+    "ATTACK": 13,
+}
+
+# Inputs that chain several actions or hedge are left to the LLM
+_COMPOUND = re.compile(r"\b(and|then|but|while|unless|if|or)\b|[,;?]")
+_FILLER = re.compile(r"^(i|we|let's|lets)\s+(want to\s+|try to\s+|will\s+|would like to\s+)?")
+_ARTICLE = re.compile(r"^(the|a|an|my|our|to|towards|toward|into|through|at|with)\s+")
+
+_LOOK = re.compile(r"^(look|look around|look about|search|search around|search the area|survey the area|"
+                   r"examine the (area|room|surroundings)|take a look around|observe)$")
+_MOVE = re.compile(r"^(go|walk|head|travel|move|run|enter|leave via|take the)\s+(.+)$")
+_ATTACK = re.compile(r"^(attack|hit|strike|stab|slash|shoot|fight|punch)\s+(.+)$")
+_TALK = re.compile(r"^(talk|speak|chat)\s+(to|with)\s+(.+)$|^(greet|ask|approach|address)\s+(.+)$")
+_USE = re.compile(r"^(use|drink|equip|draw|read)\s+(.+)$")
+
+_DIRECTIONS = {"north", "south", "east", "west", "up", "down", "northeast", "northwest", "southeast", "southwest"}
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().strip().rstrip(".!")
+    text = re.sub(r"\s+", " ", text)
+    return _FILLER.sub("", text)
+
+def _strip_articles(phrase: str) -> str:
+    previous = None
+    while previous != phrase:
+        previous = phrase
+        phrase = _ARTICLE.sub("", phrase)
+    return phrase.strip()
+
+def _id_words(entity_id: str) -> str:
+    """
+    "item_ThievesTools" -> "thieves tools", "north_path" -> "north path"
+    """
+    body = entity_id.split("_", 1)[1] if re.match(r"^(pc|npc|loc|item|obj)_", entity_id) else entity_id
+    body = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", body).replace("_", " ")
+    return body.lower()
+
+
+class FastIntentResolver:
+    """
+    Resolves plain, single-action commands ("go north", "look around", "attack the wolf", "talk to Boric")
+    straight to PLAYER_ACTION events using a lexicon built from the live game state.
+    Returns None whenever the input is not an unambiguous match, so the caller falls back to the LLM.
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.hits = 0
+        self.misses = 0
+
+    # --- Lexicon ---
+
+    def _session(self) -> dict:
+        return self.game_state.session
+
+    def _current_location(self):
+        current = self._session().get("currentLocation") or {}
+        for location_id, location in current.items():
+            return location_id, location
+        return None, {}
+
+    def default_actor_id(self) -> Optional[str]:
+        pcs = self._session().get("currentActors", {}).get("pcs", {})
+        return next(iter(pcs), None)
+
+    @staticmethod
+    def _add_aliases(lexicon: Dict[str, set], entity_id: str, *names: str) -> None:
+        for name in names:
+            if not name:
+                continue
+            name = name.lower()
+            for alias in {name, _strip_articles(name)}:
+                lexicon.setdefault(alias, set()).add(entity_id)
+            # Single words of a multi-word name ("boric", "thorne", "wolf") are aliases too; ambiguity is checked later
+            for word in _strip_articles(name).split():
+                if len(word) > 2 and word not in {"the", "of"}:
+                    lexicon.setdefault(word, set()).add(entity_id)
+
+    def exits(self) -> Dict[str, set]:
+        location_id, location = self._current_location()
+        lexicon: Dict[str, set] = {}
+        locations = self.game_state.game_state.get("world", {}).get("locations", {})
+        connections = dict((locations.get(location_id) or {}).get("connections", {}))
+        connections.update(location.get("connections", {}))
+        for exit_key, destination_id in connections.items():
+            destination = locations.get(destination_id, {})
+            self._add_aliases(lexicon, destination_id, exit_key, _id_words(exit_key),
+                              destination_id, _id_words(destination_id), destination.get("name"))
+        return lexicon
+
+    def actors(self) -> Dict[str, set]:
+        lexicon: Dict[str, set] = {}
+        current_actors = self._session().get("currentActors", {})
+        for group in ("npcs", "pcs"):
+            for actor_id, actor in current_actors.get(group, {}).items():
+                self._add_aliases(lexicon, actor_id, actor_id, _id_words(actor_id), actor.get("name"))
+        return lexicon
+
+    def items(self, actor_id: str) -> Dict[str, set]:
+        lexicon: Dict[str, set] = {}
+        actor = self._session().get("currentActors", {}).get("pcs", {}).get(actor_id, {})
+        for item_id in actor.get("inventory", []):
+            self._add_aliases(lexicon, item_id, item_id, _id_words(item_id))
+        return lexicon
+
+    @staticmethod
+    def _match(phrase: str, lexicon: Dict[str, set]) -> Optional[str]:
+        phrase = _strip_articles(phrase)
+        candidates = lexicon.get(phrase)
+        if candidates is None:
+            # Every word of the phrase must point at the same single entity
+            words = [w for w in phrase.split() if w not in {"the", "of"}]
+            if not words:
+                return None
+            sets = [lexicon.get(w) for w in words]
+            if any(s is None for s in sets):
+                return None
+            candidates = set.intersection(*sets)
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        return None
+
+    # --- Resolution ---
+
+    def _distant_location(self, phrase: str) -> Optional[str]:
+        # "travel to the gloomwood" from the tavern: a location named anywhere in the world, routed later
+        graph = getattr(self.game_state, "locations_graph", None)
+        return graph.find(_strip_articles(phrase)) if graph is not None else None
+
+    def _event(self, subtype: str, actor_id: str, narrative: str, target_id: Optional[str] = None,
+               action_dc: Optional[int] = None) -> dict:
+        location_id, _ = self._current_location()
+        parameters = {}
+        if target_id:
+            parameters["target_id"] = target_id
+        if action_dc is not None:
+            parameters["action_dc"] = action_dc
+        return {
+            "type": "PLAYER_ACTION",
+            "subtype": subtype,
+            "actor_id": actor_id,
+            "narrative": narrative,
+            "location_id": location_id,
+            "parameters": parameters,
+            "source": "fast_path",
+        }
+
+    def _attack_dc(self, target_id: str) -> int:
+        current_actors = self._session().get("currentActors", {})
+        for group in ("npcs", "pcs"):
+            target = current_actors.get(group, {}).get(target_id)
+            if target:
+                return target.get("stats", {}).get("ac", DEFAULT_ACTION_DC["ATTACK"])
+        return DEFAULT_ACTION_DC["ATTACK"]
+
+    def _resolve(self, player_input: str, actor_id: str) -> Optional[List[dict]]:
+        text = _normalize(player_input)
+        if not text or _COMPOUND.search(text):
+            return None
+        narrative = player_input.strip()
+
+        if _LOOK.match(text):
+            return [self._event("PERCEPTION", actor_id, narrative, action_dc=DEFAULT_ACTION_DC["PERCEPTION"])]
+
+        move = _MOVE.match(text)
+        if move or text in _DIRECTIONS:
+            phrase = move.group(2) if move else text
+            destination_id = self._match(phrase, self.exits()) or self._distant_location(phrase)
+            if destination_id:
+                event = self._event("MOVEMENT", actor_id, narrative, target_id=destination_id)
+                # Expands a destination further away into the hops to get there
+                if plan_movement(self.game_state.locations_graph, event["location_id"], event) is None:
+                    return [event]
+            return None
+
+        attack = _ATTACK.match(text)
+        if attack:
+            target_id = self._match(attack.group(2), self.actors())
+            if target_id and target_id != actor_id:
+                return [self._event("ATTACK", actor_id, narrative, target_id=target_id,
+                                    action_dc=self._attack_dc(target_id))]
+            return None
+
+        talk = _TALK.match(text)
+        if talk:
+            target_id = self._match(talk.group(3) or talk.group(5), self.actors())
+            if target_id and target_id != actor_id:
+                return [self._event("INTERACTION", actor_id, narrative, target_id=target_id,
+                                    action_dc=DEFAULT_ACTION_DC["INTERACTION"])]
+            return None
+
+        use = _USE.match(text)
+        if use:
+            item_id = self._match(use.group(2), self.items(actor_id))
+            if item_id:
+                return [self._event("INVENTORY", actor_id, narrative, target_id=item_id)]
+        return None
+
+    def resolve(self, player_input, actor_id: Optional[str] = None) -> Optional[List[dict]]:
+        """
+        Return the PLAYER_ACTION events for a confidently understood input, or None to fall back to the LLM.
+        """
+        actor_id = actor_id or self.default_actor_id()
+        events = None
+        if isinstance(player_input, str) and actor_id:
+            try:
+                events = self._resolve(player_input, actor_id)
+            except Exception as e:
+                print(f"Fast-path intent resolution failed: {e}")
+                events = None
+        if events:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return events
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            # Every hit skips both the intent and the interpreter LLM calls
+            "llm_calls_saved": self.hits * 2,
+        }
@@ -1,8 +1,55 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Set, Tuple
+import copy
 import json
+from event_log import Delta, EventLog, _ABSENT
+from world_store import ACTOR_GROUPS, LazyEntityMap, SQLiteWorldStore
+from entities import CompactEntityMap
+from dice import DiceRoller
+import state_patch
+from location_graph import LocationGraph
+
+
+class SessionView(dict):
+    """
+    Read-only projection used for game_state["session"].
+    The session skeleton (currentLocation, currentActors, pcs, npcs) is made of SessionViews whose leaves are
+    references to the world's own location and actor dicts, so building a session copies nothing.
+    Treat the leaves as read-only too; use GameState.copy_session() for a mutable, detached copy.
+    """
+    # Only the root session's version is maintained (see GameState.sync_session)
+    __slots__ = ("version",)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("The session is a read-only view of the world; use GameState methods to change state.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce__(self):
+        return (_thaw_session_view, (dict(self),))
+
+    @classmethod
+    def freeze(cls, value):
+        """
+        Wrap nested dicts as SessionViews. Only used for sessions not built by projection.
+        """
+        if isinstance(value, dict):
+            return cls({key: cls.freeze(item) for key, item in value.items()})
+        return value
+
+
+def _thaw_session_view(items: dict) -> SessionView:
+    return SessionView(items)
+
 
 class GameState:
-    def __init__(self):
+    def __init__(self, store: Optional[SQLiteWorldStore] = None, compact_npcs: bool = False, seed: Optional[int] = None):
         self.game_state = {
             "world":{
                 "locations": {
@@ -147,6 +194,28 @@ class GameState:
             },
             "history": ""
         }
+        self.game_state["session"] = SessionView.freeze(self.game_state["session"])
+        self.game_state["session"].version = 0
+        # Ids of entities changed since the session was last synced, and the location currentActors was built for
+        self._session_dirty: Set[str] = set()
+        self._actors_projected_for: Optional[str] = None
+        # Optional SQLite backend: entities load lazily and each turn's changes are written in one batch
+        self.store: Optional[SQLiteWorldStore] = None
+        self._store_dirty: Dict[Tuple[str, str], bool] = {}
+        self._store_meta_dirty: Set[str] = set()
+        if store is not None:
+            self.use_store(store)
+        else:
+            self.rebuild_indexes()
+        # Keep NPCs outside the session as compact __slots__ objects between turns (see entities.py)
+        self.compact_npcs = compact_npcs and store is None
+        if self.compact_npcs:
+            self.compact_actors()
+        # Event sourcing: changes made through apply_delta are collected per turn and written to the log
+        self.event_log: Optional[EventLog] = None
+        self._pending_deltas: List[Delta] = []
+        # Per-table dice stream, reseeded at every turn boundary so a turn's rolls can be reproduced
+        self.dice = DiceRoller(seed)
         self.hostile_game_state = {
             "world": {
                 "locations": {
@@ -322,44 +391,544 @@ class GameState:
             "history": ""
         }
 
+    # --- Indexes ---
+    # location id -> actor ids, entity id -> (kind, container), lowercase name -> id, item id -> owner ids.
+    # Kept current by the mutation methods below, so lookups never scan every actor.
 
-    
+    def rebuild_indexes(self) -> None:
+        """
+        Rebuild all lookup indexes from game_state. Call after replacing world or actor data wholesale.
+        """
+        self._actors_by_location: Dict[str, Set[str]] = {}
+        self._entities: Dict[str, Tuple[str, dict]] = {}
+        self._names: Dict[str, str] = {}
+        self._item_owners: Dict[str, Set[str]] = {}
+        # Containers may have been replaced, so the next sync re-projects currentActors in full
+        self._actors_projected_for = None
+        # Exits between locations, for neighbour checks and routes (see location_graph.py)
+        self.locations_graph = LocationGraph()
+
+        if self.store is not None and isinstance(self.game_state["world"]["locations"], LazyEntityMap):
+            # Index from the store's columns so no entity has to be loaded
+            containers = {"location": self.game_state["world"]["locations"]}
+            containers.update({kind: self.game_state["actors"][group] for kind, group in ACTOR_GROUPS.items()})
+            exits: Dict[str, list] = {}
+            for location_id, exit_key, target_id in self.store.connection_rows():
+                exits.setdefault(location_id, []).append((exit_key, target_id))
+            for entity_id, kind, name, location_id, inventory in self.store.index_rows():
+                container = containers[kind]
+                if not container.loaded(entity_id) and not container.deleted(entity_id):
+                    self._index_entity(entity_id, kind, container,
+                                       {"name": name, "currentLocation": location_id, "inventory": inventory})
+                    if kind == "location":
+                        self.locations_graph.set_name(entity_id, name)
+                        self.locations_graph.set_connections(entity_id, exits.get(entity_id, ()))
+            for kind, container in containers.items():
+                for entity_id in [key for key in dict.keys(container)]:
+                    self._index_entity(entity_id, kind, container, container[entity_id])
+                    if kind == "location":
+                        self.locations_graph.set_location(entity_id, container[entity_id])
+            return
+
+        locations = self.game_state.get("world", {}).get("locations", {})
+        for location_id, location in locations.items():
+            self._index_entity(location_id, "location", locations, location)
+            self.locations_graph.set_location(location_id, location)
+
+        actors = self.game_state.get("actors", {})
+        for group, kind in (("pcs", "pc"), ("npcs", "npc")):
+            container = actors.setdefault(group, {})
+            for actor_id, actor in container.items():
+                self._index_entity(actor_id, kind, container, actor)
+
+    def _index_entity(self, entity_id: str, kind: str, container: dict, entity: dict) -> None:
+        self._entities[entity_id] = (kind, container)
+        name = entity.get("name")
+        if name:
+            self._names[name.lower()] = entity_id
+        if kind in ("pc", "npc"):
+            location_id = entity.get("currentLocation")
+            if location_id:
+                self._actors_by_location.setdefault(location_id, set()).add(entity_id)
+            for item_id in entity.get("inventory", []):
+                self._item_owners.setdefault(item_id, set()).add(entity_id)
+
+    def _unindex_entity(self, entity_id: str) -> None:
+        kind, container = self._entities.pop(entity_id)
+        entity = container.get(entity_id, {})
+        name = entity.get("name")
+        if name and self._names.get(name.lower()) == entity_id:
+            del self._names[name.lower()]
+        if kind in ("pc", "npc"):
+            self._actors_by_location.get(entity.get("currentLocation"), set()).discard(entity_id)
+            for item_id in entity.get("inventory", []):
+                self._item_owners.get(item_id, set()).discard(entity_id)
+
+    def get_entity(self, entity_id: str) -> Optional[Tuple[str, dict]]:
+        """
+        Return (kind, entity) for a pc, npc or location id, or None. kind is "pc", "npc" or "location".
+        """
+        entry = self._entities.get(entity_id)
+        if entry is None:
+            return None
+        kind, container = entry
+        return kind, container[entity_id]
+
+    def get_actor(self, actor_id: str) -> Optional[dict]:
+        """
+        Return a PC or NPC by id, or None.
+        """
+        entry = self._entities.get(actor_id)
+        if entry is None or entry[0] not in ("pc", "npc"):
+            return None
+        return entry[1][actor_id]
+
+    def find_entity_id_by_name(self, name: str) -> Optional[str]:
+        return self._names.get(name.lower())
+
+    def get_item_owners(self, item_id: str) -> Set[str]:
+        return set(self._item_owners.get(item_id, ()))
+
+    def get_actor_ids_at_location(self, location_id: str) -> Set[str]:
+        return set(self._actors_by_location.get(location_id, ()))
+
+    # --- Mutations ---
+    # Every change goes through apply_delta, which keeps the indexes current and records the delta for the event log.
+
+    @staticmethod
+    def _entity_for_path(path: Tuple) -> Optional[Tuple[str, str]]:
+        """
+        (entity_id, kind) when a path points at or inside a PC, NPC or location.
+        """
+        if len(path) >= 3 and path[0] == "actors" and path[1] in ("pcs", "npcs"):
+            return path[2], "pc" if path[1] == "pcs" else "npc"
+        if len(path) >= 3 and path[0] == "world" and path[1] == "locations":
+            return path[2], "location"
+        return None
+
+    def _get_path(self, path: Tuple, default=_ABSENT):
+        node = self.game_state
+        for key in path:
+            if isinstance(node, dict) and key in node:
+                node = node[key]
+            elif isinstance(node, list) and isinstance(key, int) and -len(node) <= key < len(node):
+                node = node[key]
+            else:
+                return default
+        return node
+
+    def _apply_raw(self, delta: Delta) -> None:
+        if delta.op == "session":
+            location = self.get_location_by_key(delta.value)
+            if location is None:
+                raise ValueError(f"Location key '{delta.value}' not found in world locations.")
+            self._set_session_part("currentLocation", SessionView({delta.value: location}))
+            if self.store is not None:
+                self._store_meta_dirty.add("session_location")
+            return
+
+        entity = self._entity_for_path(delta.path)
+        if entity and entity[0] in self._entities:
+            self._unindex_entity(entity[0])
+
+        node = self.game_state
+        for key in delta.path[:-1]:
+            node = node.setdefault(key, {}) if isinstance(node, dict) else node[key]
+        key = delta.path[-1]
+        value = copy.deepcopy(delta.value) if isinstance(delta.value, (dict, list)) else delta.value
+        if delta.op == "set":
+            node[key] = value
+        elif delta.op == "delete":
+            del node[key]
+        elif delta.op == "list_add":
+            node.setdefault(key, []).append(value)
+        elif delta.op == "list_remove":
+            node[key].remove(value)
+
+        if entity:
+            entity_id, kind = entity
+            container = self._get_path(delta.path[:2], {})
+            if entity_id in container:
+                self._index_entity(entity_id, kind, container, container[entity_id])
+            if kind == "location":
+                self.locations_graph.update_location(entity_id, container[entity_id] if entity_id in container else None)
+            self._session_dirty.add(entity_id)
+        if self.store is not None:
+            if entity:
+                self._store_dirty[(entity[1], entity[0])] = True
+            elif delta.path and delta.path[0] in ("journal", "history"):
+                self._store_meta_dirty.add(delta.path[0])
+
+    def apply_delta(self, delta: Delta, record: bool = True) -> None:
+        """
+        Apply one change to game_state and, if an event log is attached, record it for the current turn.
+        """
+        self._apply_raw(delta)
+        if record and self.event_log is not None:
+            self._pending_deltas.append(delta)
+
+    def apply_patch(self, operations: List[dict]) -> List[Delta]:
+        """
+        Apply a batch of JSON-Patch operations atomically, e.g.
+            [{"op": "replace", "path": "/actors/npcs/npc_GloomfangWolf/stats/hp_current", "value": 4}]
+        Paths are validated against state_patch.STATE_SCHEMA first; raises state_patch.PatchError and changes
+        nothing if any operation fails.
+        """
+        applied = state_patch.apply_patch(self, operations)
+        if self.event_log is not None:
+            self._pending_deltas.extend(applied)
+        return applied
+
+    def set_value(self, path, value) -> None:
+        """
+        Set any value in game_state by path, e.g. ("actors", "npcs", "npc_GloomfangWolf", "stats", "hp_current").
+        """
+        path = tuple(path)
+        self.apply_delta(Delta("set", path, value, old=self._get_path(path)))
+
+    def add_actor(self, actor_id: str, actor: dict, kind: str = "npc") -> None:
+        """
+        Add (or replace) a PC or NPC. kind is "pc" or "npc".
+        """
+        group = "pcs" if kind == "pc" else "npcs"
+        existing = self._entities.get(actor_id)
+        if existing and existing[0] != kind:
+            self.remove_actor(actor_id)
+        path = ("actors", group, actor_id)
+        self.apply_delta(Delta("set", path, actor, old=self._get_path(path)))
+
+    def remove_actor(self, actor_id: str) -> dict:
+        actor = self.get_actor(actor_id)
+        if actor is None:
+            raise ValueError(f"Actor '{actor_id}' not found.")
+        group = "pcs" if self._entities[actor_id][0] == "pc" else "npcs"
+        self.apply_delta(Delta("delete", ("actors", group, actor_id), old=actor))
+        return actor
+
+    def move_actor(self, actor_id: str, location_id: str) -> None:
+        """
+        Move a PC or NPC to a location.
+        """
+        actor = self.get_actor(actor_id)
+        if actor is None:
+            raise ValueError(f"Actor '{actor_id}' not found.")
+        if self.get_location_by_key(location_id) is None:
+            raise ValueError(f"Location key '{location_id}' not found in world locations.")
+        group = "pcs" if self._entities[actor_id][0] == "pc" else "npcs"
+        path = ("actors", group, actor_id, "currentLocation")
+        self.apply_delta(Delta("set", path, location_id, old=actor.get("currentLocation", _ABSENT)))
+
+    def add_item(self, actor_id: str, item_id: str) -> None:
+        if self.get_actor(actor_id) is None:
+            raise ValueError(f"Actor '{actor_id}' not found.")
+        group = "pcs" if self._entities[actor_id][0] == "pc" else "npcs"
+        self.apply_delta(Delta("list_add", ("actors", group, actor_id, "inventory"), item_id))
+
+    def remove_item(self, actor_id: str, item_id: str) -> None:
+        actor = self.get_actor(actor_id)
+        if actor is None or item_id not in actor.get("inventory", []):
+            raise ValueError(f"Actor '{actor_id}' has no item '{item_id}'.")
+        group = "pcs" if self._entities[actor_id][0] == "pc" else "npcs"
+        self.apply_delta(Delta("list_remove", ("actors", group, actor_id, "inventory"), item_id))
+
+    # --- Event log: turns, snapshots, replay and undo ---
+
+    def export_state(self) -> dict:
+        """
+        Persistent state for snapshots. The session is derived, so only its location is kept.
+        With a world store the database is already the durable copy of the world and actors, so only its path is
+        kept; serializing them would load every entity.
+        """
+        state = {
+            "journal": self.game_state.get("journal", ""),
+            "history": self.game_state.get("history", ""),
+            "session_location": next(iter(self.game_state["session"].get("currentLocation") or {}), None),
+        }
+        if self.store is not None:
+            return {"world_store": self.store.path, **state}
+        # Compact NPCs are serialized from their slotted form; iterating the map would thaw every one of them
+        actors = {group: entities.to_json_dict() if isinstance(entities, CompactEntityMap) else entities
+                  for group, entities in self.game_state.get("actors", {}).items()}
+        return {"world": self.game_state.get("world", {}), "actors": actors, **state}
+
+    def load_state(self, state: dict) -> None:
+        for key in ("world", "actors", "journal", "history"):
+            if key in state:
+                self.game_state[key] = copy.deepcopy(state[key])
+        self.rebuild_indexes()
+        if state.get("session_location"):
+            self.set_session_location_by_key(state["session_location"], record=False)
+            self.refresh_session()
+
+    def load_scenario(self, scenario: dict) -> None:
+        """
+        Replace the world with a scenario laid out like game_state, e.g. self.hostile_game_state,
+        and put the session at the scenario's session location.
+        """
+        self.load_state({
+            "world": scenario["world"],
+            "actors": scenario["actors"],
+            "journal": scenario.get("journal", ""),
+            "history": scenario.get("history", ""),
+            "session_location": next(iter((scenario.get("session") or {}).get("currentLocation") or {}), None),
+        })
+
+    def attach_event_log(self, event_log: EventLog, restore: bool = True) -> None:
+        """
+        Start recording changes to `event_log`. With restore=True, existing state in the log is loaded first.
+        """
+        self.event_log = event_log
+        self._pending_deltas = []
+        self.dice.start_turn(event_log.turn + 1)
+        if restore and event_log.turn > 0 and self.store is None:
+            # With a world store the database is already at the last committed turn, so there is nothing to replay
+            self.restore_from_log()
+        elif event_log.turn == 0:
+            # A fresh log starts from a full snapshot of the current world
+            event_log.write_snapshot(self.export_state())
+
+    def restore_from_log(self) -> None:
+        """
+        Rebuild state from the latest snapshot plus the turns logged after it.
+        """
+        snapshot = self.event_log.latest_snapshot()
+        after_turn = 0
+        if snapshot:
+            self.load_state(snapshot["state"])
+            after_turn = snapshot["turn"]
+        for record in self.event_log.records(after_turn):
+            for data in record["d"]:
+                self.apply_delta(Delta.from_json(data), record=False)
+        self.refresh_session()
+
+    def commit_turn(self) -> Optional[int]:
+        """
+        Write the changes made since the last commit as one turn. Returns the turn id, or None if nothing changed.
+        """
+        self.flush_store()
+        if self.compact_npcs:
+            self.compact_actors()
+        if self.event_log is None or not self._pending_deltas:
+            self.dice.start_turn(self.event_log.turn + 1 if self.event_log is not None else self.dice.turn)
+            return None
+        deltas, self._pending_deltas = self._pending_deltas, []
+        turn = self.event_log.append(deltas)
+        self.dice.start_turn(turn + 1)
+        if self.event_log.should_snapshot():
+            self.event_log.write_snapshot(self.export_state())
+        return turn
+
+    def undo_last_turn(self) -> Optional[int]:
+        """
+        Revert the most recent committed turn by applying its inverse deltas (logged as a new turn).
+        Returns the id of the turn that was undone, or None.
+        """
+        if self.event_log is None:
+            return None
+        self.commit_turn()
+        last = self.event_log.last_undoable()
+        if last is None:
+            return None
+        turn, deltas = last
+        inverses = [delta.inverse() for delta in reversed(deltas)]
+        for delta in inverses:
+            self.apply_delta(delta, record=False)
+        self.event_log.append(inverses, undo_of=turn)
+        self.dice.start_turn(self.event_log.turn + 1)
+        self.flush_store()
+        self.refresh_session()
+        return turn
+
+    # --- World store ---
+
+    def use_store(self, store: SQLiteWorldStore) -> None:
+        """
+        Back world locations and actors with `store`. An empty store is seeded from the current state;
+        otherwise the stored world replaces it. Entities are loaded on first access.
+        """
+        if store.is_empty():
+            store.import_state(self.export_state() | {"session": self.game_state["session"]})
+        self.store = store
+        self._store_dirty = {}
+        self._store_meta_dirty = set()
+        self.game_state.setdefault("world", {})["locations"] = store.location_map()
+        actors = self.game_state.setdefault("actors", {})
+        for kind, group in ACTOR_GROUPS.items():
+            actors[group] = store.actor_map(kind)
+        for key in ("journal", "history"):
+            self.game_state[key] = store.get_meta(key, self.game_state.get(key, ""))
+        self.rebuild_indexes()
+        location_id = store.get_meta("session_location")
+        if location_id and self.get_location_by_key(location_id) is not None:
+            self.set_session_location_by_key(location_id, record=False)
+            self.set_current_actors_by_location_id(location_id)
+
+    def flush_store(self) -> int:
+        """
+        Write every entity changed since the last flush to the world store in one transaction.
+        Returns the number of entities written.
+        """
+        if self.store is None or not (self._store_dirty or self._store_meta_dirty):
+            return 0
+        dirty, self._store_dirty = self._store_dirty, {}
+        meta_keys, self._store_meta_dirty = self._store_meta_dirty, set()
+        containers = {"location": self.game_state["world"]["locations"]}
+        containers.update({kind: self.game_state["actors"][group] for kind, group in ACTOR_GROUPS.items()})
+        entities = {(kind, entity_id): containers[kind].get(entity_id) for kind, entity_id in dirty}
+        meta = {key: self.game_state.get(key, "") for key in meta_keys if key != "session_location"}
+        if "session_location" in meta_keys:
+            meta["session_location"] = next(iter(self.game_state["session"].get("currentLocation") or {}), None)
+        self.store.write_batch(entities, meta)
+        return len(entities)
+
+    # --- Compact entities ---
+
+    def compact_actors(self) -> int:
+        """
+        Store every NPC that is not at the session location as a compact entity object.
+        They turn back into plain dicts on first access, so callers never see the difference.
+        Returns the number of NPCs compacted.
+        """
+        if self.store is not None:
+            return 0
+        npcs = self.game_state["actors"]["npcs"]
+        if not isinstance(npcs, CompactEntityMap):
+            compact = CompactEntityMap("npc", npcs)
+            self.game_state["actors"]["npcs"] = compact
+            # Index entries point at the container, so repoint them at the new one
+            for actor_id, (kind, container) in self._entities.items():
+                if container is npcs:
+                    self._entities[actor_id] = (kind, compact)
+            npcs = compact
+        location_id = next(iter(self.game_state["session"].get("currentLocation") or {}), None)
+        count = npcs.compact(keep=self._actors_by_location.get(location_id, ()))
+        if location_id:
+            # The session holds references to the NPC dicts that stay thawed
+            self._actors_projected_for = None
+            self.sync_session()
+        return count
+
+    # --- Session ---
+    # The session is a projection over world data (see SessionView): building it only allocates the
+    # small skeleton dicts, never copies of locations or actors. Changes are tracked per entity and
+    # patched into the session by sync_session(), which bumps session["version"] when anything visible changed.
+
+    @property
+    def session(self) -> dict:
+        """
+        The session, synced with every change made since it was last read.
+        """
+        self.sync_session()
+        return self.game_state["session"]
+
+    @property
+    def session_version(self) -> int:
+        """
+        Incremented whenever the session's content changes; consumers can skip work while it is unchanged.
+        """
+        self.sync_session()
+        return self.game_state["session"].version
+
+    def _set_session_part(self, key: str, value: dict) -> None:
+        session = self.game_state.get("session")
+        if not isinstance(session, SessionView):
+            session = SessionView.freeze(session or {})
+            session.version = 0
+            self.game_state["session"] = session
+        dict.__setitem__(session, key, value)
+
+    def _session_location_id(self) -> Optional[str]:
+        return next(iter(self.game_state["session"].get("currentLocation") or {}), None)
+
+    def sync_session(self) -> bool:
+        """
+        Patch the session with the entities changed since the last sync.
+        Only changed actors are added, replaced or removed; currentActors is rebuilt only when the party moved.
+        Returns True (and bumps the version) if the session changed.
+        """
+        location_id = self._session_location_id()
+        dirty, self._session_dirty = self._session_dirty, set()
+        if not location_id:
+            return False
+
+        changed = False
+        if location_id in dirty:
+            location = self.get_location_by_key(location_id)
+            if location is not None and self.game_state["session"]["currentLocation"][location_id] is not location:
+                # The location dict was replaced wholesale; point the session at the new one
+                self._set_session_part("currentLocation", SessionView({location_id: location}))
+            changed = True
+
+        actors = self.game_state["session"].get("currentActors")
+        if actors is None or self._actors_projected_for != location_id:
+            self._project_actors(location_id, dirty)
+            changed = True
+        else:
+            changed = self._patch_actors(actors, location_id, dirty) or changed
+
+        if changed:
+            self.game_state["session"].version += 1
+        return changed
+
+    def _project_actors(self, location_id: str, dirty: Set[str]) -> None:
+        """
+        Build currentActors for a new location. The PC view follows the party, so it is carried over
+        (patched for changed PCs) and only the NPC view is rebuilt from the location index.
+        """
+        actors = self.game_state["session"].get("currentActors")
+        if actors is not None and isinstance(actors.get("pcs"), SessionView) and self._actors_projected_for is not None:
+            pcs = actors["pcs"]
+            self._patch_actors(SessionView({"pcs": pcs, "npcs": SessionView()}), location_id, dirty)
+        else:
+            pcs = SessionView(self.game_state.get("actors", {}).get("pcs", {}))
+        npcs = self.game_state.get("actors", {}).get("npcs", {})
+        self._set_session_part("currentActors", SessionView({
+            "pcs": pcs,
+            "npcs": SessionView({
+                actor_id: npcs[actor_id]
+                for actor_id in sorted(self._actors_by_location.get(location_id, ()))
+                if actor_id in npcs
+            }),
+        }))
+        self._actors_projected_for = location_id
+
+    def _patch_actors(self, actors: dict, location_id: str, dirty: Set[str]) -> bool:
+        changed = False
+        here = self._actors_by_location.get(location_id, ())
+        for entity_id in dirty:
+            kind = self._entities.get(entity_id, (None, None))[0]
+            for group, group_kind in (("pcs", "pc"), ("npcs", "npc")):
+                view = actors.get(group)
+                if view is None:
+                    continue
+                if kind == group_kind and (kind == "pc" or entity_id in here):
+                    dict.__setitem__(view, entity_id, self._entities[entity_id][1][entity_id])
+                    changed = True
+                elif entity_id in view:
+                    dict.__delitem__(view, entity_id)
+                    changed = True
+        return changed
+
+    def copy_session(self) -> dict:
+        """
+        Return a detached, mutable deep copy of the session.
+        """
+        return copy.deepcopy(self.session)
 
     def update_session_by_location(self) -> dict:
         """
         Update the session information based on the current location.
+        Only the parts that changed since the last update are patched; returns the read-only session.
         """
-        current_session = self.game_state.get("session", {})
-        current_location_id = list(current_session.get("currentLocation").keys())[0]
+        current_location_id = self._session_location_id()
 
         if not current_location_id:
             return {"error": "No current location set in session."}
-        
-        location_details = None
-        locations = self.game_state.get("world", {}).get("locations", {})
-        if current_location_id in locations:
-            location_details = json.loads(json.dumps(locations[current_location_id]))  # Deep copy
-        else:
-            return {"error": f"Location ID '{current_location_id}' not found in world locations."}
-        
-        actor_details = {"pcs": {}, "npcs": {}}
-        pcs = self.game_state.get("actors", {}).get("pcs", {})
-        for pc_id, pc in pcs.items():
-            actor_details["pcs"][pc_id] = json.loads(json.dumps(pc))  # Deep copy
-
-        npcs = self.game_state.get("actors", {}).get("npcs", {})
-        for npc_id, npc in npcs.items():
-            if npc.get("currentLocation") == current_location_id:
-                actor_details["npcs"][npc_id] = json.loads(json.dumps(npc))  # Deep copy
 
-        session_update = {
-            "currentLocation": {
-                current_location_id: location_details
-            },
-            "currentActors": actor_details
-        }
+        if self.get_location_by_key(current_location_id) is None:
+            return {"error": f"Location ID '{current_location_id}' not found in world locations."}
 
-        return session_update
+        return self.session
     
     def get_location_by_key(self, location_key: str) -> dict:
         """
@@ -372,41 +941,51 @@ class GameState:
             print(f"Error retrieving location by key '{location_key}': {e}")
             return None
     
-    def set_session_location_by_key(self, location_key: str) -> None:
+    def set_session_location_by_key(self, location_key: str, record: bool = True) -> None:
         """
         Set the current location in the session by location key.
         """
         location = self.get_location_by_key(location_key)
         if location:
-            self.game_state["session"]["currentLocation"] = {location_key: location}
+            previous = next(iter(self.game_state["session"].get("currentLocation") or {}), None)
+            self.apply_delta(Delta("session", (), location_key, old=previous), record=record)
         else:
             raise ValueError(f"Location key '{location_key}' not found in world locations.")
         
     def get_current_actors_by_location_id(self, location_id: str) -> dict:
         """
         Retrieve all actors (PCs and NPCs) currently at the specified location ID.
+        PCs are always included, since the session follows the whole party.
+        Returns a read-only view over the actor dicts; use copy.deepcopy for a detached copy.
         """
-        actors_at_location = {"pcs": {}, "npcs": {}}
-        
         pcs = self.game_state.get("actors", {}).get("pcs", {})
-        for pc_id, pc in pcs.items():
-            # if pc.get("currentLocation") == location_id:
-            #     actors_at_location["pcs"][pc_id] = json.loads(json.dumps(pc))  # Deep copy
-            actors_at_location["pcs"][pc_id] = json.loads(json.dumps(pc))  # Deep copy
-
         npcs = self.game_state.get("actors", {}).get("npcs", {})
-        for npc_id, npc in npcs.items():
-            if npc.get("currentLocation") == location_id:
-                actors_at_location["npcs"][npc_id] = json.loads(json.dumps(npc))  # Deep copy
-
-        return actors_at_location
+        return SessionView({
+            "pcs": SessionView(pcs),
+            "npcs": SessionView({
+                actor_id: npcs[actor_id]
+                for actor_id in sorted(self._actors_by_location.get(location_id, ()))
+                if actor_id in npcs
+            }),
+        })
     
     def set_current_actors_by_location_id(self, location_id: str) -> None:
         """
         Update the current actors in the session based on the specified location ID.
+        For the session's own location this only patches what changed.
         """
-        actors = self.get_current_actors_by_location_id(location_id)
-        self.game_state["session"]["currentActors"] = actors
-    
+        if location_id == self._session_location_id():
+            self.sync_session()
+            return
+        self._set_session_part("currentActors", self.get_current_actors_by_location_id(location_id))
+        self._actors_projected_for = location_id
+        self.game_state["session"].version += 1
 
-gamestate = GameState()
+    def refresh_session(self) -> None:
+        """
+        Re-project the session for its current location, e.g. after a replay or undo.
+        """
+        location_id = self._session_location_id()
+        if location_id and self.get_location_by_key(location_id) is not None:
+            self.set_session_location_by_key(location_id, record=False)
+            self.sync_session()
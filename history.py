@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+DEFAULT_WINDOW_TURNS = 6
+
+
+class HistoryManager:
+    """
+    Conversation history for the narrator.
+    The last `window_turns` turns are kept verbatim; older turns are folded into a rolling summary
+    stored in game_state["history"] (and noted in game_state["journal"]).
+    Summarization runs on a background thread after the turn ends, so it never adds to turn latency; the result
+    is written to game_state from the turn's own thread (on the next append/end_turn/flush), never from the
+    background thread, so it can't interleave with commit_turn or undo_last_turn.
+
+    Acts like the old `messages` list for appending: `history.append({"role": ..., "content": ...})`.
+    """
+    def __init__(self, game_state, summarizer: Optional[Callable[[str, List[List[dict]]], str]] = None,
+                 window_turns: int = DEFAULT_WINDOW_TURNS):
+        self.game_state = game_state
+        self.summarizer = summarizer
+        self.window_turns = window_turns
+        self.turns: List[List[dict]] = []
+        self.current: List[dict] = []
+        # Turns that have left the window but are not summarized yet; still shown to the narrator
+        self._pending: List[List[dict]] = []
+        # Summaries finished in the background, waiting to be written: (summary, folded turns)
+        self._summarized: List[Tuple[str, List[List[dict]]]] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+    @property
+    def summary(self) -> str:
+        return self.game_state.game_state.get("history", "")
+
+    def append(self, message: dict) -> None:
+        self._apply_summaries()
+        self.current.append(message)
+
+    def prompt_messages(self) -> List[dict]:
+        """
+        Messages to pass as {messages}: the rolling summary, then recent turns verbatim, then the current turn.
+        """
+        with self._lock:
+            recent = [message for turn in self._pending + self.turns for message in turn]
+        summary = self.summary
+        prefix = [{"role": "system", "content": f"Story so far: {summary}"}] if summary else []
+        return prefix + recent + list(self.current)
+
+    def end_turn(self) -> None:
+        """
+        Close the current turn and schedule summarization of anything that has left the window.
+        """
+        self._apply_summaries()
+        with self._lock:
+            if self.current:
+                self.turns.append(self.current)
+                self.current = []
+            overflow = len(self.turns) - self.window_turns
+            if overflow <= 0:
+                return
+            folded, self.turns = self.turns[:overflow], self.turns[overflow:]
+            self._pending.extend(folded)
+        self._executor.submit(self._fold, folded)
+
+    def _fold(self, folded: List[List[dict]]) -> None:
+        # Background thread: only computes the summary; _apply_summaries writes it
+        with self._lock:
+            # Build on a summary that is finished but not written yet, if there is one
+            previous = self._summarized[-1][0] if self._summarized else self.summary
+        try:
+            if self.summarizer:
+                summary = self.summarizer(previous, folded)
+            else:
+                summary = " ".join([previous] + [_turn_line(turn) for turn in folded]).strip()
+        except Exception as e:
+            print(f"Error summarizing history: {e}")
+            summary = " ".join([previous] + [_turn_line(turn) for turn in folded]).strip()
+        with self._lock:
+            self._summarized.append((summary, folded))
+
+    def _apply_summaries(self) -> None:
+        """
+        Write finished summaries into game_state. Called from the thread that runs the turns.
+        """
+        with self._lock:
+            summarized, self._summarized = self._summarized, []
+        for summary, folded in summarized:
+            # Written through set_value so the summary is recorded in the event log like any other change
+            journal = self.game_state.game_state.get("journal", "")
+            self.game_state.set_value(("history",), summary)
+            self.game_state.set_value(("journal",), "\n".join(filter(None, [journal] + [_turn_line(turn) for turn in folded])))
+            with self._lock:
+                for turn in folded:
+                    if turn in self._pending:
+                        self._pending.remove(turn)
+
+    def flush(self) -> None:
+        """
+        Wait for any background summarization to finish and write it into game_state.
+        """
+        self._executor.submit(lambda: None).result()
+        self._apply_summaries()
+
+
+def _turn_line(turn: List[dict]) -> str:
+    """
+    One journal line per turn: the player's input and the narration.
+    """
+    player = next((m["content"] for m in turn if m.get("role") == "player"), "")
+    narration = next((m["content"] for m in reversed(turn) if "Narrative" in str(m.get("content", ""))), "")
+    return f"Player: {player} | {narration}".strip(" |")
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_responses.sqlite3")
+
+_MISSING = object()
+
+
+def normalize_input(player_input: Any) -> str:
+    """
+    Collapse case, whitespace and trailing punctuation so "Look around." and "look  around" share an entry.
+    """
+    if not isinstance(player_input, str):
+        player_input = json.dumps(player_input, sort_keys=True, default=str)
+    text = re.sub(r"\s+", " ", player_input.strip().lower())
+    return text.rstrip(".!")
+
+def session_digest(session: dict) -> str:
+    """
+    Stable hash of the session slice a prompt sees.
+    """
+    encoded = json.dumps(session, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Two-level cache for parsed LLM responses: an in-memory LRU in front of a SQLite file.
+    Entries expire after `ttl` seconds and the least recently used entries are evicted past `max_entries`.
+    """
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 5000, memory_entries: int = 512,
+                 ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def make_key(stage: str, player_input: Any, session: dict, model: str) -> str:
+        raw = "|".join([stage, normalize_input(player_input), session_digest(session), model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    # Entries are kept as JSON and decoded per hit: callers annotate and rewrite the events they get
+                    return json.loads(entry[0])
+                # Expired: free the slot; the stored row has the same age, so it is expired too
+                del self._memory[key]
+                self.misses += 1
+                return default
+            try:
+                row = self._conn().execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"LLM cache read failed: {e}")
+                row = None
+            if row is None or now - row[1] >= self.ttl:
+                self.misses += 1
+                return default
+            value = json.loads(row[0])
+            self._remember(key, row[0], row[1])
+            try:
+                self._conn().execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self._conn().commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache write failed: {e}")
+            self.hits += 1
+            return value
+
+    def _remember(self, key: str, encoded: str, created: float) -> None:
+        self._memory[key] = (encoded, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        encoded = json.dumps(value, default=str)
+        with self._lock:
+            self._remember(key, encoded, now)
+            try:
+                db = self._conn()
+                db.execute("INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                           (key, encoded, now, now))
+                db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache write failed: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+response_cache = ResponseCache()
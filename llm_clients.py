@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_ollama import ChatOllama
+from ollama import Client
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Per-model client settings. keep_alive follows Ollama's format ("30m", "1h", -1 for forever, 0 to unload).
+MODEL_CONFIG = {
+    "mistral": {"temperature": 0.7, "keep_alive": "30m"},
+    "llama3.1:8b": {"temperature": 0.7, "keep_alive": "30m"},
+}
+
+# Ollama reports load_duration in nanoseconds; anything above this means the model had to be loaded.
+COLD_LOAD_THRESHOLD_NS = 250_000_000
+
+
+class LoadTracker(BaseCallbackHandler):
+    """
+    Callback that records whether each call to a model hit a warm (already loaded) or cold model.
+    Ollama returns `load_duration` with every response, which is near zero when the model was resident.
+    """
+    def __init__(self, model: str):
+        self.model = model
+        self.warm_calls = 0
+        self.cold_calls = 0
+        self.last_load_ms = 0.0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        load_ns = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "response_metadata", None) or generation.generation_info or {}
+                load_ns = max(load_ns, metadata.get("load_duration") or 0)
+        with self._lock:
+            self.last_load_ms = load_ns / 1e6
+            if load_ns > COLD_LOAD_THRESHOLD_NS:
+                self.cold_calls += 1
+                print(f"[llm] {self.model}: cold start, model load took {self.last_load_ms:.0f} ms")
+            else:
+                self.warm_calls += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "warm_calls": self.warm_calls,
+                "cold_calls": self.cold_calls,
+                "last_load_ms": round(self.last_load_ms, 1),
+            }
+
+
+class LLMRegistry:
+    """
+    Process-wide registry of ChatOllama clients.
+    Each (model, options) pair is built once and reused, so the underlying HTTP connection stays open
+    and the server keeps the model loaded for the configured keep_alive instead of unloading it after every call.
+    """
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model_config: Optional[Dict[str, dict]] = None):
+        self.base_url = base_url
+        self.model_config = dict(model_config or MODEL_CONFIG)
+        self._clients: Dict[tuple, ChatOllama] = {}
+        self._trackers: Dict[str, LoadTracker] = {}
+        self._lock = threading.Lock()
+
+    def _config_for(self, model: str) -> dict:
+        return self.model_config.get(model, {"temperature": 0.7, "keep_alive": "30m"})
+
+    def set_keep_alive(self, model: str, keep_alive) -> None:
+        """
+        Change the keep_alive for a model. Clients built afterwards pick up the new value.
+        """
+        with self._lock:
+            config = dict(self._config_for(model))
+            config["keep_alive"] = keep_alive
+            self.model_config[model] = config
+            self._clients = {key: llm for key, llm in self._clients.items() if key[0] != model}
+
+    def get(self, model: str, **overrides) -> ChatOllama:
+        """
+        Return the shared client for a model, building it on first use.
+        Keyword overrides (e.g. format=...) get their own cached client.
+        """
+        key = (model, tuple(sorted((k, repr(v)) for k, v in overrides.items())))
+        llm = self._clients.get(key)
+        if llm is not None:
+            return llm
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                config = {**self._config_for(model), **overrides}
+                tracker = self._trackers.setdefault(model, LoadTracker(model))
+                llm = ChatOllama(base_url=self.base_url, model=model, callbacks=[tracker], **config)
+                self._clients[key] = llm
+        return llm
+
+    def warm(self, models=None) -> Dict[str, float]:
+        """
+        Load models into server memory ahead of the first turn.
+        An empty generate request makes Ollama load the model and hold it for keep_alive.
+        Returns the wall time in seconds spent warming each model.
+        """
+        client = Client(host=self.base_url)
+        timings = {}
+        for model in models or list(self.model_config):
+            start = time.perf_counter()
+            try:
+                client.generate(model=model, prompt="", keep_alive=self._config_for(model)["keep_alive"])
+                timings[model] = time.perf_counter() - start
+                print(f"[llm] warmed {model} in {timings[model]:.2f}s")
+            except Exception as e:
+                print(f"[llm] failed to warm {model}: {e}")
+        return timings
+
+    def loaded_models(self) -> list:
+        """
+        Ask the server which models are currently resident.
+        """
+        try:
+            return [m.model for m in Client(host=self.base_url).ps().models]
+        except Exception as e:
+            print(f"[llm] failed to query loaded models: {e}")
+            return []
+
+    def stats(self) -> Dict[str, dict]:
+        return {model: tracker.stats() for model, tracker in self._trackers.items()}
+
+
+llm_registry = LLMRegistry()
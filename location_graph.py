@@ -0,0 +1,229 @@
+import heapq
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_CACHED_SOURCES = 256
+
+_ARTICLE = re.compile(r"^(the|a|an)\s+")
+
+
+def _aliases(location_id: str, name: Optional[str]) -> Set[str]:
+    """
+    "loc_WearyWandererTavern", "The Weary Wanderer Tavern" -> {"weary wanderer tavern", "the weary wanderer tavern",
+    "loc_wearywanderertavern", "wearywanderertavern"}
+    """
+    aliases = {location_id.lower()}
+    body = location_id.split("_", 1)[1] if location_id.startswith("loc_") else location_id
+    aliases.add(body.lower())
+    aliases.add(re.sub(r"(?<=[a-z])(?=[A-Z])", " ", body).replace("_", " ").lower())
+    if name:
+        name = " ".join(name.lower().split())
+        aliases.add(name)
+        aliases.add(_ARTICLE.sub("", name))
+    return aliases
+
+
+class LocationGraph:
+    """
+    Directed graph of the world built from world.locations[*].connections (exit key -> destination id).
+    GameState keeps it current as locations change (see GameState._apply_raw), so neighbour checks are dict
+    lookups and routes never scan the world. Routes are found by BFS, one search tree per starting location; the
+    trees for the most recently used starts are cached and dropped whenever any connection changes.
+    """
+    def __init__(self, max_cached_sources: int = DEFAULT_CACHED_SOURCES):
+        self.max_cached_sources = max_cached_sources
+        self.version = 0
+        self.hits = 0
+        self.searches = 0
+        # location id -> {exit key: destination id}
+        self._exits: Dict[str, Dict[str, str]] = {}
+        self._names: Dict[str, Set[str]] = {}
+        self._aliases_of: Dict[str, Set[str]] = {}
+        # start id -> ({reached id: previous id}, BFS frontier) for the routes already searched from that start
+        self._trees: "OrderedDict[str, Tuple[Dict[str, Optional[str]], deque]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_locations(cls, locations: dict) -> "LocationGraph":
+        graph = cls()
+        for location_id, location in locations.items():
+            graph.set_location(location_id, location)
+        return graph
+
+    # --- Updates ---
+
+    def set_location(self, location_id: str, location: Optional[dict]) -> None:
+        """
+        Add, replace or (with location=None) remove a location's exits and names.
+        """
+        with self._lock:
+            for alias in self._aliases_of.pop(location_id, ()):
+                self._names.get(alias, set()).discard(location_id)
+            if location is None:
+                self._exits.pop(location_id, None)
+            else:
+                self._exits[location_id] = dict(location.get("connections") or {})
+                self._aliases_of[location_id] = _aliases(location_id, location.get("name"))
+                for alias in self._aliases_of[location_id]:
+                    self._names.setdefault(alias, set()).add(location_id)
+            self.version += 1
+            self._trees.clear()
+
+    def update_location(self, location_id: str, location: Optional[dict]) -> bool:
+        """
+        set_location, but only if the location's exits or name actually changed, so edits to descriptions or
+        state keep the cached routes. Returns True if the graph changed.
+        """
+        with self._lock:
+            if location is not None and location_id in self._exits:
+                same_exits = self._exits[location_id] == dict(location.get("connections") or {})
+                if same_exits and self._aliases_of.get(location_id) == _aliases(location_id, location.get("name")):
+                    return False
+            elif location is None and location_id not in self._exits:
+                return False
+            self.set_location(location_id, location)
+            return True
+
+    def set_connections(self, location_id: str, connections: Iterable[Tuple[str, str]]) -> None:
+        """
+        Replace a location's exits without touching its names (used when indexing from a world store).
+        """
+        with self._lock:
+            self._exits[location_id] = dict(connections)
+            self.version += 1
+            self._trees.clear()
+
+    def set_name(self, location_id: str, name: Optional[str]) -> None:
+        with self._lock:
+            for alias in self._aliases_of.pop(location_id, ()):
+                self._names.get(alias, set()).discard(location_id)
+            self._aliases_of[location_id] = _aliases(location_id, name)
+            for alias in self._aliases_of[location_id]:
+                self._names.setdefault(alias, set()).add(location_id)
+
+    # --- Lookups ---
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self._exits
+
+    def exits(self, location_id: str) -> Dict[str, str]:
+        return dict(self._exits.get(location_id) or {})
+
+    def neighbors(self, location_id: str) -> Set[str]:
+        return set((self._exits.get(location_id) or {}).values())
+
+    def is_adjacent(self, from_id: str, to_id: str) -> bool:
+        return to_id in (self._exits.get(from_id) or {}).values()
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        Location id for an id, exit-free name or alias ("loc_Gloomwood", "Gloomwood", "the gloomwood"), if unique.
+        """
+        phrase = " ".join(str(text).lower().split())
+        candidates = self._names.get(phrase) or self._names.get(_ARTICLE.sub("", phrase))
+        if candidates and len(candidates) == 1:
+            return next(iter(candidates))
+        return None
+
+    # --- Routes ---
+
+    def route(self, from_id: str, to_id: str) -> Optional[List[str]]:
+        """
+        Shortest route as the list of locations to pass through after `from_id`, ending at `to_id`
+        ([] when already there), or None if `to_id` cannot be reached.
+        """
+        if from_id == to_id:
+            return [] if from_id in self._exits else None
+        with self._lock:
+            entry = self._trees.get(from_id)
+            if entry is None:
+                entry = self._trees[from_id] = ({from_id: None}, deque([from_id]))
+                while len(self._trees) > self.max_cached_sources:
+                    self._trees.popitem(last=False)
+            self._trees.move_to_end(from_id)
+            tree, frontier = entry
+            if to_id in tree:
+                self.hits += 1
+            else:
+                self._search(tree, frontier, to_id)
+                if to_id not in tree:
+                    return None
+            path = []
+            node = to_id
+            while node != from_id:
+                path.append(node)
+                node = tree[node]
+            path.reverse()
+            return path
+
+    def _search(self, tree: Dict[str, Optional[str]], frontier: deque, to_id: str) -> None:
+        # Resumable BFS: it stops once to_id is reached and the next route from the same start picks up from there,
+        # so large worlds only explore (and cache) as far as the routes asked for
+        self.searches += 1
+        while frontier:
+            node = frontier.popleft()
+            for neighbor in (self._exits.get(node) or {}).values():
+                if neighbor not in tree:
+                    tree[neighbor] = node
+                    frontier.append(neighbor)
+            if to_id in tree:
+                return
+
+    def astar(self, from_id: str, to_id: str, heuristic: Callable[[str, str], float],
+              cost: Callable[[str, str], float] = lambda a, b: 1.0) -> Optional[List[str]]:
+        """
+        A* route for worlds with positions or travel costs; `heuristic(node, goal)` must never overestimate.
+        Not cached. Same return value as route().
+        """
+        if from_id not in self._exits:
+            return None
+        best = {from_id: 0.0}
+        previous: Dict[str, str] = {}
+        frontier = [(heuristic(from_id, to_id), 0, from_id)]
+        counter = 1
+        while frontier:
+            _, _, node = heapq.heappop(frontier)
+            if node == to_id:
+                path = []
+                while node != from_id:
+                    path.append(node)
+                    node = previous[node]
+                return path[::-1]
+            for neighbor in (self._exits.get(node) or {}).values():
+                distance = best[node] + cost(node, neighbor)
+                if distance < best.get(neighbor, float("inf")):
+                    best[neighbor] = distance
+                    previous[neighbor] = node
+                    heapq.heappush(frontier, (distance + heuristic(neighbor, to_id), counter, neighbor))
+                    counter += 1
+        return None
+
+    def stats(self) -> dict:
+        return {"locations": len(self._exits), "version": self.version, "route_hits": self.hits,
+                "searches": self.searches, "cached_sources": len(self._trees)}
+
+
+def plan_movement(graph: LocationGraph, from_id: str, event: dict) -> Optional[str]:
+    """
+    Resolve a MOVEMENT event's target (exit key, location id or name) and route it from `from_id`.
+    On success the event gets the destination id as target_id and parameters.route as the hops to take
+    (destination last); returns an error message otherwise.
+    """
+    parameters = event.setdefault("parameters", {})
+    target = parameters.get("target_id")
+    if not target:
+        return None
+    exits = graph.exits(from_id)
+    destination = exits.get(target) or (target if target in graph else graph.find(target))
+    if destination is None:
+        return f"Invalid target_id: {target} (no such location)"
+    route = graph.route(from_id, destination)
+    if route is None:
+        return f"Invalid target_id: {destination} (no route from {from_id})"
+    if not route:
+        return f"Invalid target_id: {destination} (already there)"
+    parameters["target_id"] = destination
+    parameters["route"] = route
+    return None
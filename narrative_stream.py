@@ -0,0 +1,126 @@
+import json
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class NarrativeFieldExtractor:
+    """
+    Incrementally pulls the text of one string field (default "narrative") out of a JSON object
+    while it is still being generated.
+    Feed it raw chunks as they arrive; each call returns only the newly decoded text of the field.
+    """
+    def __init__(self, field: str = "narrative"):
+        self.key = json.dumps(field)
+        self.buffer = ""
+        self.text = ""
+        self.done = False
+        self._pos = 0          # next unread index in buffer
+        self._scan = 0         # where to look for the key next
+        self._in_value = False
+
+    def _find_value_start(self) -> bool:
+        # The field name can also appear as a value ({"type": "narrative", ...}); only a match followed by a
+        # colon is the key, so other matches are skipped and scanning resumes after them
+        while True:
+            key_at = self.buffer.find(self.key, self._scan)
+            if key_at == -1:
+                # Keep the tail, which may hold the start of a key split across chunks
+                self._scan = max(self._scan, len(self.buffer) - len(self.key) + 1)
+                return False
+            cursor = key_at + len(self.key)
+            while cursor < len(self.buffer) and self.buffer[cursor] in " \t\r\n":
+                cursor += 1
+            if cursor >= len(self.buffer):
+                self._scan = key_at
+                return False
+            if self.buffer[cursor] != ":":
+                self._scan = key_at + 1
+                continue
+            cursor += 1
+            # Skip whitespace between the colon and the opening quote
+            while cursor < len(self.buffer) and self.buffer[cursor] in " \t\r\n":
+                cursor += 1
+            if cursor >= len(self.buffer):
+                self._scan = key_at
+                return False
+            if self.buffer[cursor] != '"':
+                # Not a string value; nothing to stream
+                self.done = True
+                return False
+            self._pos = cursor + 1
+            self._in_value = True
+            return True
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of raw model output and return the new narrative text it completes.
+        """
+        if not chunk or self.done:
+            self.buffer += chunk or ""
+            return ""
+        self.buffer += chunk
+        if not self._in_value and not self._find_value_start():
+            return ""
+
+        out = []
+        buffer = self.buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            # Escape sequence; wait for more input if it is split across chunks
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code == "u":
+                if pos + 6 > len(buffer):
+                    break
+                try:
+                    codepoint = int(buffer[pos + 2:pos + 6], 16)
+                except ValueError:
+                    codepoint = ord("?")
+                # Surrogate pairs arrive as two escapes; hold the first half until the second is here
+                if 0xD800 <= codepoint < 0xDC00:
+                    if pos + 12 > len(buffer):
+                        break
+                    if buffer[pos + 6:pos + 8] == "\\u":
+                        low = int(buffer[pos + 8:pos + 12], 16)
+                        out.append(chr(0x10000 + ((codepoint - 0xD800) << 10) + (low - 0xDC00)))
+                        pos += 12
+                        continue
+                out.append(chr(codepoint))
+                pos += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                pos += 2
+        self._pos = pos
+
+        new_text = "".join(out)
+        self.text += new_text
+        return new_text
+
+    def finish(self) -> str:
+        """
+        Called once the stream ends. If no narrative field was found, fall back to parsing
+        the whole buffer, or to the raw text, so the player always sees something.
+        Returns any text that was not already emitted by feed().
+        """
+        if self.text:
+            return ""
+        raw = self.buffer.strip()
+        try:
+            parsed = json.loads(raw)
+            if isinstance(parsed, dict) and isinstance(parsed.get("narrative"), str):
+                self.text = parsed["narrative"]
+                return self.text
+        except ValueError:
+            pass
+        self.text = raw
+        return raw
@@ -2,17 +2,39 @@ import streamlit as st
 from urllib.parse import parse_qs
 from dm_agent import (
     interpret_user_intent,
+    interpret_batch,
     process_player_input,
     execute_events,
-    generate_narrative,
+    stream_narrative,
+    summarize_history,
+    INTERPRETER_MODEL,
+    NARRATOR_MODEL,
+    BATCH_CONCURRENCY,
 )
-from game_state import gamestate
+from llm_clients import llm_registry
+from history import HistoryManager
+from session_manager import SessionManager
+from state_patch import SessionDiffer
 
 st.set_page_config(page_title="D&D AI Playtest", layout="wide")
 
-# Get player id from URL
+@st.cache_resource
+def warm_models():
+    # Streamlit reruns this script on every interaction; only warm the models once per server process
+    return llm_registry.warm([INTERPRETER_MODEL, NARRATOR_MODEL])
+
+warm_models()
+
+@st.cache_resource
+def session_manager():
+    # One manager per server process; each table records its state changes under saves/<table>
+    return SessionManager()
+
+# Get player and table ids from URL
 query_params = st.experimental_get_query_params()
 player_id = query_params.get("player", [None])[0]
+table_id = query_params.get("table", ["playtest"])[0]
+gamestate = session_manager().get(table_id)
 
 pcs = gamestate.game_state["actors"]["pcs"]
 pc_ids = list(pcs.keys())
@@ -25,13 +47,33 @@ if not player_id or player_id not in pcs:
     st.stop()
 
 st.header(f"Current Scene for {pcs[player_id]['name']} ({player_id})")
-st.json(gamestate.game_state["session"])
+st.json(gamestate.session)
+# What changed since this browser session last saw the scene; the first view has nothing to compare against
+if "session_differ" not in st.session_state or st.session_state.session_differ.state is not gamestate:
+    st.session_state.session_differ = SessionDiffer(gamestate)
+    st.session_state.session_differ.poll()
+session_version, session_changes = st.session_state.session_differ.poll()
+st.caption(f"Scene version {session_version}")
+if session_changes:
+    with st.expander("Changes since your last view"):
+        st.json(session_changes)
 
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "player_inputs" not in st.session_state:
     st.session_state.player_inputs = {}
+if "history" not in st.session_state or st.session_state.history.game_state is not gamestate:
+    # Windowed history for the narrator; older turns are summarized into game_state["history"].
+    # Rebuilt if the table was evicted and reloaded since.
+    st.session_state.history = HistoryManager(gamestate, summarizer=summarize_history)
+
+# Per-player mode sends each input as its own interpretation request, several at once;
+# otherwise all inputs go out as one combined prompt
+st.sidebar.header("Turn processing")
+per_player = st.sidebar.checkbox("Interpret players separately", value=True)
+concurrency = st.sidebar.number_input("Concurrent requests", min_value=1, max_value=16, value=BATCH_CONCURRENCY,
+                                      disabled=not per_player)
 
 st.header("Your Action")
 with st.form("player_action"):
@@ -44,50 +86,87 @@ if submitted and player_input.strip():
 
 # DM view: process all actions when ready
 if st.button("DM: Process Turn"):
-    turn_messages = st.session_state.messages.copy()
-
-    # Step 1: Combine all player inputs into a batch JSON
-    batch_inputs = [
-        {"actor_id": pc_id, "input": player_input}
-        for pc_id, player_input in st.session_state.player_inputs.items()
-    ]
-    print("\n\n>>>>> BATCH_PLAYER_INPUTS <<<<<\n\n", batch_inputs, "\n\n>>>>> END BATCH_PLAYER_INPUTS <<<<<\n\n")
-    turn_messages.append({"role": "system", "content": f"Batch Player Inputs: {batch_inputs}"})
-
-    # Step 2: Interpret all intents at once
-    try:
-        interpreted_intents = interpret_user_intent(batch_inputs)
-        print("\n\n>>>>> INTERPRETED_INTENTS <<<<<\n\n", interpreted_intents, "\n\n>>>>> END INTERPRETED_INTENTS <<<<<\n\n")
-        turn_messages.append({"role": "system", "content": f"Interpreted Intents: {interpreted_intents}"})
-    except Exception as e:
-        st.error(f"Error interpreting user intents: {e}")
-
-    # Step 3: Validate/process all interpreted intents at once
-    try:
-        validated_plan = process_player_input(interpreted_intents)
-        print("\n\n>>>>> VALIDATED_PLAN <<<<<\n\n", validated_plan, "\n\n>>>>> END VALIDATED_PLAN <<<<<\n\n")
-        turn_messages.append({"role": "system", "content": f"Validated Plan: {validated_plan}"})
-    except Exception as e:
-        st.error(f"Error validating plan: {e}")
-
-    # Step 4: Execute all events together
-    try:
-        execution_results = execute_events(validated_plan)
-        print("\n\n>>>>> EXECUTION_RESULTS <<<<<\n\n", execution_results, "\n\n>>>>> END EXECUTION_RESULTS <<<<<\n\n")
-        turn_messages.append({"role": "system", "content": f"Execution Results: {execution_results}"})
-    except Exception as e:
-        st.error(f"Error executing events: {e}")
-
-    # Step 5: Generate a single narrative for all actions
-    try:
-        combined_input = " | ".join([f"{pcs[pc_id]['name']}: {inp}" for pc_id, inp in st.session_state.player_inputs.items()])
-        narrative = generate_narrative(
-            combined_input, validated_plan, execution_results, turn_messages
-        )
-        print("\n\n>>>>> NARRATIVE <<<<<\n\n", narrative, "\n\n>>>>> END NARRATIVE <<<<<\n\n")
-        turn_messages.append({"role": "system", "content": f"Narrative: {narrative}"})
-    except Exception as e:
-        st.error(f"Error generating narrative: {e}")
+    # Leased for the whole turn, so loading another table can't evict this one halfway through
+    with session_manager().lease(table_id) as gamestate:
+        pcs = gamestate.game_state["actors"]["pcs"]
+        if st.session_state.history.game_state is not gamestate:
+            st.session_state.history = HistoryManager(gamestate, summarizer=summarize_history)
+        turn_messages = st.session_state.messages.copy()
+        history = st.session_state.history
+
+        def record(message: dict) -> None:
+            # turn_messages feeds the on-page history; the HistoryManager feeds the narrator
+            turn_messages.append(message)
+            history.append(message)
+
+        # Step 1: Combine all player inputs into a batch JSON
+        batch_inputs = [
+            {"actor_id": pc_id, "input": player_input}
+            for pc_id, player_input in st.session_state.player_inputs.items()
+        ]
+        print("\n\n>>>>> BATCH_PLAYER_INPUTS <<<<<\n\n", batch_inputs, "\n\n>>>>> END BATCH_PLAYER_INPUTS <<<<<\n\n")
+        record({"role": "system", "content": f"Batch Player Inputs: {batch_inputs}"})
+
+        validated_plan = []
+        if per_player:
+            # Step 2-3: Interpret and validate each player's input concurrently; merged in party order
+            inputs = sorted(st.session_state.player_inputs.items(), key=lambda item: pc_ids.index(item[0]))
+            batch = interpret_batch(gamestate, inputs, concurrency=int(concurrency))
+            validated_plan = batch["validated_plan"]
+            print("\n\n>>>>> PLAYER_REPORTS <<<<<\n\n", batch["players"], "\n\n>>>>> END PLAYER_REPORTS <<<<<\n\n")
+            for report in batch["players"]:
+                record({"role": "system", "content": f"Interpreted Intent ({report['actor_id']}): {report['interpreted_intent']}"})
+                if report["error"]:
+                    st.error(f"Could not interpret {pcs[report['actor_id']]['name']}'s action: {report['error']}")
+            record({"role": "system", "content": f"Validated Plan: {validated_plan}"})
+            st.subheader("Interpretation latency")
+            st.table([
+                {"player": report["actor_id"], "latency (ms)": report["latency_ms"], "queued (ms)": report["wait_ms"],
+                 "events": len(report["events"]), "error": report["error"] or ""}
+                for report in batch["players"]
+            ])
+        else:
+            # Step 2: Interpret all intents at once
+            try:
+                interpreted_intents = interpret_user_intent(batch_inputs)
+                print("\n\n>>>>> INTERPRETED_INTENTS <<<<<\n\n", interpreted_intents, "\n\n>>>>> END INTERPRETED_INTENTS <<<<<\n\n")
+                record({"role": "system", "content": f"Interpreted Intents: {interpreted_intents}"})
+            except Exception as e:
+                st.error(f"Error interpreting user intents: {e}")
+
+            # Step 3: Validate/process all interpreted intents at once
+            try:
+                validated_plan = process_player_input(gamestate, interpreted_intents)
+                print("\n\n>>>>> VALIDATED_PLAN <<<<<\n\n", validated_plan, "\n\n>>>>> END VALIDATED_PLAN <<<<<\n\n")
+                record({"role": "system", "content": f"Validated Plan: {validated_plan}"})
+            except Exception as e:
+                st.error(f"Error validating plan: {e}")
+
+        # Step 4: Execute all events together
+        try:
+            execution_results = execute_events(gamestate, validated_plan)
+            print("\n\n>>>>> EXECUTION_RESULTS <<<<<\n\n", execution_results, "\n\n>>>>> END EXECUTION_RESULTS <<<<<\n\n")
+            record({"role": "system", "content": f"Execution Results: {execution_results}"})
+        except Exception as e:
+            st.error(f"Error executing events: {e}")
+
+        # Step 5: Generate a single narrative for all actions
+        try:
+            combined_input = " | ".join([f"{pcs[pc_id]['name']}: {inp}" for pc_id, inp in st.session_state.player_inputs.items()])
+            st.subheader("Narrator")
+            # Render the narration as it streams in instead of waiting for the full paragraph
+            narrative_text = st.write_stream(
+                stream_narrative(gamestate, combined_input, validated_plan, execution_results, history.prompt_messages())
+            )
+            narrative = {"narrative": narrative_text}
+            print("\n\n>>>>> NARRATIVE <<<<<\n\n", narrative, "\n\n>>>>> END NARRATIVE <<<<<\n\n")
+            record({"role": "system", "content": f"Narrative: {narrative}"})
+        except Exception as e:
+            st.error(f"Error generating narrative: {e}")
+
+        # Older turns are summarized in the background once the narration is out
+        history.end_turn()
+        gamestate.commit_turn()
 
     # Update session messages and clear inputs for next turn
     st.session_state.messages = turn_messages
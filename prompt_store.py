@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import Dict
+
+import yaml
+from langchain_core.prompts import ChatPromptTemplate
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.yaml")
+
+# Each stage maps to (system prompt key in prompts.yaml, user message template).
+PROMPT_STAGES = {
+    "user_intent_prompt": ("user_intent_prompt", "## Raw User Input: {user_input}"),
+    "interpreter_prompt": ("interpreter_prompt", "## Parsed User Input:{user_input}"),
+    # Single-stage mode reuses the interpreter instructions but feeds it the raw player input
+    "single_stage_prompt": ("interpreter_prompt", "## Raw User Input: {user_input}"),
+    "narrator_prompt": ("narrator_prompt", "{user_input}"),
+    "validate_narrative_prompt": ("validate_narrative_prompt", "{narrative}"),
+    "history_summary_prompt": ("history_summary_prompt", "## Turns to fold in:\n{turns}"),
+}
+
+
+class PromptStore:
+    """
+    Parses prompts.yaml once and keeps a compiled ChatPromptTemplate per stage.
+    The file is only re-read when its mtime changes, so prompts can still be edited while the game is running.
+    """
+    def __init__(self, path: str = PROMPTS_PATH, stages: Dict[str, tuple] = None):
+        self.path = path
+        self.stages = dict(stages or PROMPT_STAGES)
+        self._templates: Dict[str, ChatPromptTemplate] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        # Fail at startup rather than at the first call that needs a missing prompt
+        self._load(os.stat(self.path).st_mtime)
+
+    def _compile(self) -> Dict[str, ChatPromptTemplate]:
+        with open(self.path, "r") as f:
+            raw_prompts = yaml.safe_load(f) or {}
+
+        missing = sorted({key for key, _ in self.stages.values() if key not in raw_prompts})
+        if missing:
+            raise KeyError(f"{self.path} is missing prompt(s): {', '.join(missing)}")
+
+        return {
+            stage: ChatPromptTemplate.from_messages([
+                ("system", raw_prompts[key]),
+                ("user", user_template),
+            ])
+            for stage, (key, user_template) in self.stages.items()
+        }
+
+    def _load(self, mtime: float) -> None:
+        templates = self._compile()
+        self._templates = templates
+        self._mtime = mtime
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print(f"Error checking {self.path}: {e}")
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                self._load(mtime)
+                print(f"Reloaded prompts from {self.path}")
+            except Exception as e:
+                # Keep serving the last good templates while the file is being edited
+                print(f"Error reloading {self.path}, keeping previous prompts: {e}")
+                self._mtime = mtime
+
+    def get(self, stage: str) -> ChatPromptTemplate:
+        """
+        Return the compiled template for a prompt stage.
+        """
+        self._reload_if_changed()
+        return self._templates[stage]
+
+
+prompt_store = PromptStore()
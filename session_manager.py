@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from event_log import EventLog
+from game_state import GameState
+from world_store import SQLiteWorldStore
+from dice import table_seed
+
+DEFAULT_SAVE_DIR = "saves"
+DEFAULT_MAX_TABLES = 16
+
+_TABLE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class SessionManager:
+    """
+    Holds many independent GameStates keyed by table id, one per campaign.
+    Each table persists to its own event log under `save_dir/<table_id>`. Least recently used tables are
+    evicted to disk once more than `max_tables` are loaded or their estimated size passes `memory_cap_mb`,
+    and are reloaded from their log on the next `get`. Tables held with `lease()` are never evicted.
+    """
+    def __init__(self, save_dir: str = DEFAULT_SAVE_DIR, max_tables: int = DEFAULT_MAX_TABLES,
+                 memory_cap_mb: Optional[float] = None, world_store: bool = False, compact_npcs: bool = False):
+        self.save_dir = save_dir
+        self.max_tables = max_tables
+        self.memory_cap_bytes = int(memory_cap_mb * 2**20) if memory_cap_mb else None
+        self.world_store = world_store
+        self.compact_npcs = compact_npcs
+        self._tables: "OrderedDict[str, GameState]" = OrderedDict()
+        # table id -> (event log turn, estimated bytes), re-estimated only after the table commits a turn
+        self._sizes: Dict[str, tuple] = {}
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _table_dir(self, table_id: str) -> str:
+        if not _TABLE_ID.match(table_id):
+            raise ValueError(f"Invalid table id '{table_id}'.")
+        return os.path.join(self.save_dir, table_id)
+
+    def get(self, table_id: str) -> GameState:
+        """
+        Return the GameState for `table_id`, loading it from disk (or creating it) if it is not in memory.
+        """
+        with self._lock:
+            state = self._tables.get(table_id)
+            if state is not None:
+                self._tables.move_to_end(table_id)
+                self.hits += 1
+                return state
+            state = self._load(table_id)
+            self._tables[table_id] = state
+            self._enforce_limits(keep=table_id)
+            return state
+
+    @contextmanager
+    def lease(self, table_id: str) -> Iterator[GameState]:
+        """
+        Pin a table in memory while a turn is running on it:
+            with sessions.lease("table_1") as state: ...
+        """
+        with self._lock:
+            state = self.get(table_id)
+            self._leases[table_id] = self._leases.get(table_id, 0) + 1
+        try:
+            yield state
+        finally:
+            with self._lock:
+                self._leases[table_id] -= 1
+                if not self._leases[table_id]:
+                    del self._leases[table_id]
+                self._enforce_limits()
+
+    def _load(self, table_id: str) -> GameState:
+        directory = self._table_dir(table_id)
+        state = GameState(compact_npcs=self.compact_npcs and not self.world_store, seed=table_seed(table_id))
+        state.attach_event_log(EventLog(directory))
+        if self.world_store:
+            state.use_store(SQLiteWorldStore(os.path.join(directory, "world.sqlite3")))
+        self.loads += 1
+        return state
+
+    def evict(self, table_id: str) -> bool:
+        """
+        Write a table's pending changes and a fresh snapshot to disk and drop it from memory.
+        Returns False if the table is not loaded or is leased.
+        """
+        with self._lock:
+            state = self._tables.get(table_id)
+            if state is None or self._leases.get(table_id):
+                return False
+            state.commit_turn()
+            if state.event_log is not None and state.event_log.turn > 0:
+                # Reloading then starts from this snapshot instead of replaying the log
+                state.event_log.write_snapshot(state.export_state())
+            if state.store is not None:
+                state.store.close()
+            del self._tables[table_id]
+            self._sizes.pop(table_id, None)
+            self.evictions += 1
+            print(f"[sessions] evicted table '{table_id}'")
+            return True
+
+    def _estimate_bytes(self, table_id: str, state: GameState) -> int:
+        turn = state.event_log.turn if state.event_log is not None else 0
+        cached = self._sizes.get(table_id)
+        if cached and cached[0] == turn:
+            return cached[1]
+        # Lazy and compact containers only count the entities currently loaded as dicts
+        groups = [state.game_state["world"]["locations"]] + list(state.game_state["actors"].values())
+        size = sum(len(json.dumps(list(dict.values(group)), default=str)) for group in groups)
+        size += len(state.game_state.get("journal", "")) + len(state.game_state.get("history", ""))
+        self._sizes[table_id] = (turn, size)
+        return size
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(self._estimate_bytes(table_id, state) for table_id, state in self._tables.items())
+
+    def _enforce_limits(self, keep: str = None) -> None:
+        for table_id in list(self._tables):
+            over_count = len(self._tables) > self.max_tables
+            over_memory = self.memory_cap_bytes is not None and self.memory_bytes() > self.memory_cap_bytes
+            if not (over_count or over_memory):
+                return
+            if table_id != keep:
+                self.evict(table_id)
+
+    def loaded_tables(self) -> List[str]:
+        with self._lock:
+            return list(self._tables)
+
+    def tables(self) -> List[str]:
+        """
+        Every table with a save on disk, loaded or not.
+        """
+        saved = set()
+        if os.path.isdir(self.save_dir):
+            saved = {name for name in os.listdir(self.save_dir) if os.path.isdir(os.path.join(self.save_dir, name))}
+        return sorted(saved | set(self.loaded_tables()))
+
+    def close(self) -> None:
+        """
+        Evict every table, writing all of them to disk.
+        """
+        with self._lock:
+            self._leases.clear()
+            for table_id in list(self._tables):
+                self.evict(table_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": len(self._tables),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "estimated_mb": round(self.memory_bytes() / 2**20, 2),
+            }
@@ -0,0 +1,277 @@
+import copy
+import json
+from typing import Any, List, Optional, Tuple
+
+from event_log import Delta, _ABSENT
+
+# Writable game_state paths. Dict keys are field names ("*" matches any id or key), a one-item list is a
+# list of that spec, and leaves are types (object = anything JSON). The session is derived, so it is not writable.
+_STRINGS = [str]
+_KNOWLEDGE = [{"id": str, "info": str, "revealed": bool}]
+_ACTOR = {
+    "name": str,
+    "class": str,
+    "race": str,
+    "background": str,
+    "role": str,
+    "currentLocation": str,
+    "dispositionToParty": str,
+    "stats": {"*": int},
+    "inventory": _STRINGS,
+    "statusEffects": _STRINGS,
+    "personalGoals": _STRINGS,
+    "knowledge": _KNOWLEDGE,
+    "dialogue_state": {"*": object},
+}
+_LOCATION = {
+    "name": str,
+    "type": str,
+    "description": str,
+    "connections": {"*": str},
+    "state": _STRINGS,
+    "pointsOfInterest": {"*": {"*": object}},
+}
+STATE_SCHEMA = {
+    "world": {"locations": {"*": _LOCATION}},
+    "actors": {"pcs": {"*": _ACTOR}, "npcs": {"*": _ACTOR}},
+    "journal": str,
+    "history": str,
+}
+
+PATCH_OPS = ("add", "remove", "replace", "test")
+# Fixed containers: they can be read and tested, but only the ids inside them can be added, replaced or removed
+STRUCTURAL_PATHS = {("world",), ("world", "locations"), ("actors",), ("actors", "pcs"), ("actors", "npcs")}
+
+
+class PatchError(ValueError):
+    pass
+
+
+# --- JSON Pointer ---
+
+def parse_pointer(pointer: str) -> Tuple[str, ...]:
+    """
+    "/actors/npcs/npc_GloomfangWolf/stats/hp_current" -> ("actors", "npcs", "npc_GloomfangWolf", "stats", "hp_current")
+    """
+    if pointer == "":
+        return ()
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer '{pointer}'.")
+    return tuple(token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/"))
+
+def to_pointer(path) -> str:
+    return "".join("/" + str(token).replace("~", "~0").replace("/", "~1") for token in path)
+
+
+# --- Schema validation ---
+
+def _spec_for_path(path: Tuple[str, ...]) -> Tuple[Any, Tuple]:
+    """
+    The schema spec at `path`, and the path with list indexes converted to ints.
+    """
+    spec = STATE_SCHEMA
+    normalized = []
+    for token in path:
+        if isinstance(spec, dict):
+            if token in spec:
+                spec = spec[token]
+            elif "*" in spec:
+                spec = spec["*"]
+            else:
+                raise PatchError(f"'{to_pointer(path)}' is not a writable game_state path.")
+        elif isinstance(spec, list):
+            if token != "-" and not token.isdigit():
+                raise PatchError(f"'{to_pointer(path)}': '{token}' is not a list index.")
+            spec = spec[0]
+            token = token if token == "-" else int(token)
+        else:
+            raise PatchError(f"'{to_pointer(path)}' goes below a {spec.__name__} value.")
+        normalized.append(token)
+    return spec, tuple(normalized)
+
+def _check_value(value: Any, spec, pointer: str) -> None:
+    if spec is object:
+        return
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            raise PatchError(f"'{pointer}' must be an object.")
+        for key, item in value.items():
+            if key not in spec and "*" not in spec:
+                raise PatchError(f"'{pointer}' has unknown field '{key}'.")
+            _check_value(item, spec.get(key, spec.get("*")), f"{pointer}/{key}")
+    elif isinstance(spec, list):
+        if not isinstance(value, list):
+            raise PatchError(f"'{pointer}' must be a list.")
+        for i, item in enumerate(value):
+            _check_value(item, spec[0], f"{pointer}/{i}")
+    elif spec is int:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise PatchError(f"'{pointer}' must be an integer.")
+    elif not isinstance(value, spec):
+        raise PatchError(f"'{pointer}' must be a {spec.__name__}.")
+
+def validate_patch(operations: List[dict]) -> List[Tuple[str, Tuple, Any]]:
+    """
+    Check every operation's op, path and value type against STATE_SCHEMA before anything is applied.
+    Returns the operations as (op, path, value).
+    """
+    if not isinstance(operations, list):
+        raise PatchError("A patch must be a list of operations.")
+    parsed = []
+    for operation in operations:
+        op = operation.get("op") if isinstance(operation, dict) else None
+        if op not in PATCH_OPS:
+            raise PatchError(f"Unsupported patch op '{op}'; expected one of {PATCH_OPS}.")
+        if "path" not in operation:
+            raise PatchError(f"Patch op '{op}' has no path.")
+        path = parse_pointer(operation["path"])
+        if not path:
+            raise PatchError("The game_state root cannot be patched as a whole.")
+        spec, path = _spec_for_path(path)
+        if op != "test" and path in STRUCTURAL_PATHS:
+            raise PatchError(f"'{operation['path']}' is a fixed container; patch the ids inside it instead.")
+        if op in ("add", "replace", "test"):
+            if "value" not in operation:
+                raise PatchError(f"Patch op '{op}' at '{operation['path']}' has no value.")
+            if op != "test":
+                _check_value(operation["value"], spec, operation["path"])
+        parsed.append((op, path, operation.get("value")))
+    return parsed
+
+
+# --- Applying ---
+
+def _resolve_parent(state, path: Tuple):
+    parent = state._get_path(path[:-1], None)
+    if parent is None:
+        raise PatchError(f"Parent of '{to_pointer(path)}' does not exist.")
+    return parent
+
+def _list_index(parent: list, token, path, allow_end: bool) -> int:
+    index = len(parent) if token == "-" else token
+    if index > len(parent) or (index == len(parent) and not allow_end):
+        raise PatchError(f"List index out of range at '{to_pointer(path)}'.")
+    return index
+
+def _delta_for(state, op: str, path: Tuple, value: Any) -> Optional[Delta]:
+    """
+    Translate one validated operation into a Delta against the current state, or None for a passing test.
+    """
+    parent = _resolve_parent(state, path)
+    key = path[-1]
+
+    if op == "test":
+        current = state._get_path(path)
+        if current == _ABSENT or current != value:
+            raise PatchError(f"Test failed at '{to_pointer(path)}'.")
+        return None
+
+    if isinstance(parent, list):
+        list_path = path[:-1]
+        if op == "add" and key == "-":
+            return Delta("list_add", list_path, value)
+        index = _list_index(parent, key, path, allow_end=(op == "add"))
+        items = list(parent)
+        if op == "add":
+            items.insert(index, value)
+        elif op == "remove":
+            del items[index]
+        else:
+            items[index] = value
+        return Delta("set", list_path, items, old=list(parent))
+
+    if not isinstance(parent, dict):
+        raise PatchError(f"Parent of '{to_pointer(path)}' is not a container.")
+    if op == "remove":
+        if key not in parent:
+            raise PatchError(f"Nothing to remove at '{to_pointer(path)}'.")
+        return Delta("delete", path, old=parent[key])
+    if op == "replace" and key not in parent:
+        raise PatchError(f"Nothing to replace at '{to_pointer(path)}'.")
+    return Delta("set", path, value, old=parent.get(key, _ABSENT))
+
+def apply_patch(state, operations: List[dict]) -> List[Delta]:
+    """
+    Apply a batch of JSON-Patch operations (add, remove, replace, test) to a GameState atomically.
+    All paths are validated against STATE_SCHEMA first; if any operation fails, everything already applied
+    is rolled back and PatchError is raised. Returns the deltas that were applied; recording them is up to
+    the caller (GameState.apply_patch), so a failed batch never reaches the event log.
+    """
+    parsed = validate_patch(operations)
+    applied: List[Delta] = []
+    try:
+        for op, path, value in parsed:
+            delta = _delta_for(state, op, path, value)
+            if delta is None:
+                continue
+            if path[0] == "actors" and path[-1] == "currentLocation" and state.get_location_by_key(value) is None:
+                raise PatchError(f"Location '{value}' does not exist.")
+            state.apply_delta(delta, record=False)
+            applied.append(delta)
+    except (PatchError, KeyError, IndexError, TypeError, ValueError) as e:
+        for delta in reversed(applied):
+            state.apply_delta(delta.inverse(), record=False)
+        if isinstance(e, PatchError):
+            raise
+        raise PatchError(f"Patch failed: {e}") from e
+    return applied
+
+
+# --- Diffs ---
+
+def diff(old: Any, new: Any, path: Tuple = ()) -> List[dict]:
+    """
+    Minimal JSON Patch turning `old` into `new`: unchanged subtrees are skipped, changed keys are replaced,
+    equal-length lists are diffed per index and other list changes replace the list.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": to_pointer(path + (key,))})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({"op": "add", "path": to_pointer(path + (key,)), "value": value})
+            else:
+                operations.extend(diff(old[key], value, path + (key,)))
+        return operations
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        operations = []
+        for i, (before, after) in enumerate(zip(old, new)):
+            operations.extend(diff(before, after, path + (i,)))
+        return operations
+    return [{"op": "replace", "path": to_pointer(path), "value": new}]
+
+
+class SessionDiffer:
+    """
+    Tracks what one client has seen of a table's session and hands out only the changes.
+        differ = SessionDiffer(state)
+        version, operations = differ.poll()
+    The first poll returns the whole session as a single replace of the root.
+    """
+    def __init__(self, state):
+        self.state = state
+        self.version: Optional[int] = None
+        self._seen: Optional[dict] = None
+
+    def poll(self) -> Tuple[int, List[dict]]:
+        version = self.state.session_version
+        if version == self.version:
+            return version, []
+        # A JSON round trip detaches the copy from the live world dicts
+        current = json.loads(json.dumps(self.state.session, default=str))
+        if self._seen is None:
+            operations = [{"op": "replace", "path": "", "value": current}]
+        else:
+            operations = diff(self._seen, current)
+        self._seen, self.version = current, version
+        return version, operations
+
+    def snapshot(self) -> dict:
+        """
+        The session as the client has last seen it.
+        """
+        return copy.deepcopy(self._seen) if self._seen is not None else {}
@@ -0,0 +1,249 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+DEFAULT_AUDIO_PROMPT_PATH = "resources/bg3narrator.wav"
+# Jobs waiting for the model, across all tables; submit() blocks or fails beyond this
+DEFAULT_MAX_QUEUED = 8
+# Jobs one table may have queued or running, so one busy table can't hold up the others
+DEFAULT_MAX_PER_TABLE = 2
+READY_TIMEOUT = 600.0  # seconds; the first load downloads the model
+
+
+class TTSBusy(RuntimeError):
+    pass
+
+
+def _serve(jobs, results, device: Optional[str], audio_prompt_path: str) -> None:
+    """
+    Worker process: load ChatterboxTTS once, then synthesize jobs until a None job arrives.
+    """
+    start = time.perf_counter()
+    try:
+        # Imported here so only the worker process pays for torch and the model
+        import torch
+        import torchaudio as ta
+        from chatterbox.tts import ChatterboxTTS
+
+        device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        model = ChatterboxTTS.from_pretrained(device=device)
+    except Exception as e:
+        results.put({"type": "ready", "error": f"Failed to load ChatterboxTTS: {e}"})
+        return
+    results.put({"type": "ready", "device": device, "load_seconds": round(time.perf_counter() - start, 2)})
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        started = time.time()
+        result = {"type": "result", "job_id": job["job_id"], "table_id": job["table_id"], "path": job["path"],
+                  "queue_wait_seconds": round(started - job["submitted"], 3), "error": None}
+        try:
+            synthesis_start = time.perf_counter()
+            with torch.inference_mode():
+                audio = model.generate(job["text"], audio_prompt_path=job["audio_prompt_path"] or audio_prompt_path)
+            synthesis_seconds = time.perf_counter() - synthesis_start
+            directory = os.path.dirname(job["path"])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            ta.save(job["path"], audio, model.sr, encoding="PCM_S", bits_per_sample=16)
+            audio_seconds = audio.shape[-1] / model.sr
+            result.update({
+                "audio_seconds": round(audio_seconds, 3),
+                "synthesis_seconds": round(synthesis_seconds, 3),
+                # Real-time factor: seconds of compute per second of audio; below 1 is faster than playback
+                "rtf": round(synthesis_seconds / audio_seconds, 3) if audio_seconds else None,
+            })
+            del audio
+        except Exception as e:
+            result["error"] = str(e)
+        results.put(result)
+
+    del model
+    if device.startswith("cuda"):
+        torch.cuda.empty_cache()
+
+
+class TTSWorker:
+    """
+    Long-lived text-to-speech process shared by every table.
+    The model is loaded once in a separate process (on the GPU if there is one, else the CPU), and narration
+    is sent to it as jobs over a bounded queue:
+        worker = TTSWorker()
+        job = worker.submit("The orc falls.", table_id="table_1", path="saves/table_1/narration.wav")
+        job.result()  # {"path": ..., "rtf": 0.42, "queue_wait_seconds": 0.0, ...}
+    When the queue is full, or a table already has `max_per_table` jobs in flight, submit() waits up to
+    `timeout` and then raises TTSBusy, so callers can skip audio for a turn instead of falling behind.
+    """
+    def __init__(self, device: Optional[str] = None, audio_prompt_path: str = DEFAULT_AUDIO_PROMPT_PATH,
+                 max_queued: int = DEFAULT_MAX_QUEUED, max_per_table: int = DEFAULT_MAX_PER_TABLE):
+        self.device = device
+        self.audio_prompt_path = audio_prompt_path
+        self.max_queued = max_queued
+        self.max_per_table = max_per_table
+        # Spawned, not forked: CUDA can't be initialized in a forked child
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue(maxsize=max_queued)
+        self._results = context.Queue()
+        self._process = context.Process(target=_serve, args=(self._jobs, self._results, device, audio_prompt_path),
+                                        name="tts-worker", daemon=True)
+        self._futures: Dict[int, Future] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Condition()
+        self._ready = threading.Event()
+        self.load_info: dict = {}
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._total_rtf = 0.0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._process.start()
+        self._reader = threading.Thread(target=self._read_results, name="tts-results", daemon=True)
+        self._reader.start()
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        """
+        Block until the model is loaded. Returns False on timeout; raises RuntimeError if loading failed.
+        """
+        if not self._ready.wait(timeout):
+            return False
+        if self.load_info.get("error"):
+            raise RuntimeError(self.load_info["error"])
+        return True
+
+    def submit(self, text: str, table_id: str = "default", path: Optional[str] = None,
+               audio_prompt_path: Optional[str] = None, timeout: Optional[float] = None) -> Future:
+        """
+        Queue `text` for synthesis into `path` (default: tts_<table_id>.wav). Returns a Future for the job's report.
+        Waits up to `timeout` seconds for room (None waits indefinitely, 0 never waits), then raises TTSBusy.
+        """
+        if self.load_info.get("error") or not self._process.is_alive():
+            raise RuntimeError(self.load_info.get("error") or "The TTS worker process is not running.")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._in_flight.get(table_id, 0) >= self.max_per_table:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.rejected += 1
+                    raise TTSBusy(f"Table '{table_id}' already has {self.max_per_table} narration job(s) in flight.")
+                self._lock.wait(remaining)
+            job_id = next(self._ids)
+            future: Future = Future()
+            self._futures[job_id] = future
+            self._in_flight[table_id] = self._in_flight.get(table_id, 0) + 1
+
+        job = {"job_id": job_id, "table_id": table_id, "text": text, "path": path or f"tts_{table_id}.wav",
+               "audio_prompt_path": audio_prompt_path, "submitted": time.time()}
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._jobs.put(job, block=remaining != 0, timeout=remaining or None)
+        except queue.Full:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._release(table_id)
+                self.rejected += 1
+            raise TTSBusy(f"The TTS queue is full ({self.max_queued} jobs waiting).")
+        return future
+
+    def synthesize(self, text: str, table_id: str = "default", path: Optional[str] = None,
+                   timeout: Optional[float] = None) -> dict:
+        """
+        Submit a job and wait for its report.
+        """
+        return self.submit(text, table_id, path, timeout=timeout).result()
+
+    def _release(self, table_id: str) -> None:
+        self._in_flight[table_id] -= 1
+        if not self._in_flight[table_id]:
+            del self._in_flight[table_id]
+        self._lock.notify_all()
+
+    def _read_results(self) -> None:
+        while True:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    # Jobs queued before a failed load get the load error, not just "exited"
+                    self._fail_pending(self.load_info.get("error") or "The TTS worker process exited.")
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if message["type"] == "ready":
+                self.load_info = {key: value for key, value in message.items() if key != "type"}
+                if not self.load_info.get("error"):
+                    print(f"[tts] ChatterboxTTS loaded on {message['device']} in {message['load_seconds']}s")
+                self._ready.set()
+                continue
+            with self._lock:
+                future = self._futures.pop(message["job_id"], None)
+                self._release(message["table_id"])
+                if message["error"]:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                    self._total_rtf += message["rtf"] or 0.0
+                self._total_wait += message["queue_wait_seconds"]
+                self._max_wait = max(self._max_wait, message["queue_wait_seconds"])
+            if future is not None:
+                future.set_result({key: value for key, value in message.items() if key != "type"})
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._lock:
+            futures, self._futures = self._futures, {}
+            self._in_flight.clear()
+            self._lock.notify_all()
+        if not self._ready.is_set():
+            self.load_info = {"error": reason}
+            self._ready.set()
+        for future in futures.values():
+            future.set_exception(RuntimeError(reason))
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "device": self.load_info.get("device"),
+                "load_seconds": self.load_info.get("load_seconds"),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "in_flight": dict(self._in_flight),
+                "mean_rtf": round(self._total_rtf / self.completed, 3) if self.completed else None,
+                "mean_queue_wait_seconds": round(self._total_wait / finished, 3) if finished else None,
+                "max_queue_wait_seconds": round(self._max_wait, 3),
+            }
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        Finish the queued jobs, then stop the worker process and free the model.
+        """
+        if self._process.is_alive():
+            self._jobs.put(None)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._fail_pending("The TTS worker was closed.")
+
+
+_worker: Optional[TTSWorker] = None
+_worker_lock = threading.Lock()
+
+def tts_worker() -> TTSWorker:
+    """
+    The process-wide worker, started on first use.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TTSWorker()
+        return _worker
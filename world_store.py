@@ -0,0 +1,310 @@
+import json
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS connections (
+    location_id TEXT NOT NULL,
+    exit_key TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    PRIMARY KEY (location_id, exit_key)
+);
+CREATE INDEX IF NOT EXISTS connections_target ON connections(target_id);
+CREATE TABLE IF NOT EXISTS actors (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT,
+    location_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS actors_location ON actors(location_id);
+CREATE INDEX IF NOT EXISTS actors_kind ON actors(kind);
+CREATE INDEX IF NOT EXISTS actors_name ON actors(name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS knowledge (
+    actor_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    knowledge_id TEXT,
+    info TEXT,
+    revealed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (actor_id, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+ACTOR_GROUPS = {"pc": "pcs", "npc": "npcs"}
+
+
+class LazyEntityMap(dict):
+    """
+    Dict of entities that loads each one from the store on first access.
+    Behaves like the plain dicts in game_state; iterating it loads everything, so prefer lookups by id.
+    """
+    def __init__(self, loader: Callable[[str], Optional[dict]], ids: Callable[[], List[str]],
+                 exists: Callable[[str], bool]):
+        super().__init__()
+        self._loader = loader
+        self._ids = ids
+        self._exists = exists
+        self._deleted = set()
+
+    def _load(self, key) -> bool:
+        if key in self._deleted or not isinstance(key, str):
+            return False
+        entity = self._loader(key)
+        if entity is None:
+            return False
+        dict.__setitem__(self, key, entity)
+        return True
+
+    def __missing__(self, key):
+        if self._load(key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        if dict.__contains__(self, key):
+            return True
+        return key not in self._deleted and isinstance(key, str) and self._exists(key)
+
+    def __setitem__(self, key, value) -> None:
+        self._deleted.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        dict.pop(self, key, None)
+        self._deleted.add(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def loaded(self, key) -> bool:
+        return dict.__contains__(self, key)
+
+    def deleted(self, key) -> bool:
+        return key in self._deleted
+
+    def _all_ids(self) -> List[str]:
+        ids = [key for key in self._ids() if key not in self._deleted]
+        extra = [key for key in dict.keys(self) if key not in set(ids)]
+        return ids + extra
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._all_ids())
+
+    def __len__(self) -> int:
+        return len(self._all_ids())
+
+    def keys(self):
+        return self._all_ids()
+
+    def items(self):
+        return [(key, self[key]) for key in self._all_ids()]
+
+    def values(self):
+        return [self[key] for key in self._all_ids()]
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"LazyEntityMap(loaded={dict.__len__(self)})"
+
+
+class SQLiteWorldStore:
+    """
+    SQLite-backed storage for the world (locations, connections) and actors (PCs, NPCs, their knowledge).
+    Runs in WAL mode so readers never block the per-turn write batch. Entities are loaded lazily through
+    LazyEntityMap, and GameState writes each turn's changed entities back in a single transaction.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM locations LIMIT 1").fetchone() is None
+
+    # --- Reads ---
+
+    def load_location(self, location_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute("SELECT data FROM locations WHERE id = ?", (location_id,)).fetchone()
+            if row is None:
+                return None
+            location = json.loads(row[0])
+            location["connections"] = dict(self.db.execute(
+                "SELECT exit_key, target_id FROM connections WHERE location_id = ? ORDER BY rowid", (location_id,)))
+            return location
+
+    def load_actor(self, actor_id: str, kind: str = None) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute("SELECT kind, data FROM actors WHERE id = ?", (actor_id,)).fetchone()
+            if row is None or (kind and row[0] != kind):
+                return None
+            actor = json.loads(row[1])
+            knowledge = self.db.execute(
+                "SELECT knowledge_id, info, revealed FROM knowledge WHERE actor_id = ? ORDER BY position", (actor_id,)
+            ).fetchall()
+            if knowledge or "knowledge" in actor:
+                actor["knowledge"] = [{"id": k, "info": info, "revealed": bool(revealed)} for k, info, revealed in knowledge]
+            return actor
+
+    def location_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT id FROM locations ORDER BY rowid")]
+
+    def actor_ids(self, kind: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT id FROM actors WHERE kind = ? ORDER BY rowid", (kind,))]
+
+    def has_location(self, location_id: str) -> bool:
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM locations WHERE id = ?", (location_id,)).fetchone() is not None
+
+    def has_actor(self, actor_id: str, kind: str) -> bool:
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM actors WHERE id = ? AND kind = ?", (actor_id, kind)).fetchone() is not None
+
+    def actor_ids_at(self, location_id: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT id FROM actors WHERE location_id = ?", (location_id,))]
+
+    def index_rows(self) -> Iterable[Tuple[str, str, Optional[str], Optional[str], List[str]]]:
+        """
+        (id, kind, name, location_id, inventory) for every entity, without loading full entity data.
+        """
+        with self._lock:
+            rows = [(row[0], "location", row[1], None, []) for row in self.db.execute("SELECT id, name FROM locations")]
+            for actor_id, kind, name, location_id, inventory in self.db.execute(
+                    "SELECT id, kind, name, location_id, json_extract(data, '$.inventory') FROM actors"):
+                rows.append((actor_id, kind, name, location_id, json.loads(inventory) if inventory else []))
+            return rows
+
+    def connection_rows(self) -> List[Tuple[str, str, str]]:
+        """
+        (location_id, exit_key, target_id) for every connection in the world, in insertion order.
+        """
+        with self._lock:
+            return self.db.execute("SELECT location_id, exit_key, target_id FROM connections ORDER BY rowid").fetchall()
+
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else default
+
+    # --- Writes ---
+
+    def _write_location(self, location_id: str, location: dict) -> None:
+        data = {key: value for key, value in location.items() if key != "connections"}
+        self.db.execute("INSERT OR REPLACE INTO locations (id, name, type, data) VALUES (?, ?, ?, ?)",
+                        (location_id, location.get("name"), location.get("type"), json.dumps(data)))
+        self.db.execute("DELETE FROM connections WHERE location_id = ?", (location_id,))
+        self.db.executemany("INSERT INTO connections (location_id, exit_key, target_id) VALUES (?, ?, ?)",
+                            [(location_id, key, target) for key, target in (location.get("connections") or {}).items()])
+
+    def _write_actor(self, actor_id: str, kind: str, actor: dict) -> None:
+        data = {key: value for key, value in actor.items() if key != "knowledge"}
+        if "knowledge" in actor:
+            data["knowledge"] = []
+        self.db.execute("INSERT OR REPLACE INTO actors (id, kind, name, location_id, data) VALUES (?, ?, ?, ?, ?)",
+                        (actor_id, kind, actor.get("name"), actor.get("currentLocation"), json.dumps(data)))
+        self.db.execute("DELETE FROM knowledge WHERE actor_id = ?", (actor_id,))
+        self.db.executemany(
+            "INSERT INTO knowledge (actor_id, position, knowledge_id, info, revealed) VALUES (?, ?, ?, ?, ?)",
+            [(actor_id, i, k.get("id"), k.get("info"), int(bool(k.get("revealed"))))
+             for i, k in enumerate(actor.get("knowledge") or [])])
+
+    def _delete_entity(self, entity_id: str, kind: str) -> None:
+        if kind == "location":
+            self.db.execute("DELETE FROM locations WHERE id = ?", (entity_id,))
+            self.db.execute("DELETE FROM connections WHERE location_id = ?", (entity_id,))
+        else:
+            self.db.execute("DELETE FROM actors WHERE id = ?", (entity_id,))
+            self.db.execute("DELETE FROM knowledge WHERE actor_id = ?", (entity_id,))
+
+    def write_batch(self, entities: Dict[Tuple[str, str], Optional[dict]], meta: Dict[str, object] = None) -> None:
+        """
+        Write one turn's changes in a single transaction.
+        `entities` maps (kind, id) to the entity dict, or None if it was deleted.
+        """
+        with self._lock:
+            try:
+                with self.db:
+                    for (kind, entity_id), entity in entities.items():
+                        if entity is None:
+                            self._delete_entity(entity_id, kind)
+                        elif kind == "location":
+                            self._write_location(entity_id, entity)
+                        else:
+                            self._write_actor(entity_id, kind, entity)
+                    for key, value in (meta or {}).items():
+                        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                        (key, json.dumps(value)))
+            except sqlite3.Error as e:
+                print(f"Error writing world store batch: {e}")
+                raise
+
+    def import_state(self, game_state: dict) -> None:
+        """
+        Seed the store from a plain game_state dict.
+        """
+        entities = {}
+        for location_id, location in game_state.get("world", {}).get("locations", {}).items():
+            entities[("location", location_id)] = location
+        for kind, group in ACTOR_GROUPS.items():
+            for actor_id, actor in game_state.get("actors", {}).get(group, {}).items():
+                entities[(kind, actor_id)] = actor
+        location_id = next(iter(game_state.get("session", {}).get("currentLocation") or {}), None)
+        self.write_batch(entities, {
+            "journal": game_state.get("journal", ""),
+            "history": game_state.get("history", ""),
+            "session_location": location_id,
+        })
+
+    # --- Lazy views for GameState ---
+
+    def location_map(self) -> LazyEntityMap:
+        return LazyEntityMap(self.load_location, self.location_ids, self.has_location)
+
+    def actor_map(self, kind: str) -> LazyEntityMap:
+        return LazyEntityMap(lambda actor_id: self.load_actor(actor_id, kind),
+                             lambda: self.actor_ids(kind),
+                             lambda actor_id: self.has_actor(actor_id, kind))
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()